@@ -1,19 +1,1519 @@
+import argparse
+import calendar
 import cmd
+import contextlib
+import json
 import sqlite3
-import sqlparse
 import os
-import pandas as pd
+import queue
+import sys
 import re
-import matplotlib.pyplot as plt
-plt.rcParams['font.family'] = 'SimHei' 
+import signal
+import threading
+import time
+import datetime
+from collections import OrderedDict, deque
+from functools import lru_cache
+from itertools import groupby
+
+# pandas、matplotlib、sqlparse 导入耗时较长，均在首次使用时才加载
+_pyplot = None
+
+
+def _load_pyplot():
+    """首次在窗口中显示图表时导入 matplotlib.pyplot 并设置中文字体"""
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib.pyplot as plt
+        plt.rcParams['font.family'] = 'SimHei'
+        _pyplot = plt
+    return _pyplot
+
+
+def _has_display():
+    """是否有可用于显示图表窗口的图形界面"""
+    if sys.platform in ('win32', 'darwin'):
+        return True
+    return bool(os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+
+
+def _normalize_sql(sql):
+    """规范化 SQL 用作缓存键：常量之外的空白压缩为单个空格，去掉结尾分号"""
+    parts = re.split(r"('(?:[^']|'')*')", sql.strip().rstrip(';'))
+    return "".join(part if i % 2 else " ".join(part.split()) for i, part in enumerate(parts))
+
+
+# 列式读取中列的类别，按可容纳的取值范围从小到大排列
+_COLUMN_KINDS = ('int', 'float', 'object')
+_KIND_DTYPES = {'int': 'int64', 'float': 'float64', 'object': 'object'}
+
+
+def _declared_kind(decltype):
+    """按 SQLite 类型亲和性规则把列的声明类型映射为最低类别，无法判断时返回 None"""
+    decltype = (decltype or '').upper()
+    if 'INT' in decltype:
+        return 'int'
+    if any(word in decltype for word in ('CHAR', 'CLOB', 'TEXT')):
+        return 'object'
+    if any(word in decltype for word in ('REAL', 'FLOA', 'DOUB')):
+        return 'float'
+    return None
+
+
+def _declared_kinds(conn, sql, params):
+    """
+    通过临时视图读取查询结果各列的声明类型，返回每列的最低类别
+    带绑定参数的查询或只读连接上无法创建视图，此时只按数据推断
+    """
+    if params:
+        return None
+    name = f"_columnar_probe_{threading.get_ident()}"
+    try:
+        conn.execute(f"CREATE TEMP VIEW {name} AS {sql.strip().rstrip(';')}")
+    except sqlite3.Error:
+        return None
+    try:
+        return [_declared_kind(column[2]) for column in conn.execute(f"PRAGMA temp.table_info({name})")]
+    finally:
+        conn.execute(f"DROP VIEW temp.{name}")
+
+
+def _max_kind(a, b):
+    if a is None or b is None:
+        return a or b
+    return max(a, b, key=_COLUMN_KINDS.index)
+
+
+def _rows_to_columns(np, rows, min_kinds=None):
+    """
+    把一块行数据转换为每列的 (类别, 数据数组, 空值掩码)
+    数值列得到连续的 int64/float64 数组（空值位置填 0），其余为 object 数组；全为空值的列数据为 None
+    """
+    count = len(rows)
+    columns = []
+    for index, values in enumerate(zip(*rows)):
+        min_kind = min_kinds[index] if min_kinds else None
+        mask = np.fromiter((value is None for value in values), dtype=bool, count=count)
+        has_null = mask.any()
+        if has_null and mask.all():
+            columns.append((min_kind, None, mask))
+            continue
+        kind = min_kind
+        if kind != 'object' and not isinstance(next(value for value in values if value is not None), (str, bytes)):
+            data = np.array([0 if value is None else value for value in values] if has_null else values)
+            kind = _max_kind({'i': 'int', 'f': 'float'}.get(data.dtype.kind, 'object'), min_kind)
+        else:
+            kind = 'object'  # 文本列不必先尝试转换为数值数组
+        if kind == 'object':
+            data = np.array(values, dtype=object)
+        elif data.dtype != _KIND_DTYPES[kind]:
+            data = data.astype(_KIND_DTYPES[kind])
+        columns.append((kind, data, mask))
+    return columns
+
+
+def fetch_columns(conn, sql, params=(), chunk_size=10000, max_rows=0):
+    """
+    按列读取查询结果：分块 fetchmany，每块直接转换为 NumPy 数组，最后拼接为每列一个连续数组
+    列类型由声明类型和首块数据推断，后续块出现更宽的类型时整列提升（int -> float -> object）
+    返回 (列名列表, numpy.ma.MaskedArray 列表)，空值由掩码表示
+    max_rows 大于 0 时，结果超过该行数即抛出 QueryCancelled
+    """
+    import numpy as np
+
+    min_kinds = _declared_kinds(conn, sql, params)
+    cursor = conn.execute(sql, params)
+    headers = [desc[0] for desc in cursor.description]
+    chunks = [[] for _ in headers]
+    kinds = list(min_kinds) if min_kinds else [None] * len(headers)
+    total = 0
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        total += len(rows)
+        if max_rows and total > max_rows:
+            raise QueryCancelled(f"超出行数预算 {max_rows} 行")
+        for index, (kind, data, mask) in enumerate(_rows_to_columns(np, rows, kinds)):
+            kinds[index] = _max_kind(kinds[index], kind)
+            chunks[index].append((data, mask))
+
+    columns = []
+    for kind, parts in zip(kinds, chunks):
+        dtype = _KIND_DTYPES[kind or 'object']
+        fill = None if dtype == 'object' else 0
+        data = np.concatenate([np.full(len(mask), fill, dtype=dtype) if part is None else part.astype(dtype, copy=False)
+                               for part, mask in parts]) if parts else np.empty(0, dtype=dtype)
+        mask = np.concatenate([mask for _, mask in parts]) if parts else np.zeros(0, dtype=bool)
+        columns.append(np.ma.MaskedArray(data, mask=mask))
+    return headers, columns
+
+
+class NoChartData(Exception):
+    """查询结果为空或没有可用于可视化的数值列"""
+
+
+# 散点图最多使用的样本点数
+SCATTER_SAMPLE_SIZE = 5000
+# 柱状图最多显示的分类数
+BAR_MAX_CATEGORIES = 10
+
+
+def _quote_identifier(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _subquery_body(sql):
+    """去掉单条语句结尾的分号及其后的空白和注释，便于嵌入子查询"""
+    position = sql.find(';')
+    while position != -1 and not sqlite3.complete_statement(sql[:position + 1]):
+        position = sql.find(';', position + 1)
+    return sql[:position] if position != -1 else sql
+
+
+def _build_chart_spec(conn, sql, params=()):
+    """
+    在 SQLite 中完成图表所需的聚合，只取回绘图需要的数据
+    选图规则与原先基于 DataFrame 的实现一致：
+    两个及以上数值列且至少 3 行时画散点图（随机采样），有分类列时画前 10 个分类的均值柱状图，否则画直方图
+    查询作为子查询嵌入，只读连接上也能执行；除不读取数据的 LIMIT 0 探测外，只扫描两遍：一遍统计，一遍取绘图数据
+    返回可序列化的图表描述（dict），结果为空或没有数值列时抛出 NoChartData
+    """
+    params = tuple(params)
+    # 右括号单独成行，查询结尾的 -- 注释不会把它注释掉
+    source = f"(\n{_subquery_body(sql)}\n) AS chart_source"
+    cursor = conn.execute(f"SELECT * FROM {source} LIMIT 0", params)
+    columns = [desc[0] for desc in cursor.description]
+    quoted = [_quote_identifier(column) for column in columns]
+
+    # 一次扫描得到总行数、每列文本/数值值的个数（区分数值列与分类列）以及直方图需要的最小/最大值
+    column_stats = ", ".join(f"SUM(typeof({column}) IN ('text', 'blob')), SUM(typeof({column}) IN ('integer', 'real')), "
+                             f"MIN({column}), MAX({column})" for column in quoted)
+    stats = conn.execute(f"SELECT COUNT(*), {column_stats} FROM {source}", params).fetchone()
+    row_count = stats[0]
+    if not row_count:
+        raise NoChartData("查询结果为空，无法进行可视化")
+    numeric, categorical = [], []
+    for i, column in enumerate(columns):
+        text_values, numeric_values = stats[1 + 4 * i], stats[2 + 4 * i]
+        if numeric_values and not text_values:
+            numeric.append(i)
+        else:
+            categorical.append(i)  # 含文本或全为空值的列按分类列处理
+    if not numeric:
+        raise NoChartData("数据集中没有可用于可视化的数值列")
+
+    if len(numeric) >= 2 and row_count >= 3:
+        x, y = quoted[numeric[0]], quoted[numeric[1]]
+        order = " ORDER BY random()" if row_count > SCATTER_SAMPLE_SIZE else ""
+        _, (xs, ys) = fetch_columns(conn, f"SELECT {x}, {y} FROM {source}{order} LIMIT {SCATTER_SAMPLE_SIZE}", params)
+        x_name, y_name = columns[numeric[0]], columns[numeric[1]]
+        return {'kind': 'scatter', 'x': xs, 'y': ys,
+                'xlabel': x_name, 'ylabel': y_name, 'title': f"{x_name} vs {y_name}",
+                'sampled': min(row_count, SCATTER_SAMPLE_SIZE), 'rows': row_count}
+
+    if categorical:
+        category, value = quoted[categorical[0]], quoted[numeric[0]]
+        # 一次分组同时得到各分类的行数与均值，只保留出现次数最多的前 10 个分类
+        groups = conn.execute(
+            f"SELECT category, average FROM (SELECT {category} AS category, AVG({value}) AS average "
+            f"FROM {source} WHERE {category} IS NOT NULL GROUP BY {category} "
+            f"ORDER BY COUNT(*) DESC LIMIT {BAR_MAX_CATEGORIES}) ORDER BY category", params).fetchall()
+        category_name, value_name = columns[categorical[0]], columns[numeric[0]]
+        return {'kind': 'bar', 'x': [str(g[0]) for g in groups],
+                'y': [float('nan') if g[1] is None else g[1] for g in groups],
+                'xlabel': category_name, 'ylabel': f"平均{value_name}",
+                'title': f"{value_name} 按 {category_name} 分组", 'rows': row_count}
+
+    # 直方图：在 SQL 中按等宽分桶计数
+    value = quoted[numeric[0]]
+    low, high = stats[3 + 4 * numeric[0]], stats[4 + 4 * numeric[0]]
+    bins = max(1, min(10, row_count // 2))
+    if high == low:
+        bins = 1
+        bucket, bucket_params = "0", ()
+        edges = [low - 0.5, high + 0.5]
+    else:
+        width = (high - low) / bins
+        bucket, bucket_params = f"MIN(CAST(({value} - ?) / ? AS INTEGER), {bins - 1})", (low, width)
+        edges = [low + width * i for i in range(bins)] + [high]
+    counts = dict(conn.execute(
+        f"SELECT {bucket} AS bucket, COUNT(*) FROM {source} WHERE {value} IS NOT NULL GROUP BY bucket",
+        bucket_params + params).fetchall())
+    value_name = columns[numeric[0]]
+    return {'kind': 'hist', 'edges': edges, 'counts': [counts.get(i, 0) for i in range(bins)],
+            'xlabel': value_name, 'ylabel': "频数", 'title': f"{value_name} 的分布", 'rows': row_count}
+
+
+def _chart_figsize(spec):
+    return (12, 6) if spec['kind'] == 'bar' else (10, 6)
+
+
+def _draw_chart(figure, spec):
+    """按 _build_chart_spec 生成的描述在 figure 上绘制图表"""
+    ax = figure.add_subplot()
+    if spec['kind'] == 'scatter':
+        ax.scatter(spec['x'], spec['y'])
+        ax.grid(True)
+    elif spec['kind'] == 'bar':
+        ax.bar(spec['x'], spec['y'])
+        ax.tick_params(axis='x', labelrotation=45)
+    else:
+        edges = spec['edges']
+        ax.hist(edges[:-1], bins=edges, weights=spec['counts'])
+        ax.grid(True)
+    ax.set_xlabel(spec['xlabel'])
+    ax.set_ylabel(spec['ylabel'])
+    ax.set_title(spec['title'])
+    if spec['kind'] == 'bar':
+        figure.tight_layout()
+
+
+# 无界面渲染支持的图片格式
+CHART_FORMATS = ('png', 'svg')
+
+
+def _render_chart_file(spec, path):
+    """
+    使用 Agg 后端把图表渲染到文件（格式由扩展名决定），不依赖图形界面，也不经过 pyplot
+    可以在子进程中调用
+    """
+    import matplotlib
+    from matplotlib.figure import Figure
+    matplotlib.rcParams['font.family'] = 'SimHei'
+    figure = Figure(figsize=_chart_figsize(spec))
+    _draw_chart(figure, spec)
+    figure.savefig(path)
+
+
+def _render_chart_job(db_file, profile, sql, path):
+    """
+    进程池任务：用独立的只读连接完成聚合并渲染到文件
+    返回 (结果行数, 错误信息)，成功时错误信息为 None
+    """
+    conn = None
+    try:
+        conn = open_read_connection(db_file, profile)
+        spec = _build_chart_spec(conn, sql)
+        _render_chart_file(spec, path)
+        return spec['rows'], None
+    except Exception as e:
+        return 0, str(e)
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+# 连接性能配置：每个配置是一组在连接上执行的 PRAGMA 设置
+# default 显式写出 sqlite3 模块打开连接时的默认值（busy_timeout 对应 connect 的 timeout=5.0），便于从其他配置切换回来
+# default 不设置 journal_mode：WAL 是数据库文件的持久属性，不应因切换配置而被改回回滚日志模式
+CONNECTION_PROFILES = {
+    'default': {
+        'synchronous': 'FULL',
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000,
+        'query_only': 'OFF',
+    },
+    # 交互使用：WAL 允许读写并发，NORMAL 同步在 WAL 下仍保证一致性
+    'interactive': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,  # 64 MB
+        'mmap_size': 268435456,  # 256 MB
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+        'query_only': 'OFF',
+    },
+    # 批量导入：牺牲断电安全性换取写入速度
+    'bulk-load': {
+        'journal_mode': 'MEMORY',
+        'synchronous': 'OFF',
+        'cache_size': -262144,  # 256 MB
+        'mmap_size': 0,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 30000,
+        'query_only': 'OFF',
+    },
+    # 只读分析：大缓存与大 mmap，拒绝一切写操作
+    'analytics': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -262144,  # 256 MB
+        'mmap_size': 1073741824,  # 1 GB
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+        'query_only': 'ON',
+    },
+}
+
+
+def apply_connection_profile(conn, profile):
+    """在连接上执行指定配置的 PRAGMA 设置"""
+    if conn.in_transaction:
+        conn.commit()  # journal_mode 不能在事务中修改
+    # 先解除只读，query_only 放到最后设置，避免只读状态阻止 journal_mode 的切换
+    conn.execute("PRAGMA query_only = OFF")
+    if 'journal_mode' not in CONNECTION_PROFILES[profile]:
+        # MEMORY / OFF 只作用于当前连接且不防崩溃，不指定日志模式的配置需把它们恢复为默认的 DELETE
+        if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() in ('memory', 'off'):
+            conn.execute("PRAGMA journal_mode = DELETE")
+    for name, value in sorted(CONNECTION_PROFILES[profile].items(), key=lambda item: item[0] == 'query_only'):
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+# 只影响当前连接的读取相关配置，只读连接不设置 journal_mode 与 synchronous
+_READ_PRAGMAS = ('cache_size', 'mmap_size', 'temp_store', 'busy_timeout')
+
+
+def open_read_connection(db_file, profile='default'):
+    """打开一个只读连接，沿用指定配置中与读取相关的 PRAGMA，可在其他线程中使用"""
+    conn = sqlite3.connect(db_file, check_same_thread=False)
+    pragmas = CONNECTION_PROFILES[profile]
+    for name in _READ_PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {pragmas[name]}")
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def split_sql_statements(text):
+    """拆分完整的 SQL 文本；只有一条语句时跳过较慢的 sqlparse"""
+    # 找到第一个使前缀成为完整语句的分号（字符串常量中的分号不算），其后无内容即为单条语句
+    position = text.find(';')
+    while position != -1 and not sqlite3.complete_statement(text[:position + 1]):
+        position = text.find(';', position + 1)
+    if position == -1 or not text[position + 1:].strip():
+        return [text]
+    import sqlparse
+    return [statement for statement in sqlparse.split(text) if statement.strip()]
+
+
+# 只读查询语句的开头（允许前导注释）
+_READ_QUERY_RE = re.compile(r"\s*(?:(?:--[^\n]*(?:\n|$)|/\*.*?\*/)\s*)*(?:SELECT|WITH)\b", re.I | re.S)
+
+
+def is_read_query(sql):
+    """语句是否为 SELECT/WITH 查询；WITH 之后仍可能是写语句，执行时还需配合 query_only"""
+    return bool(_READ_QUERY_RE.match(sql))
+
+
+class ReadConnectionPool:
+    """
+    固定大小的只读连接池，供多个线程同时执行读查询
+    SQLite 在执行语句时会释放 GIL，CPU 密集的查询可以在多个核心上并行
+    """
+
+    def __init__(self, db_file, profile, size):
+        self.db_file = db_file
+        self.profile = profile
+        self.size = size
+        self._idle = queue.Queue()
+        self._connections = []
+        self._in_use = set()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取出一个空闲连接，连接数未达上限时新建，否则等待其他线程归还"""
+        with self._lock:
+            if self._idle.empty() and len(self._connections) < self.size:
+                conn = open_read_connection(self.db_file, self.profile)
+                self._connections.append(conn)
+                self._in_use.add(conn)
+                return conn
+        conn = self._idle.get()
+        with self._lock:
+            self._in_use.add(conn)
+        return conn
+
+    def release(self, conn):
+        with self._lock:
+            self._in_use.discard(conn)
+        self._idle.put(conn)
+
+    @contextlib.contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def interrupt_all(self):
+        """中止所有正在使用的连接上的查询"""
+        with self._lock:
+            for conn in self._in_use:
+                conn.interrupt()
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+            self._in_use.clear()
+            self._idle = queue.Queue()
+
+
+def _run_pooled_query(pool, sql, time_budget=0.0, row_budget=0):
+    """
+    在连接池的一个连接上执行只读查询
+    返回 (列名, 行列表, 是否超出行数预算被截断, 耗时秒)，超出时间预算时抛出 QueryCancelled
+    """
+    with pool.connection() as conn:
+        start = time.perf_counter()
+        deadline = start + time_budget if time_budget else None
+        if deadline:
+            conn.set_progress_handler(lambda: time.perf_counter() > deadline, 10000)
+        try:
+            cursor = conn.execute(sql)
+            if row_budget:
+                rows = cursor.fetchmany(row_budget + 1)
+                truncated = len(rows) > row_budget
+                rows = rows[:row_budget]
+            else:
+                rows, truncated = cursor.fetchall(), False
+        except sqlite3.OperationalError:
+            if deadline and time.perf_counter() > deadline:
+                raise QueryCancelled(f"超出时间预算 {time_budget:g} 秒")
+            raise
+        finally:
+            if deadline:
+                conn.set_progress_handler(None, 0)
+        headers = [desc[0] for desc in cursor.description] if cursor.description else []
+        return headers, rows, truncated, time.perf_counter() - start
+
+
+# 自然语言查询语法：(正则, 处理方法名, 附加参数)，按匹配优先级排列
+_NL_GRAMMAR = [
+    # 1. 基础比较查询（支持数值和字符串）
+    (r"查询表([a-zA-Z_]+)中([a-zA-Z_]+)(大于|小于|等于|不等于|大于等于|小于等于)(\d+|'[^']*')的数据",
+     '_build_comparison_query', ()),
+    # 2. 字符串模糊匹配
+    (r"查询表([a-zA-Z_]+)中([a-zA-Z_]+)(包含|等于|不等于)('?[^']*'?)的数据",
+     '_build_string_query', ()),
+    # 3. 查询特定字段（支持多种分隔符）
+    (r"查询表([a-zA-Z_]+)中([a-zA-Z_，,、\s]+)的数据",
+     '_build_fields_query', ()),
+    # 4. 查询所有数据
+    (r"查询表([a-zA-Z_]+)中所有数据",
+     '_build_select_all_query', ()),
+    # 5. 改进的逻辑组合查询（AND/OR条件，支持相同字段）
+    (r"查询表([a-zA-Z_]+)中(([a-zA-Z_]+)(大于|小于|等于|不等于|大于等于|小于等于)(\d+|'[^']*'))(并且|而且|且|and|或者|或|or)(([a-zA-Z_]+)(大于|小于|等于|不等于|大于等于|小于等于)(\d+|'[^']*'))的数据",
+     '_build_improved_logic_query', ()),
+    # 6. 范围查询（BETWEEN）
+    (r"查询表([a-zA-Z_]+)中([a-zA-Z_]+)(在|介于)(\d+|'[^']*')和(\d+|'[^']*')之间的数据",
+     '_build_between_query', ()),
+    # 7. 聚合查询
+    (r"查询表([a-zA-Z_]+)中([a-zA-Z_]+)的(最大值|最大|最高)",
+     '_build_aggregate_query', ('MAX',)),
+    (r"查询表([a-zA-Z_]+)中([a-zA-Z_]+)的(最小值|最小|最低)",
+     '_build_aggregate_query', ('MIN',)),
+    (r"查询表([a-zA-Z_]+)中([a-zA-Z_]+)的(平均值|平均)",
+     '_build_aggregate_query', ('AVG',)),
+    (r"查询表([a-zA-Z_]+)中([a-zA-Z_]+)的(总和|合计|总数)",
+     '_build_aggregate_query', ('SUM',)),
+    (r"查询表([a-zA-Z_]+)的记录数",
+     '_build_count_query', ()),
+]
+
+
+@lru_cache(maxsize=None)
+def _nl_dispatcher():
+    """
+    将全部自然语言语法合并为一个带命名分支的正则，进程内只编译一次
+    分支按原有顺序排列，re 的最左优先匹配保证与逐条 re.match 的结果一致
+    :return: (合并后的正则, {分支名: (分支组号, 处理方法名, 附加参数)})
+    """
+    branches = [f"(?P<nl{i}>{pattern})" for i, (pattern, _, _) in enumerate(_NL_GRAMMAR)]
+    combined = re.compile("|".join(branches))
+    routes = {f"nl{i}": (combined.groupindex[f"nl{i}"], handler, extra)
+              for i, (_, handler, extra) in enumerate(_NL_GRAMMAR)}
+    return combined, routes
+
+
+def _collapse_nl_whitespace(query):
+    """把自然语言查询中单引号常量之外的连续空白压缩为一个空格，常量内的空白原样保留"""
+    parts = re.split(r"('(?:[^']|'')*')", query.strip())
+    return "".join(part if i % 2 else re.sub(r"\s+", " ", part) for i, part in enumerate(parts))
+
+
+class _SqlKeyword(str):
+    """插入模式中不加引号的 SQL 关键字（如 CURRENT_TIMESTAMP），原样写入 INSERT 语句而不作为参数绑定"""
+
+    __repr__ = str.__str__  # 回显时不加引号，与字符串值区分
+
+
+class _BranchMatch:
+    """将合并正则中某个分支的分组映射回该分支自身的组号"""
+
+    def __init__(self, match, offset):
+        self._match = match
+        self._offset = offset
+
+    def group(self, index=0):
+        return self._match.group(self._offset + index)
+
+
+class QueryResultCache:
+    """按规范化 SQL 与绑定参数缓存只读查询结果，超出内存上限时按 LRU 淘汰"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # 键 -> (列名, 行列表, 估算字节数)
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.db_state = None  # 写入缓存时的 (data_version, schema_version)
+
+    def make_key(self, sql, params):
+        """生成缓存键：规范化后的 SQL 与绑定参数"""
+        return _normalize_sql(sql), tuple(params)
+
+    def get(self, key):
+        """取出缓存的 (列名, 行列表)，未命中返回 None"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0], entry[1]
+
+    def put(self, key, headers, rows, size):
+        """写入一条结果，必要时淘汰最久未使用的条目"""
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.used_bytes -= self.entries.pop(key)[2]
+        self.entries[key] = (headers, rows, size)
+        self.used_bytes += size
+        while self.used_bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self.entries.popitem(last=False)
+            self.used_bytes -= evicted_size
+
+    def clear(self):
+        """清空全部缓存条目"""
+        self.entries.clear()
+        self.used_bytes = 0
+
+
+# 全文索引为外部内容的 FTS5 虚拟表，命名为 <表名>_<列名>_fts
+_FULLTEXT_SQL_RE = re.compile(r"USING\s+fts5\s*\(\s*\"?(\w+)\"?\s*,\s*content\s*=\s*'(\w+)'", re.I)
+# FTS5 为每个虚拟表创建的影子表后缀
+_FTS5_SHADOW_SUFFIXES = ('_data', '_idx', '_docsize', '_config', '_content')
+
+
+def _fulltext_name(table_name, column):
+    return f"{table_name}_{column}_fts"
+
+
+def _like_uses_trigrams(pattern):
+    """LIKE 模式中是否有至少 3 个连续的非通配符字符，只有这样 trigram 索引才能生效"""
+    return isinstance(pattern, str) and any(len(run) >= 3 for run in re.split(r"[%_]", pattern))
+
+
+class SchemaCatalog:
+    """
+    进程内的表结构缓存：一次读取全部表名与列信息（列名、类型、主键标记等）
+    之后的查找都在内存中完成，只有 PRAGMA schema_version 变化时才重新加载
+    """
+
+    def __init__(self):
+        self.schema_version = None
+        self.tables = []  # 按 sqlite_master 顺序排列的表名（不含全文索引的虚拟表与影子表）
+        self.views = set()  # 视图的实际名称
+        self._names = {}  # 小写的表/视图名 -> 实际名称
+        self._columns = {}  # 实际名称 -> PRAGMA table_info 格式的列信息 (cid, name, type, notnull, dflt_value, pk)
+        self.fulltext = {}  # (小写表名, 小写列名) -> 全文索引名
+        self.rollups = {}  # 汇总表名 -> (时间粒度, 维度元组)
+
+    def refresh(self, conn):
+        """表结构有变化时重新加载，返回当前目录对象"""
+        version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        if version != self.schema_version:
+            self._load(conn)
+            self.schema_version = version
+        return self
+
+    def _load(self, conn):
+        objects = conn.execute("SELECT name, type, sql FROM sqlite_master WHERE type IN ('table', 'view')").fetchall()
+        self.fulltext = {}
+        internal = set()
+        for name, _, sql in objects:
+            match = _FULLTEXT_SQL_RE.search(sql or '')
+            if match and name == _fulltext_name(match.group(2), match.group(1)):
+                self.fulltext[(match.group(2).lower(), match.group(1).lower())] = name
+                internal.update([name] + [name + suffix for suffix in _FTS5_SHADOW_SUFFIXES])
+        self.rollups = {}
+        if any(name == ROLLUP_REGISTRY for name, _, _ in objects):
+            internal.add(ROLLUP_REGISTRY)
+            for name, granularity, dimensions in conn.execute(
+                    f"SELECT name, granularity, dimensions FROM {ROLLUP_REGISTRY}"):
+                self.rollups[name] = (granularity, tuple(filter(None, dimensions.split(','))))
+        self.tables = [name for name, kind, _ in objects if kind == 'table' and name not in internal]
+        self.views = {name for name, kind, _ in objects if kind == 'view'}
+        self._names = {name.lower(): name for name, _, _ in objects}
+        self._columns = {name: [] for name, _, _ in objects}
+        # 用 pragma_table_info 表值函数一次取出所有表和视图的列
+        try:
+            rows = conn.execute("SELECT m.name, p.cid, p.name, p.type, p.\"notnull\", p.dflt_value, p.pk "
+                                "FROM sqlite_master AS m JOIN pragma_table_info(m.name) AS p "
+                                "WHERE m.type IN ('table', 'view') ORDER BY m.name, p.cid").fetchall()
+        except sqlite3.Error:
+            # 某个视图引用的表已不存在时整条查询都会失败，改为逐个读取并跳过失效的视图
+            rows = []
+            for name in self._columns:
+                try:
+                    rows.extend((name,) + row for row in conn.execute(
+                        "SELECT cid, name, type, \"notnull\", dflt_value, pk FROM pragma_table_info(?)", (name,)))
+                except sqlite3.Error:
+                    pass
+        for row in rows:
+            self._columns[row[0]].append(row[1:])
+
+    def table_names(self, conn):
+        return list(self.refresh(conn).tables)
+
+    def resolve(self, conn, name):
+        """按不区分大小写的方式查找表或视图，返回实际名称，不存在时返回 None"""
+        return self.refresh(conn)._names.get(name.lower())
+
+    def is_view(self, conn, name):
+        """name 是否为视图"""
+        return self.resolve(conn, name) in self.views
+
+    def columns(self, conn, name):
+        """返回表或视图的列信息（格式同 PRAGMA table_info），不存在时返回空列表"""
+        actual = self.resolve(conn, name)
+        return list(self._columns[actual]) if actual else []
+
+    def fulltext_index(self, conn, table_name, column):
+        """返回列上的全文索引名，没有时返回 None"""
+        return self.refresh(conn).fulltext.get((table_name.lower(), column.lower()))
+
+    def fulltext_indexes(self, conn, table_name=None):
+        """返回 [(表名, 列名, 全文索引名)]，可只列出某个表的"""
+        self.refresh(conn)
+        return [(self._names[table], self._column_name(table, column), name)
+                for (table, column), name in self.fulltext.items()
+                if table_name is None or table == table_name.lower()]
+
+    def _column_name(self, table, column):
+        columns = self._columns.get(self._names.get(table), [])
+        return next((col[1] for col in columns if col[1].lower() == column), column)
+
+
+# 时间分桶汇总表（rollup）只针对 security_event 的 occur_time
+ROLLUP_SOURCE = 'security_event'
+ROLLUP_TIME_COLUMN = 'occur_time'
+ROLLUP_REGISTRY = 'rollup_registry'
+# 各粒度的分桶表达式，桶值都是 SQLite 可识别的时间字符串，便于再按更粗的粒度换算
+ROLLUP_BUCKETS = {
+    'hour': "strftime('%Y-%m-%d %H:00:00', {})",
+    'day': "date({})",
+    'month': "strftime('%Y-%m-01', {})",
+}
+_ROLLUP_RANKS = {'hour': 0, 'day': 1, 'month': 2, 'year': 3}
+# 规范的 occur_time 格式；只有全部数据都是该格式时，occur_time 的文本比较才能换算成桶值比较
+_CANONICAL_TIME_GLOB = "'[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]'"
+_STRFTIME_RANKS = {'H': 0, 'd': 1, 'm': 2, 'Y': 3}
+# 时间字面量对齐到的最粗粒度，依次尝试
+_ROLLUP_ALIGNMENTS = [
+    (2, re.compile(r"\d{4}-\d{2}-01(?: 00:00(?::00)?)?")),
+    (1, re.compile(r"\d{4}-\d{2}-\d{2}(?: 00:00(?::00)?)?")),
+    (0, re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:00(?::00)?")),
+]
+_ROLLUP_QUERY_RE = re.compile(
+    r"\s*SELECT\s+(?P<select>.+?)\s+FROM\s+(?P<table>\w+)"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?(?:\s+GROUP\s+BY\s+(?P<group>.+?))?(?:\s+HAVING\s+(?P<having>.+?))?"
+    r"(?:\s+ORDER\s+BY\s+(?P<order>.+?))?(?:\s+LIMIT\s+(?P<limit>.+?))?\s*;?\s*", re.I | re.S)
+_ROLLUP_COUNT_RE = re.compile(r"\bCOUNT\s*\(\s*(?:\*|1|event_id)\s*\)", re.I)
+_ROLLUP_AGGREGATE_RE = re.compile(r"\b(?:COUNT|SUM|AVG|MIN|MAX|TOTAL|GROUP_CONCAT)\s*\(", re.I)
+_ROLLUP_TIME_RE = re.compile(r"\b(date|strftime)\s*\(\s*(?:(\x00\d+\x00)\s*,\s*)?occur_time\s*\)", re.I)
+_ROLLUP_BOUND_RE = re.compile(r"occur_time\s*(>=|<)\s*(\x00\d+\x00|\?)", re.I)
+# 改写后的表达式中允许出现的非维度标识符
+_ROLLUP_WORDS = {'as', 'asc', 'desc', 'nulls', 'first', 'last', 'and', 'or', 'not', 'in', 'is', 'null', 'like',
+                 'glob', 'between', 'collate', 'nocase', 'sum', 'coalesce', 'date', 'strftime', 'bucket',
+                 'event_count'}
+
+
+def _split_top_level(text, separator=r","):
+    """按不在括号内的分隔符（正则）切分"""
+    parts, depth, start = [], 0, 0
+    for match in re.finditer(rf"\(|\)|{separator}", text, re.I):
+        token = match.group(0)
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth == 0:
+            parts.append(text[start:match.start()])
+            start = match.end()
+    parts.append(text[start:])
+    return [part.strip() for part in parts]
+
+
+def _rollup_bucket_value(value, granularity):
+    """把已对齐的时间字面量换算成该粒度桶值的格式"""
+    if granularity == 'hour':
+        return f"{value[:10]} {value[11:13] or '00'}:00:00"
+    return value[:10]
+
+
+def _rewrite_rollup_query(sql, params, rollups, exact_bounds=()):
+    """
+    把 security_event 上按时间桶和维度计数的查询改写为读取汇总表
+    只处理单表、只含 COUNT 聚合、时间条件为与桶边界对齐的 >= / < 的查询，结果与原查询一致
+    :param rollups: {汇总表名: (粒度, 维度元组)}
+    :param exact_bounds: 源数据的 occur_time 全部为规范格式的汇总表名；含时间条件的查询只能改写到这些汇总表
+    :return: (新 SQL, 新参数, 汇总表名)，无法改写时返回 None
+    """
+    literals = []
+
+    def mask(match):
+        literals.append(match.group(0))
+        return f"\x00{len(literals) - 1}\x00"
+
+    def unmask(text):
+        return re.sub(r"\x00(\d+)\x00", lambda m: literals[int(m.group(1))], text)
+
+    masked = re.sub(r"'(?:[^']|'')*'", mask, sql)
+    query = _ROLLUP_QUERY_RE.fullmatch(masked)
+    if (not rollups or query is None or query.group('table').lower() != ROLLUP_SOURCE
+            or len(re.findall(r"\bSELECT\b", masked, re.I)) != 1
+            or re.match(r"(?:DISTINCT|ALL)\b", query.group('select'), re.I)):
+        return None
+    grouped = query.group('group') is not None
+    clauses = [query.group(name) for name in ('select', 'group', 'having', 'order') if query.group(name)]
+    # COUNT(*) 之外的聚合无法由计数汇总表得出
+    if any(len(_ROLLUP_AGGREGATE_RE.findall(clause)) != len(_ROLLUP_COUNT_RE.findall(clause)) for clause in clauses):
+        return None
+
+    need_rank = 3
+
+    def bucket_expr(match):
+        nonlocal need_rank
+        function, fmt = match.group(1).lower(), match.group(2)
+        if function == 'date' and fmt is None:
+            need_rank = min(need_rank, 1)
+            return "date(bucket)"
+        if function != 'strftime' or fmt is None:
+            raise ValueError
+        specifiers = [spec for spec in re.findall(r"%(.)", literals[int(fmt.strip('\x00'))]) if spec != '%']
+        if any(spec not in _STRFTIME_RANKS for spec in specifiers):
+            raise ValueError
+        need_rank = min([need_rank] + [_STRFTIME_RANKS[spec] for spec in specifiers])
+        return f"strftime({fmt}, bucket)"
+
+    def convert(text, total=False):
+        text = _ROLLUP_COUNT_RE.sub("COALESCE(SUM(event_count), 0)" if total else "SUM(event_count)", text)
+        return _ROLLUP_TIME_RE.sub(bucket_expr, text)
+
+    try:
+        select_items = []
+        checked = []  # 检查列引用用的表达式（不含补上的列名别名）
+        aliases = set()
+        for item in _split_top_level(query.group('select')):
+            alias = re.search(r"(?:\s+AS\s+|(?<=\))\s*)\"?([A-Za-z_]\w*)\"?$", item, re.I)
+            if alias:
+                aliases.add(alias.group(1).lower())
+            if not grouped and not _ROLLUP_COUNT_RE.fullmatch(item[:alias.start()] if alias else item):
+                return None  # 不分组时只能查询计数
+            converted = convert(item, total=not grouped)
+            checked.append(converted)
+            if converted != item and not alias:
+                header = unmask(item).replace('"', '""')
+                converted = f'{converted} AS "{header}"'
+            select_items.append(converted)
+        rewritten = {name: convert(query.group(name)) for name in ('group', 'having', 'order') if query.group(name)}
+    except ValueError:
+        return None
+
+    # WHERE 中 occur_time 只能作为顶层 AND 条件出现，且边界须与桶对齐
+    conditions, bounds = [], []
+    where = query.group('where')
+    if where:
+        offset = query.start('where')
+        position = 0
+        for condition in _split_top_level(where, r"\bAND\b"):
+            position = where.index(condition, position)
+            bound = _ROLLUP_BOUND_RE.fullmatch(condition)
+            if bound:
+                token = bound.group(2)
+                if token == '?':
+                    index = masked[:offset + position + bound.start(2)].count('?')
+                    value = params[index] if index < len(params) else None
+                else:
+                    index, value = None, literals[int(token.strip('\x00'))][1:-1]
+                rank = next((rank for rank, pattern in _ROLLUP_ALIGNMENTS
+                             if isinstance(value, str) and pattern.fullmatch(value)), None)
+                if rank is None:
+                    return None
+                need_rank = min(need_rank, rank)
+                bounds.append((len(conditions), bound.group(1), index, value))
+                conditions.append(None)
+            else:
+                conditions.append(condition)
+            position += len(condition)
+
+    referenced = set()
+    for text in checked + [c for c in conditions if c] + list(rewritten.values()):
+        referenced.update(word.lower() for word in re.findall(r"[A-Za-z_]\w*", text))
+    referenced -= _ROLLUP_WORDS | aliases
+    candidates = [(len(dims), -_ROLLUP_RANKS[granularity], name)
+                  for name, (granularity, dims) in rollups.items()
+                  if _ROLLUP_RANKS[granularity] <= need_rank and referenced <= {dim.lower() for dim in dims}
+                  and (not bounds or name in exact_bounds)]
+    if not candidates:
+        return None
+    name = min(candidates)[2]
+    granularity = rollups[name][0]
+
+    new_params = list(params)
+    for slot, operator, index, value in bounds:
+        bucket = _rollup_bucket_value(value, granularity)
+        if index is None:
+            conditions[slot] = f"bucket {operator} '{bucket}'"
+        else:
+            conditions[slot] = f"bucket {operator} ?"
+            new_params[index] = bucket
+
+    parts = [f"SELECT {', '.join(select_items)} FROM {name}"]
+    if conditions:
+        parts.append("WHERE " + " AND ".join(conditions))
+    for keyword, clause in (('GROUP BY', 'group'), ('HAVING', 'having'), ('ORDER BY', 'order')):
+        if clause in rewritten:
+            parts.append(f"{keyword} {rewritten[clause]}")
+    if query.group('limit'):
+        parts.append(f"LIMIT {query.group('limit')}")
+    return unmask(" ".join(parts)), tuple(new_params), name
+
+
+def _estimate_row_size(row):
+    """粗略估算一行结果在内存中占用的字节数"""
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+
+
+class _RowSource:
+    """以游标接口（description/fetchmany/fetchall）提供内存中的结果行"""
+
+    def __init__(self, headers, rows):
+        self.description = [(header, None, None, None, None, None, None) for header in headers]
+        self._rows = rows
+        self._position = 0
+
+    def fetchmany(self, size):
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self):
+        return self.fetchmany(len(self._rows) - self._position)
+
+
+class _RecordingCursor:
+    """包装游标，在输出结果的同时记录行数据，读完且未超出上限时才可写入缓存"""
+
+    def __init__(self, cursor, max_bytes):
+        self.description = cursor.description
+        self._cursor = cursor
+        self._max_bytes = max_bytes
+        self.rows = []
+        self.size = 0
+        self.complete = False
+
+    def _record(self, rows, requested):
+        if self.rows is not None:
+            self.rows.extend(rows)
+            self.size += sum(_estimate_row_size(row) for row in rows)
+            if self.size > self._max_bytes:
+                self.rows = None  # 结果过大，放弃缓存
+        if requested is None or len(rows) < requested:
+            self.complete = True
+        return rows
+
+    def fetchmany(self, size):
+        return self._record(self._cursor.fetchmany(size), size)
+
+    def fetchall(self):
+        return self._record(self._cursor.fetchall(), None)
+
+
+class QueryCancelled(Exception):
+    """查询被 Ctrl-C 取消或超出时间/行数预算"""
+
+
+class BackgroundJob:
+    """在工作线程中用独立的只读连接执行查询，结果保存在内存中直到被取回"""
+
+    def __init__(self, job_id, command, sql, params, visualize, db_file, profile,
+                 time_budget=0.0, row_budget=0):
+        self.job_id = job_id
+        self.command = command
+        self.sql = sql
+        self.params = params
+        self.visualize = visualize  # 是否在工作线程中生成图表描述，取回结果时在主线程中绘图
+        self.db_file = db_file
+        self.profile = profile
+        self.time_budget = time_budget
+        self.row_budget = row_budget
+        self.status = 'running'  # running / done / failed / cancelled
+        self.headers = None
+        self.rows = None
+        self.error = None
+        self.truncated = False  # 结果超出行数预算被截断
+        self.chart = None  # visualize 时由 _build_chart_spec 生成的图表描述，或无法绘图的原因
+        self.notified = False  # 是否已提示用户任务结束
+        self.started = time.perf_counter()
+        self.finished = None
+        self._conn = None
+        self._deadline = self.started + time_budget if time_budget else None
+        self._stop_reason = None
+        self._thread = threading.Thread(target=self._run, name=f"job-{job_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _on_progress(self):
+        if self._stop_reason is None and self._deadline and time.perf_counter() > self._deadline:
+            self._stop_reason = f"超出时间预算 {self.time_budget:g} 秒"
+        return 1 if self._stop_reason else 0
+
+    def _run(self):
+        try:
+            self._conn = open_read_connection(self.db_file, self.profile)
+            self._conn.set_progress_handler(self._on_progress, 10000)
+            cursor = self._conn.execute(self.sql, self.params)
+            if self.row_budget:
+                rows = cursor.fetchmany(self.row_budget + 1)
+                self.truncated = len(rows) > self.row_budget
+                rows = rows[:self.row_budget]
+            else:
+                rows = cursor.fetchall()
+            self.headers = [desc[0] for desc in cursor.description]
+            self.rows = rows
+            if self.visualize and rows:
+                try:
+                    self.chart = _build_chart_spec(self._conn, self.sql, self.params)
+                except NoChartData as e:
+                    self.chart = str(e)
+            self.status = 'done'
+        except Exception as e:
+            if self._stop_reason:
+                self.error = self._stop_reason
+                self.status = 'cancelled'
+            else:
+                self.error = str(e)
+                self.status = 'failed'
+        finally:
+            if self._conn is not None:
+                self._conn.close()
+            self.finished = time.perf_counter()
+
+    def cancel(self):
+        """请求中止查询；可在其他线程中调用"""
+        if self.status == 'running':
+            self._stop_reason = "已被 kill 取消"
+            conn = self._conn
+            if conn is not None:
+                try:
+                    conn.interrupt()
+                except sqlite3.ProgrammingError:
+                    pass  # 连接已关闭，查询刚好结束
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+
+class CommandMetrics:
+    """
+    按命令汇总耗时直方图、返回行数、输出字节数与 SQL 语句数
+    可选地把每条命令的明细以 JSON lines 追加写入文件
+    """
+
+    # 延迟直方图的桶上限（毫秒），最后一个桶收集超出上限的值
+    BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+    def __init__(self):
+        self.commands = {}  # 命令名 -> 汇总数据
+        self.current = None  # 正在执行的命令明细
+        self.metrics_file = None
+
+    def _new_summary(self):
+        return {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'histogram': [0] * (len(self.BUCKETS_MS) + 1),
+                'rows': 0, 'bytes': 0, 'sql_statements': 0, 'phases': {}}
+
+    def begin(self, name, line):
+        """开始记录一条命令"""
+        self.current = {'command': name, 'line': line, 'rows': 0, 'bytes': 0,
+                        'sql_statements': 0, 'phases': {}}
+
+    def end(self, latency_ms):
+        """结束当前命令，计入汇总并写入明细文件"""
+        record, self.current = self.current, None
+        if record is None:
+            return
+        summary = self.commands.setdefault(record['command'], self._new_summary())
+        summary['count'] += 1
+        summary['total_ms'] += latency_ms
+        summary['max_ms'] = max(summary['max_ms'], latency_ms)
+        bucket = next((i for i, bound in enumerate(self.BUCKETS_MS) if latency_ms <= bound), len(self.BUCKETS_MS))
+        summary['histogram'][bucket] += 1
+        for key in ('rows', 'bytes', 'sql_statements'):
+            summary[key] += record[key]
+        for phase, ms in record['phases'].items():
+            summary['phases'][phase] = summary['phases'].get(phase, 0.0) + ms
+
+        if self.metrics_file is not None:
+            record['latency_ms'] = round(latency_ms, 3)
+            record['phases'] = {phase: round(ms, 3) for phase, ms in record['phases'].items()}
+            record['timestamp'] = datetime.datetime.now().isoformat(timespec='milliseconds')
+            try:
+                with open(self.metrics_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"写入指标文件失败，已停止记录: {e}")
+                self.metrics_file = None
+
+    def count_sql(self, statement=None):
+        """SQLite 跟踪回调：每执行一条语句计数一次"""
+        if self.current is not None:
+            self.current['sql_statements'] += 1
+
+    def add_rows(self, count):
+        if self.current is not None:
+            self.current['rows'] += count
+
+    def add_bytes(self, count):
+        if self.current is not None:
+            self.current['bytes'] += count
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """累计一个执行阶段（如 fetch、render）的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.current is not None:
+                phases = self.current['phases']
+                phases[name] = phases.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def percentile(self, summary, fraction):
+        """根据直方图估算分位数，返回所在桶的上限（毫秒）"""
+        target = summary['count'] * fraction
+        seen = 0
+        for i, count in enumerate(summary['histogram']):
+            seen += count
+            if count and seen >= target:
+                return self.BUCKETS_MS[i] if i < len(self.BUCKETS_MS) else summary['max_ms']
+        return summary['max_ms']
+
+    def reset(self):
+        self.commands.clear()
+
+
+class BatchRunner:
+    """
+    非交互地执行脚本中的工具命令与 SQL 语句
+    连续的写语句合并到同一个事务中，每 batch_size 条提交一次
+    """
+
+    # 合并到批量事务中的语句类型
+    WRITE_KEYWORDS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER')
+    # 只读语句，直接执行并输出结果
+    READ_KEYWORDS = ('SELECT', 'WITH', 'EXPLAIN', 'VALUES')
+    # 脚本自带的事务控制语句，出现后由脚本自行管理事务
+    TRANSACTION_KEYWORDS = ('BEGIN', 'COMMIT', 'END', 'ROLLBACK')
+
+    _LEADING_COMMENTS_RE = re.compile(r"^\s*(?:--[^\n]*(?:\n|$)\s*|/\*.*?\*/\s*)*", re.S)
+
+    def __init__(self, tool, batch_size=1000, timing=False):
+        self.tool = tool
+        self.conn = tool.db_connection
+        self.batch_size = batch_size
+        self.timing = timing
+        self.pending = 0  # 当前批次中尚未提交的写语句数
+        self.commits = 0
+        self.committed_line = 0  # 已提交的最后一条写语句所在行号
+        self.user_transaction = False
+        self.current_line = 0
+        self.counts = {'read': 0, 'write': 0, 'other': 0, 'command': 0}
+        self.timings = []  # (耗时秒, 行号, 语句摘要)
+
+    def run(self, stream):
+        """逐行读取脚本并执行，返回进程退出码：全部成功为 0，出错为 1"""
+        if self.conn is None:
+            print("数据库连接失败，无法执行批处理")
+            return 1
+        start = time.perf_counter()
+        buffer = []
+        buffer_line = 0
+        parallel_section = None  # 处于 parallel begin/end 段中时，收集的 SQL 行
+        try:
+            for lineno, line in enumerate(stream, 1):
+                line = line.rstrip('\n')
+                if parallel_section is not None:
+                    if " ".join(line.split()).lower() == 'parallel end':
+                        self._run_parallel("\n".join(parallel_section), buffer_line)
+                        parallel_section = None
+                    else:
+                        parallel_section.append(line)
+                    continue
+                if not buffer:
+                    stripped = line.strip()
+                    if not stripped or stripped.startswith(('--', '#')):
+                        continue
+                    if " ".join(stripped.split()).lower() == 'parallel begin':
+                        parallel_section = []
+                        buffer_line = lineno
+                        continue
+                    if self._is_tool_command(stripped):
+                        if self._run_command(stripped, lineno):
+                            # 脚本中执行了 quit，连接已关闭
+                            self._report(time.perf_counter() - start)
+                            return 0
+                        continue
+                    buffer_line = lineno
+                buffer.append(line)
+                text = "\n".join(buffer)
+                if sqlite3.complete_statement(text):
+                    for statement in split_sql_statements(text):
+                        self._run_sql(statement, buffer_line)
+                    buffer = []
+            if parallel_section is not None:
+                raise sqlite3.Error("parallel begin 缺少对应的 parallel end")
+            if buffer and "\n".join(buffer).strip():
+                # 文件末尾缺少分号的最后一条语句
+                self._run_sql("\n".join(buffer), buffer_line)
+            self._commit()
+        except sqlite3.Error as e:
+            print(f"第 {self.current_line} 行的语句执行失败: {e}")
+            if self.conn.in_transaction:
+                self.conn.rollback()
+                print(f"当前批次未提交的 {self.pending} 条写语句已回滚")
+            if self.committed_line:
+                print(f"第 {self.committed_line} 行及之前的写语句已提交")
+            self._report(time.perf_counter() - start)
+            return 1
+        self._report(time.perf_counter() - start)
+        return 0
+
+    def _is_tool_command(self, line):
+        """判断一行是否为工具命令（含插入模式下的数据行和自然语言查询）"""
+        if self.tool.in_insert_mode or line.startswith("查询表"):
+            return True
+        word = line.split(None, 1)[0]
+        return hasattr(self.tool, f"do_{word}")
+
+    def _run_parallel(self, text, lineno):
+        """并行执行 parallel begin/end 段中的只读语句，有语句失败时按执行错误处理"""
+        self._commit()
+        self.current_line = lineno
+        statements = [statement for statement in split_sql_statements(text) if self._keyword(statement)]
+        start = time.perf_counter()
+        failures = self.tool.run_parallel(statements)
+        self.counts['read'] += len(statements) - 1  # _record 再计入 1 条
+        self._record(time.perf_counter() - start, lineno, f"parallel ({len(statements)} 条查询)", 'read')
+        if failures:
+            raise sqlite3.Error(f"并行执行段中有 {failures} 条语句失败")
+
+    def _keyword(self, statement):
+        """返回语句的首个关键字（忽略开头的注释）"""
+        body = self._LEADING_COMMENTS_RE.sub('', statement, count=1)
+        return body.split(None, 1)[0].upper().rstrip(';') if body.strip() else ''
+
+    def _run_command(self, line, lineno):
+        """执行一条工具命令，执行前先提交已累积的写语句；命令出错时按执行错误处理"""
+        self._commit()
+        self.current_line = lineno
+        start = time.perf_counter()
+        stop = self.tool.onecmd(line)
+        self._record(time.perf_counter() - start, lineno, line, 'command')
+        self.conn = self.tool.db_connection  # init_db 等命令会重建连接
+        if self.tool.command_failed:
+            raise sqlite3.Error(f"命令 {line.split(None, 1)[0]} 执行失败")
+        return stop
+
+    def _run_sql(self, statement, lineno):
+        """执行一条 SQL 语句，写语句累积到当前批次中"""
+        keyword = self._keyword(statement)
+        if not keyword:
+            return
+        self.current_line = lineno
+        start = time.perf_counter()
+        cursor = self.conn.cursor()
+        if keyword in self.WRITE_KEYWORDS:
+            if not self.conn.in_transaction:
+                cursor.execute("BEGIN")
+            cursor.execute(statement)
+            self.pending += 1
+            kind = 'write'
+        elif keyword in self.READ_KEYWORDS:
+            cursor.execute(statement)
+            kind = 'read'
+        else:
+            if keyword in self.TRANSACTION_KEYWORDS:
+                if keyword == 'BEGIN':
+                    self._commit()
+                self.user_transaction = keyword == 'BEGIN'
+            else:
+                # PRAGMA、VACUUM 等语句可能无法在事务中执行
+                self._commit()
+            cursor.execute(statement)
+            kind = 'other'
+            if keyword in ('COMMIT', 'END', 'ROLLBACK') and not self.conn.in_transaction:
+                self.pending = 0
+                if keyword != 'ROLLBACK':
+                    self.commits += 1
+                    self.committed_line = lineno
+        if cursor.description:
+            self.tool.render_results(cursor)
+        self._record(time.perf_counter() - start, lineno, statement, kind)
+        if kind == 'write':
+            self.tool._mark_data_changed()
+            if self.pending >= self.batch_size:
+                self._commit(lineno)
+
+    def _commit(self, lineno=None):
+        """提交当前批次（脚本自行管理事务时不提交）"""
+        if self.user_transaction or not self.conn.in_transaction:
+            return
+        self.conn.commit()
+        self.commits += 1
+        self.pending = 0
+        if lineno is not None:
+            self.committed_line = lineno
+        elif self.timings:
+            self.committed_line = self.timings[-1][1]
+
+    def _record(self, elapsed, lineno, text, kind):
+        """记录一条语句的耗时"""
+        self.counts[kind] += 1
+        summary = " ".join(text.split())[:60]
+        self.timings.append((elapsed, lineno, summary))
+        if self.timing:
+            print(f"[第 {lineno} 行] {elapsed * 1000:.2f} ms  {summary}")
+
+    def _report(self, elapsed):
+        """输出批处理的汇总信息"""
+        total = sum(self.counts.values())
+        print(f"批处理完成：共执行 {total} 条（读 {self.counts['read']}，写 {self.counts['write']}，"
+              f"其他 {self.counts['other']}，工具命令 {self.counts['command']}），"
+              f"提交 {self.commits} 次事务，总耗时 {elapsed:.2f} 秒")
+        slowest = sorted(self.timings, reverse=True)[:5]
+        if slowest:
+            print("耗时最长的语句:")
+            for seconds, lineno, summary in slowest:
+                print(f"  [第 {lineno} 行] {seconds * 1000:.2f} ms  {summary}")
+
+
+class SyntheticDataGenerator:
+    """
+    为 user_info、security_event、user_feedback、system_record 按块生成仿真数据
+    所有随机取值都由 NumPy 向量化生成；相同的种子和相同的已有数据得到相同的结果
+    """
+    # 时间字段的分布区间（UTC），固定区间保证同一种子生成的数据可复现
+    TIME_RANGE = ('2024-06-01', '2025-06-01')
+    # 一天中各小时的相对频度：夜间与上下班时段较多
+    HOUR_WEIGHTS = [5, 4, 4, 3, 3, 3, 4, 6, 9, 8, 6, 5, 5, 5, 6, 6, 7, 9, 8, 6, 5, 5, 5, 5]
+
+    EVENT_TYPES = ['入侵报警', '火灾报警', '设备故障', '异常行为', '系统告警']
+    EVENT_TYPE_WEIGHTS = [0.15, 0.03, 0.37, 0.15, 0.30]
+    EVENT_LEVELS = ['紧急', '中等', '一般']
+    # 各事件类型下 紧急/中等/一般 的概率，火灾与入侵以紧急为主
+    EVENT_LEVEL_WEIGHTS = [
+        [0.60, 0.30, 0.10],
+        [0.85, 0.10, 0.05],
+        [0.05, 0.25, 0.70],
+        [0.20, 0.50, 0.30],
+        [0.05, 0.20, 0.75],
+    ]
+    EVENT_DESCS = [
+        ['检测到人员翻越围墙', '门禁被强行打开', '夜间发现可疑人员徘徊', '红外对射被触发'],
+        ['烟感探测器报警', '温感探测器温度异常', '发现明火', '配电箱冒烟'],
+        ['摄像头离线', '门禁控制器无响应', '硬盘录像机存储已满', '网络交换机端口故障'],
+        ['人员长时间滞留', '车辆逆行', '人员聚集', '物品遗留'],
+        ['服务器 CPU 使用率过高', '数据库连接数超限', '视频流中断', '时钟同步失败'],
+    ]
+    LOCATIONS = ['南门', '北门', '东门', '西门', '办公楼1层', '办公楼2层', '办公楼3层', '停车场A区',
+                 '停车场B区', '金库附近', '监控中心', '机房', '仓库', '食堂', '围墙东段', '围墙西段']
+    # 地点按 1/排名 的频度分布，出入口与停车场最常出现
+    LOCATION_SKEW = 1.0
+
+    FEEDBACK_TYPES = ['建议', '投诉', '咨询']
+    FEEDBACK_TYPE_WEIGHTS = [0.45, 0.30, 0.25]
+    FEEDBACK_CONTENTS = [
+        ['希望增加移动端查看功能', '报警推送能否增加声音提醒', '建议增加夜间巡逻频次', '希望支持导出周报'],
+        ['监控画面有时卡顿', '部分区域摄像头存在死角', '报警误报较多', '门禁刷卡反应慢'],
+        ['如何申请查看历史记录', '如何修改绑定手机号', '报警级别是如何划分的', '访客如何登记'],
+    ]
+    # 留下联系方式的反馈比例
+    CONTACT_RATE = 0.7
+
+    RECORD_TYPES = ['登录', '操作', '添加', '处理', '导出']
+    RECORD_TYPE_WEIGHTS = [0.40, 0.25, 0.08, 0.20, 0.07]
+    RECORD_CONTENTS = [
+        ['管理员登录系统', '用户登录系统', '通过移动端登录'],
+        ['修改了报警阈值设置', '调整了摄像头角度', '更新了门禁权限'],
+        ['添加了新摄像头设备', '添加了新用户', '添加了巡逻路线'],
+        ['处理了入侵报警事件', '处理了设备故障工单', '确认了火灾报警为误报'],
+        ['导出了本周报警记录', '导出了访客登记表', '导出了设备清单'],
+    ]
+
+    PHONE_PREFIXES = ['139', '150', '186', '177', '135', '188']
+    EMAIL_DOMAINS = ['example.com', 'example.org', 'example.net']
+    EMAIL_DOMAIN_WEIGHTS = [0.6, 0.25, 0.15]
+
+    INSERT_SQL = {
+        'user_info': "INSERT INTO user_info (user_id, username, phone, email) VALUES (?, ?, ?, ?)",
+        'security_event': "INSERT INTO security_event (event_type, event_level, event_desc, location, occur_time) "
+                          "VALUES (?, ?, ?, ?, datetime(?, 'unixepoch'))",
+        'user_feedback': "INSERT INTO user_feedback (user_id, feedback_type, content, contact_info) VALUES (?, ?, ?, ?)",
+        'system_record': "INSERT INTO system_record (record_type, content, operator_id, operate_time) "
+                         "VALUES (?, ?, ?, datetime(?, 'unixepoch'))",
+    }
+    # 需要从 user_info 取外键的表
+    USER_FK_TABLES = ('user_feedback', 'system_record')
+
+    def __init__(self, seed=None):
+        import numpy as np
+        self.np = np
+        self.rng = np.random.default_rng(seed)
+        start, end = (calendar.timegm(time.strptime(day, '%Y-%m-%d')) for day in self.TIME_RANGE)
+        self.time_start, self.time_end = start, end
+        self.user_ids = None
+        self.user_phones = None
+        self._feedback_p = None
+        self._operator_p = None
+        self._feedback_order = None
+
+    def load_users(self, conn):
+        """读取已有的用户 ID 与手机号，作为外键的取值范围"""
+        np = self.np
+        rows = conn.execute("SELECT user_id, phone FROM user_info ORDER BY user_id").fetchall()
+        if not rows:
+            raise ValueError("user_info 表中没有用户，请先生成 user_info 数据")
+        ids, phones = zip(*rows)
+        self.user_ids = np.array(ids, dtype=np.int64)
+        self.user_phones = np.array(phones, dtype=object)
+        count = len(ids)
+        ranks = np.arange(1, count + 1, dtype=np.float64)
+        # 反馈者：少数活跃用户贡献大部分反馈，活跃用户在 ID 上随机分布
+        self._feedback_order = self.rng.permutation(count)
+        self._feedback_p = self._normalized(ranks ** -0.8)
+        # 操作者：集中在最早创建的少数账号（管理员）
+        self._operator_p = self._normalized(ranks ** -1.5)
+
+    def _normalized(self, weights):
+        weights = self.np.asarray(weights, dtype=self.np.float64)
+        return weights / weights.sum()
+
+    def _pick(self, values, weights, n):
+        """按权重抽取 n 个取值的下标"""
+        return self.rng.choice(len(values), size=n, p=self._normalized(weights))
+
+    def _conditional_pick(self, given, table, n):
+        """对每行按 table[given] 给出的条件概率抽取下标"""
+        np = self.np
+        cumulative = np.cumsum(np.asarray(table, dtype=np.float64), axis=1)
+        cumulative /= cumulative[:, -1:]
+        draws = self.rng.random(n)
+        return (draws[:, None] > cumulative[given]).sum(axis=1)
+
+    def _texts(self, pools, group, n):
+        """从每组的文案池中随机抽取一条，pools 各组长度可以不同"""
+        np = self.np
+        flat = np.array([text for pool in pools for text in pool], dtype=object)
+        offsets = np.cumsum([0] + [len(pool) for pool in pools[:-1]])
+        sizes = np.array([len(pool) for pool in pools])
+        index = offsets[group] + (self.rng.random(n) * sizes[group]).astype(np.int64)
+        return flat[index]
+
+    def _timestamps(self, n, chunk, chunks):
+        """
+        返回第 chunk 块的 n 个 UNIX 时间戳：各块依次覆盖时间区间中相邻的一段，
+        块内按日期均匀、按 HOUR_WEIGHTS 分布小时并排序，使自增 ID 与时间大致同序
+        """
+        np = self.np
+        span = (self.time_end - self.time_start) / chunks
+        low = self.time_start + span * chunk
+        base = self.rng.uniform(low, low + span, n).astype(np.int64)
+        days = base - base % 86400
+        hours = self._pick(self.HOUR_WEIGHTS, self.HOUR_WEIGHTS, n)
+        seconds = self.rng.integers(0, 3600, n)
+        stamps = days + hours * 3600 + seconds
+        stamps.sort()
+        return stamps
+
+    def chunk(self, table, n, chunk=0, chunks=1, first_id=1):
+        """生成 table 的 n 行数据，返回可直接交给 executemany 的行迭代器"""
+        np = self.np
+        if table == 'user_info':
+            ids = np.arange(first_id, first_id + n, dtype=np.int64)
+            prefixes = np.array(self.PHONE_PREFIXES, dtype=object)[self.rng.integers(0, len(self.PHONE_PREFIXES), n)]
+            domains = np.array(self.EMAIL_DOMAINS, dtype=object)[
+                self._pick(self.EMAIL_DOMAINS, self.EMAIL_DOMAIN_WEIGHTS, n)]
+            # 手机号与邮箱都由唯一的 ID 派生，保证 UNIQUE 约束
+            names = [f"user{i}" for i in ids.tolist()]
+            phones = [f"{p}{i:08d}" for p, i in zip(prefixes.tolist(), ids.tolist())]
+            emails = [f"{name}@{d}" for name, d in zip(names, domains.tolist())]
+            columns = [ids.tolist(), names, phones, emails]
+        elif table == 'security_event':
+            types = self._pick(self.EVENT_TYPES, self.EVENT_TYPE_WEIGHTS, n)
+            levels = self._conditional_pick(types, self.EVENT_LEVEL_WEIGHTS, n)
+            locations = self._pick(self.LOCATIONS,
+                                   np.arange(1, len(self.LOCATIONS) + 1, dtype=np.float64) ** -self.LOCATION_SKEW, n)
+            columns = [
+                np.array(self.EVENT_TYPES, dtype=object)[types].tolist(),
+                np.array(self.EVENT_LEVELS, dtype=object)[levels].tolist(),
+                self._texts(self.EVENT_DESCS, types, n).tolist(),
+                np.array(self.LOCATIONS, dtype=object)[locations].tolist(),
+                self._timestamps(n, chunk, chunks).tolist(),
+            ]
+        elif table == 'user_feedback':
+            users = self._feedback_order[self.rng.choice(len(self.user_ids), size=n, p=self._feedback_p)]
+            types = self._pick(self.FEEDBACK_TYPES, self.FEEDBACK_TYPE_WEIGHTS, n)
+            contacts = self.user_phones[users]
+            contacts[self.rng.random(n) >= self.CONTACT_RATE] = None
+            columns = [
+                self.user_ids[users].tolist(),
+                np.array(self.FEEDBACK_TYPES, dtype=object)[types].tolist(),
+                self._texts(self.FEEDBACK_CONTENTS, types, n).tolist(),
+                contacts.tolist(),
+            ]
+        elif table == 'system_record':
+            operators = self.rng.choice(len(self.user_ids), size=n, p=self._operator_p)
+            types = self._pick(self.RECORD_TYPES, self.RECORD_TYPE_WEIGHTS, n)
+            columns = [
+                np.array(self.RECORD_TYPES, dtype=object)[types].tolist(),
+                self._texts(self.RECORD_CONTENTS, types, n).tolist(),
+                self.user_ids[operators].tolist(),
+                self._timestamps(n, chunk, chunks).tolist(),
+            ]
+        else:
+            raise ValueError(f"不支持为表 {table} 生成数据")
+        return zip(*columns)
+
 
 class MyCommandLineTool(cmd.Cmd):
     prompt = '> '  # 命令行提示符
 
-    def __init__(self):
+    def __init__(self, profile='default'):
         super().__init__()
         print("欢迎使用命令行工具！")
         self.db_file = os.path.join(os.getcwd(), 'project2025.db')
+        self.profile = profile  # 连接性能配置，见 CONNECTION_PROFILES
+        self.metrics = CommandMetrics()  # 需在打开连接前创建，连接的跟踪回调会用到
+        self.schema = SchemaCatalog()  # 表结构缓存，表结构变化时自动重新加载
+        self.progress_interval = 10000  # 每执行多少条虚拟机指令回调一次进度处理函数
+        self._command_depth = 0  # onecmd 的嵌套层数，只统计最外层命令
+        self.command_failed = False  # 最近一条最外层命令是否出错，由各命令的出错分支设置
 
         # 在初始化时检测数据库是否存在
         if not os.path.exists(self.db_file):
@@ -21,17 +1521,66 @@ class MyCommandLineTool(cmd.Cmd):
             self.db_connection = self.reset_system()  # 仅在不存在时调用初始化
         else:
             print("数据库project2025已存在，直接连接")
-            self.db_connection = sqlite3.connect(self.db_file)
+            self.db_connection = self.connect()
         
         # 初始化插入模式相关属性
         self.insert_table = None
         self.insert_values = []
+        self.insert_column_count = 0
+        self.insert_auto_flush = 0  # 累计多少行自动提交一次，0 表示输入 ';' 时才提交
+        self.insert_chunk_size = 500  # 每个保存点写入的行数，失败时只回滚该块
+        self.insert_flushed_rows = 0
+        self.insert_inserted_rows = 0
         self.in_insert_mode = False
 
+        # 流式分页输出相关属性
+        self.stream_output = True  # 是否以流式分页方式输出查询结果
+        self.page_size = 50  # 每页行数，同时也是计算列宽的样本大小
+        self.page_history = 20  # 最多保留的已读页数，用于向前翻页
+        self.batch_mode = False  # 批处理模式下不做交互式翻页
+
+        # 批量导入相关属性
+        self.import_chunk_size = 10000  # 每次 executemany 写入的行数
+        self.generate_chunk_size = 50000  # generate_data 每块生成并写入的行数
+        self.generate_commit_rows = 1000000  # generate_data 每个事务最多写入的行数
+        self.export_chunk_size = 10000  # 导出时每次 fetchmany 读取的行数，也是内存中最多保留的行数
+
+        # 自然语言查询到 SQL 的 LRU 缓存
+        self.nl_cache = OrderedDict()
+        self.nl_cache_size = 256
+        self.nl_cache_hits = 0
+        self.nl_cache_misses = 0
+
+        # 只读查询结果缓存，默认关闭，使用 cache 命令开启
+        self.result_cache = None
+
+        # 单条查询的时间/行数预算，0 表示不限制，使用 budget 命令设置
+        self.query_time_budget = 0.0  # 秒
+        self.query_row_budget = 0
+        self._query = None  # 正在执行的受控查询的进度信息
+
+        # 图表输出：window 在窗口中显示，file 以 Agg 后端渲染到 chart_dir 中的文件（无图形界面时默认）
+        self.chart_mode = 'window' if _has_display() else 'file'
+        self.chart_dir = os.path.join(os.getcwd(), 'charts')
+        self.chart_format = 'png'
+        self.chart_counter = 0
+        # 已渲染图表的 LRU 缓存：(规范化 SQL, 参数, 格式, 数据版本) -> 图片字节
+        self.chart_cache = OrderedDict()
+        self.chart_cache_size = 64
+        self.write_generation = 0  # 本连接每次写入后加 1，本连接的提交不会改变 data_version
+
+        # 并行查询使用的只读连接池，首次使用时创建
+        self.read_pool = None
+        self.parallel_workers = os.cpu_count() or 4
+
+        # 后台查询任务，任务编号 -> BackgroundJob，结果取回后移除
+        self.jobs = OrderedDict()
+        self.next_job_id = 1
+
     def reset_system(self):
         """创建数据库并初始化"""
         try:
-            conn = sqlite3.connect(self.db_file)
+            conn = self.connect()
             print("数据库project2025已创建")
 
             cursor = conn.cursor()
@@ -47,14 +1596,465 @@ class MyCommandLineTool(cmd.Cmd):
                         # 删除表
                         cursor.execute(f"DROP TABLE IF EXISTS {table_name};")
                     except Exception as e:
+                        self.command_failed = True
                         print(f"表 {table_name} 无法删除，错误信息: {e}")
 
             conn.commit()
             return conn
         except Exception as e:
+            self.command_failed = True
             print(f"系统初始化失败: {e}")
             return None
 
+    def connect(self):
+        """打开数据库连接并应用当前的连接性能配置"""
+        conn = sqlite3.connect(self.db_file)
+        apply_connection_profile(conn, self.profile)
+        conn.set_trace_callback(self.metrics.count_sql)
+        conn.set_progress_handler(self._on_progress, self.progress_interval)
+        return conn
+
+    def _on_progress(self):
+        """SQLite 进度回调：返回非 0 时中止当前语句"""
+        query = self._query
+        if query is None:
+            return 0
+        query['ticks'] += 1
+        if query['reason'] is None and query['deadline'] and time.perf_counter() > query['deadline']:
+            query['reason'] = f"超出时间预算 {self.query_time_budget:g} 秒"
+        return 1 if query['reason'] else 0
+
+    def _on_sigint(self, signum, frame):
+        """Ctrl-C：执行查询时只中止当前语句，其余情况取消当前命令"""
+        query = self._query
+        if query is None or query['waiting']:
+            raise KeyboardInterrupt
+        query['reason'] = "已按 Ctrl-C 取消"
+        if self.db_connection is not None:
+            self.db_connection.interrupt()
+
+    @contextlib.contextmanager
+    def _query_guard(self):
+        """
+        在时间/行数预算内执行查询，Ctrl-C 只取消当前语句
+        中止时回滚未提交的修改，并输出已执行的时间、指令数与返回行数
+        """
+        if self._query is not None:
+            yield  # 外层已受控
+            return
+        start = time.perf_counter()
+        budget = self.query_time_budget
+        self._query = {'start': start, 'deadline': start + budget if budget else None,
+                       'ticks': 0, 'rows': 0, 'waited': 0.0, 'waiting': False, 'reason': None}
+        try:
+            yield
+        except (sqlite3.OperationalError, QueryCancelled):
+            query = self._query
+            if query['reason'] is None:
+                raise
+            self.command_failed = True
+            rolled_back = self.db_connection.in_transaction
+            if rolled_back:
+                self.db_connection.rollback()
+            elapsed = time.perf_counter() - query['start'] - query['waited']
+            print(f"查询已中止（{query['reason']}）：耗时 {elapsed:.2f} 秒，"
+                  f"约执行 {query['ticks'] * self.progress_interval} 条虚拟机指令，已返回 {query['rows']} 行")
+            if rolled_back:
+                print("未提交的修改已回滚")
+        finally:
+            self._query = None
+
+    @contextlib.contextmanager
+    def _read_only(self):
+        """在块内临时开启 PRAGMA query_only，任何写入都会报错而不会执行"""
+        conn = self.db_connection
+        previous = conn.execute("PRAGMA query_only").fetchone()[0]
+        conn.execute("PRAGMA query_only = ON")
+        try:
+            yield
+        finally:
+            conn.execute(f"PRAGMA query_only = {previous}")
+
+    def _take_row_budget(self, size):
+        """按行数预算限制本次读取的行数；预算已用完或查询已被取消时抛出 QueryCancelled"""
+        query = self._query
+        if query is None:
+            return size
+        self._check_query_budget()
+        if self.query_row_budget:
+            return min(size, self.query_row_budget - query['rows'] + 1)
+        return size
+
+    def _count_query_rows(self, rows):
+        """累计受控查询已返回的行数，超出行数预算时截断并标记中止"""
+        query = self._query
+        if query is None:
+            return rows
+        remaining = self.query_row_budget - query['rows'] if self.query_row_budget else None
+        if remaining is not None and len(rows) > remaining:
+            rows = rows[:remaining]
+            query['reason'] = f"超出行数预算 {self.query_row_budget} 行"
+        query['rows'] += len(rows)
+        return rows
+
+    def _check_query_budget(self):
+        """受控查询已被标记中止时抛出 QueryCancelled"""
+        if self._query is not None and self._query['reason']:
+            raise QueryCancelled(self._query['reason'])
+
+    def do_budget(self, arg):
+        """
+        设置单条查询的时间/行数预算，超出后中止查询并显示已完成的进度
+        用法: budget | budget time <秒> | budget rows <行数> | budget off
+        执行查询时按 Ctrl-C 只取消当前语句，不会退出命令行
+        """
+        args = arg.split()
+        action = args[0].lower() if args else ''
+        if action == 'off':
+            self.query_time_budget = 0.0
+            self.query_row_budget = 0
+            print("已取消查询预算")
+        elif action in ('time', 'rows') and len(args) == 2:
+            try:
+                value = float(args[1]) if action == 'time' else int(args[1])
+            except ValueError:
+                value = -1
+            if value < 0:
+                self.command_failed = True
+                print("预算必须是非负数，0 表示不限制")
+                return
+            if action == 'time':
+                self.query_time_budget = value
+            else:
+                self.query_row_budget = value
+        elif action:
+            self.command_failed = True
+            print("参数错误，用法: budget | budget time <秒> | budget rows <行数> | budget off")
+            return
+        time_budget = f"{self.query_time_budget:g} 秒" if self.query_time_budget else "不限"
+        row_budget = f"{self.query_row_budget} 行" if self.query_row_budget else "不限"
+        print(f"查询时间预算: {time_budget}，行数预算: {row_budget}")
+
+    def _command_name(self, line):
+        """确定一行输入对应的命令名，用于指标统计"""
+        if self.in_insert_mode:
+            return 'insert_into'
+        name = self.parseline(line)[0]
+        if name and hasattr(self, 'do_' + name):
+            return name
+        if line.strip().startswith('查询表'):
+            return 'natural_language'
+        return 'unknown'
+
+    def onecmd(self, line):
+        """执行一条命令，并记录其耗时、返回行数和输出字节数"""
+        if self._command_depth or not line.strip():
+            return super().onecmd(line)
+        if not self.in_insert_mode and line.rstrip().endswith('&'):
+            line = 'bg ' + line.rstrip()[:-1]  # 以 & 结尾的命令在后台执行
+        self.metrics.begin(self._command_name(line), line.strip())
+        self.command_failed = False
+        self._command_depth += 1
+        try:
+            previous_handler = signal.signal(signal.SIGINT, self._on_sigint)
+        except ValueError:
+            previous_handler = None  # 非主线程中无法设置信号处理函数
+        start = time.perf_counter()
+        try:
+            return super().onecmd(line)
+        except KeyboardInterrupt:
+            self.command_failed = True
+            if self.db_connection is not None and self.db_connection.in_transaction:
+                self.db_connection.rollback()
+            print("\n命令已取消")
+        finally:
+            if previous_handler is not None:
+                signal.signal(signal.SIGINT, previous_handler)
+            self._command_depth -= 1
+            self.metrics.end((time.perf_counter() - start) * 1000)
+
+    def do_stats(self, arg):
+        """
+        查看各命令的耗时、返回行数与输出字节数统计
+        用法: stats | stats reset | stats file <路径> | stats file off
+        """
+        args = arg.split(maxsplit=1)
+        action = args[0].lower() if args else ''
+        metrics = self.metrics
+        if action == 'reset':
+            metrics.reset()
+            print("命令统计已清空")
+        elif action == 'file':
+            if len(args) < 2:
+                print(f"当前指标文件: {metrics.metrics_file or '未设置'}")
+            elif args[1].strip().lower() == 'off':
+                metrics.metrics_file = None
+                print("已停止写入指标文件")
+            else:
+                metrics.metrics_file = os.path.abspath(args[1].strip())
+                print(f"每条命令的指标将以 JSON lines 追加写入 {metrics.metrics_file}")
+        elif not action:
+            commands = {name: summary for name, summary in metrics.commands.items() if name != 'stats'}
+            if not commands:
+                print("暂无命令统计数据")
+                return
+            print(f"{'命令':<20}{'次数':>6}{'平均ms':>10}{'p50ms':>9}{'p95ms':>9}{'最大ms':>10}"
+                  f"{'行数':>10}{'输出KB':>10}{'SQL数':>8}")
+            for name, summary in sorted(commands.items(), key=lambda item: -item[1]['total_ms']):
+                count = summary['count']
+                print(f"{name:<20}{count:>8}{summary['total_ms'] / count:>12.2f}"
+                      f"{metrics.percentile(summary, 0.5):>11.0f}{metrics.percentile(summary, 0.95):>11.0f}"
+                      f"{summary['max_ms']:>12.2f}{summary['rows']:>12}{summary['bytes'] / 1024:>12.1f}"
+                      f"{summary['sql_statements']:>9}")
+                if summary['phases']:
+                    phases = ", ".join(f"{phase} {ms / count:.2f}" for phase, ms in sorted(summary['phases'].items()))
+                    print(f"{'':<4}各阶段平均耗时(ms): {phases}")
+            print("p50/p95 为所在直方图桶的上限，桶边界(ms): " + ", ".join(map(str, CommandMetrics.BUCKETS_MS)))
+        else:
+            self.command_failed = True
+            print("参数错误，用法: stats | stats reset | stats file <路径> | stats file off")
+
+    def do_bg(self, arg):
+        """
+        在后台执行只读查询，命令行可以继续使用；也可以在命令末尾加 & 代替 bg 前缀
+        用法: bg select_data <SQL> [visualon] | bg <自然语言查询> | bg <SELECT 语句>
+        使用 jobs 查看任务，fg <编号> 取回结果，kill <编号> 中止任务
+        注意：default 配置下后台读取期间本连接的写操作可能因数据库被锁定而失败，可切换到 interactive 配置（WAL）
+        """
+        line = arg.strip()
+        if not line:
+            self.command_failed = True
+            print("请提供要在后台执行的查询")
+            return
+        visualize = False
+        name, rest, _ = self.parseline(line)
+        if name == 'select_data':
+            sql = rest.strip()
+            if sql.lower().endswith('visualon'):
+                visualize = True
+                sql = sql[:-len('visualon')].strip()
+            params = ()
+        elif line.startswith('查询表'):
+            parsed = self.parse_natural_language(line)
+            if not parsed:
+                self.command_failed = True
+                print("无法解析该自然语言查询")
+                return
+            sql, params = parsed
+        else:
+            sql, params = line, ()
+        if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            self.command_failed = True
+            print("后台模式只支持只读查询（select_data、自然语言查询或 SELECT 语句）")
+            return
+
+        job = BackgroundJob(self.next_job_id, line, sql, params, visualize, self.db_file, self.profile,
+                            self.query_time_budget, self.query_row_budget)
+        self.next_job_id += 1
+        self.jobs[job.job_id] = job
+        job.start()
+        print(f"[{job.job_id}] 已在后台执行: {line}")
+
+    def do_jobs(self, arg):
+        """列出后台查询任务及其状态"""
+        if not self.jobs:
+            print("没有后台任务")
+            return
+        status_names = {'running': '运行中', 'done': '已完成', 'failed': '失败', 'cancelled': '已中止'}
+        for job in self.jobs.values():
+            detail = f"{len(job.rows)} 行" if job.rows is not None else (job.error or "")
+            print(f"[{job.job_id}] {status_names[job.status]:<4} {job.elapsed():>8.2f}s  {detail:<12} {job.command}")
+            job.notified = job.status != 'running'
+
+    def _get_job(self, arg, default_to_latest=True):
+        """按编号查找任务，未指定编号时取最近的任务"""
+        arg = arg.strip().lstrip('%')
+        if not arg:
+            if default_to_latest and self.jobs:
+                return next(reversed(self.jobs.values()))
+            self.command_failed = True
+            print("请指定任务编号")
+            return None
+        if not arg.isdigit() or int(arg) not in self.jobs:
+            self.command_failed = True
+            print(f"没有编号为 {arg} 的后台任务")
+            return None
+        return self.jobs[int(arg)]
+
+    def do_fg(self, arg):
+        """
+        取回后台任务的结果并输出，任务仍在运行时等待其完成（Ctrl-C 停止等待，任务继续运行）
+        用法: fg [任务编号]
+        """
+        job = self._get_job(arg)
+        if job is None:
+            return
+        if job.status == 'running':
+            print(f"[{job.job_id}] 等待任务完成...")
+            while not job.wait(0.2):
+                pass
+        del self.jobs[job.job_id]
+        job.notified = True
+        if job.status != 'done':
+            self.command_failed = True
+            print(f"[{job.job_id}] 任务{'已中止' if job.status == 'cancelled' else '失败'}: {job.error}")
+            return
+        print(f"[{job.job_id}] {job.command}（耗时 {job.elapsed():.2f} 秒）")
+        self.render_results(_RowSource(job.headers, job.rows))
+        if job.truncated:
+            print(f"结果超出行数预算 {job.row_budget} 行，仅保留了前 {job.row_budget} 行")
+        if isinstance(job.chart, dict):
+            self._show_chart(job.chart)
+        elif job.chart:
+            print(job.chart)
+
+    def do_kill(self, arg):
+        """
+        中止运行中的后台任务，或丢弃已结束任务的结果
+        用法: kill <任务编号>
+        """
+        job = self._get_job(arg, default_to_latest=False)
+        if job is None:
+            return
+        if job.status == 'running':
+            job.cancel()
+            job.wait(1.0)
+            print(f"[{job.job_id}] 已中止")
+        else:
+            print(f"[{job.job_id}] 已丢弃任务结果")
+        del self.jobs[job.job_id]
+
+    def postcmd(self, stop, line):
+        """每条命令执行后提示已结束的后台任务"""
+        for job in self.jobs.values():
+            if job.status != 'running' and not job.notified:
+                job.notified = True
+                if job.status == 'done':
+                    print(f"[{job.job_id}] 已完成，共 {len(job.rows)} 行，使用 fg {job.job_id} 查看结果")
+                else:
+                    print(f"[{job.job_id}] 已结束（{job.error}），使用 fg {job.job_id} 查看")
+        return stop
+
+    def _get_read_pool(self):
+        """返回与当前配置和并行度一致的只读连接池"""
+        pool = self.read_pool
+        if pool is None or pool.profile != self.profile or pool.size != self.parallel_workers:
+            if pool is not None:
+                pool.close()
+            pool = self.read_pool = ReadConnectionPool(self.db_file, self.profile, self.parallel_workers)
+        return pool
+
+    def run_parallel(self, statements):
+        """
+        在只读连接池上同时执行多条相互独立的查询，按原顺序输出结果和各自的耗时
+        返回失败的语句数
+        """
+        if not statements:
+            print("没有需要执行的查询")
+            return 0
+        for statement in statements:
+            keyword = BatchRunner._LEADING_COMMENTS_RE.sub('', statement, count=1).split(None, 1)
+            if not keyword or keyword[0].upper().rstrip(';') not in BatchRunner.READ_KEYWORDS:
+                print(f"并行执行只支持只读查询: {' '.join(statement.split())[:60]}")
+                return len(statements)
+        from concurrent.futures import ThreadPoolExecutor
+
+        pool = self._get_read_pool()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=pool.size) as executor:
+            futures = [executor.submit(_run_pooled_query, pool, statement,
+                                       self.query_time_budget, self.query_row_budget)
+                       for statement in statements]
+            try:
+                for future in futures:
+                    future.exception()  # 等待完成；Ctrl-C 时中止所有查询
+            except KeyboardInterrupt:
+                pool.interrupt_all()
+                for future in futures:
+                    future.cancel()
+                raise
+        wall_time = time.perf_counter() - start
+
+        failures = 0
+        total_time = 0.0
+        for index, (statement, future) in enumerate(zip(statements, futures), 1):
+            summary = " ".join(statement.split())[:60]
+            error = future.exception()
+            if error is not None:
+                failures += 1
+                print(f"[{index}] 失败: {error}  {summary}")
+                continue
+            headers, rows, truncated, elapsed = future.result()
+            total_time += elapsed
+            print(f"[{index}] {elapsed * 1000:.2f} ms  {summary}")
+            if headers:
+                self.render_results(_RowSource(headers, rows))
+            if truncated:
+                print(f"结果超出行数预算 {self.query_row_budget} 行，仅显示前 {self.query_row_budget} 行")
+        speedup = total_time / wall_time if wall_time else 0.0
+        print(f"并行执行 {len(statements)} 条查询（{pool.size} 个只读连接）：总耗时 {wall_time * 1000:.2f} ms，"
+              f"各查询耗时之和 {total_time * 1000:.2f} ms，加速比 {speedup:.2f}")
+        return failures
+
+    def do_parallel(self, arg):
+        """
+        在只读连接池上并行执行多条相互独立的查询，结果按输入顺序输出
+        用法: parallel [-j 连接数] <SQL1>; <SQL2>; ...
+        批处理脚本中可用 parallel begin 与 parallel end 包围一组查询
+        建议在 interactive 或 analytics 配置（WAL）下使用，读取不会阻塞写入
+        """
+        args = arg.strip()
+        if args.startswith('-j'):
+            parts = args[2:].split(None, 1)
+            if not parts or not parts[0].isdigit() or int(parts[0]) <= 0:
+                self.command_failed = True
+                print("连接数必须是正整数，用法: parallel [-j 连接数] <SQL1>; <SQL2>; ...")
+                return
+            self.parallel_workers = int(parts[0])
+            args = parts[1] if len(parts) > 1 else ''
+        if not args:
+            print(f"当前并行连接数: {self.parallel_workers}。用法: parallel [-j 连接数] <SQL1>; <SQL2>; ...")
+            return
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法执行查询")
+            return
+        try:
+            if self.run_parallel(split_sql_statements(args)):
+                self.command_failed = True
+        except Exception as e:
+            self.command_failed = True
+            print(f"并行执行查询时出错: {e}")
+
+    def do_profile(self, arg):
+        """
+        查看或切换连接性能配置
+        用法: profile [default|interactive|bulk-load|analytics]
+        """
+        name = arg.strip()
+        if not name:
+            for profile, pragmas in CONNECTION_PROFILES.items():
+                marker = "*" if profile == self.profile else " "
+                settings = ", ".join(f"{key}={value}" for key, value in pragmas.items())
+                print(f"{marker} {profile}: {settings}")
+            return
+        if name not in CONNECTION_PROFILES:
+            self.command_failed = True
+            print(f"未知的配置 {name}，可选: {', '.join(CONNECTION_PROFILES)}")
+            return
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法切换配置")
+            return
+        try:
+            apply_connection_profile(self.db_connection, name)
+            self.profile = name
+            journal_mode = self.db_connection.execute("PRAGMA journal_mode").fetchone()[0]
+            print(f"已切换到 {name} 配置（journal_mode={journal_mode}）")
+        except sqlite3.Error as e:
+            self.command_failed = True
+            print(f"切换配置时出错: {e}")
+
     def do_cls(self, arg):
         """清屏函数"""
         os.system('cls' if os.name == 'nt' else 'clear')
@@ -64,21 +2064,24 @@ class MyCommandLineTool(cmd.Cmd):
         
         pass
     
-    def execute_sql(self, arg):
-        """执行 SQL 语句"""
+    def execute_sql(self, arg, params=()):
+        """执行 SQL 语句，params 为绑定参数"""
         if self.db_connection is None:
+            self.command_failed = True
             print("数据库连接失败，无法执行SQL语句")
             return
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute(arg)
             if arg.strip().upper().startswith('SELECT'):
-                results = cursor.fetchall()
-                self.print_table(results, [desc[0] for desc in cursor.description])
+                self.run_select(arg, params)
             else:
-                self.db_connection.commit()
-                print("SQL 语句执行成功")
+                with self._query_guard():
+                    cursor = self.db_connection.cursor()
+                    cursor.execute(arg, params)
+                    self.db_connection.commit()
+                    self._mark_data_changed()
+                    print("SQL 语句执行成功")
         except sqlite3.OperationalError as e:
+            self.command_failed = True
             error_message = str(e)
             if "no such table" in error_message:
                 table_name = error_message.split("no such table: ")[1].strip()
@@ -89,21 +2092,22 @@ class MyCommandLineTool(cmd.Cmd):
             else:
                 print(f"执行 SQL 语句时出错: {e}")
         except Exception as e:
+            self.command_failed = True
             print(f"执行 SQL 语句时出错: {e}")
 
     def do_list_tables(self, arg):
         """列出数据库中的表并显示表的数量"""
         if self.db_connection is None:
+            self.command_failed = True
             print("数据库连接失败，无法列出表")
             return
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = cursor.fetchall()
+            tables = self.schema.table_names(self.db_connection)
             print(f"数据库中共有 {len(tables)} 个表，表名如下:")
             for table in tables:
-                print(table[0])
+                print(table)
         except Exception as e:
+            self.command_failed = True
             print(f"获取表信息时出错: {e}")
 
     def do_create_table(self, arg):
@@ -116,12 +2120,14 @@ class MyCommandLineTool(cmd.Cmd):
 
             # 验证括号格式
             if not columns_part.startswith('(') or not columns_part.endswith(')'):
+                self.command_failed = True
                 print("列定义必须用括号包围，格式如: create_table my_table (id INTEGER, name TEXT)")
                 return
 
             # 提取括号内的列定义
             columns_def = columns_part[1:-1].strip()
             if not columns_def:
+                self.command_failed = True
                 print("列定义不能为空")
                 return
 
@@ -136,91 +2142,78 @@ class MyCommandLineTool(cmd.Cmd):
             print(f"表 {table_name} 创建成功")
 
         except ValueError:
+            self.command_failed = True
             print("参数格式错误，格式如: add_table my_table (id INTEGER, name TEXT)")
         except sqlite3.OperationalError as e:
+            self.command_failed = True
             print(f"创建表失败: {e}")
         except Exception as e:
+            self.command_failed = True
             print(f"发生未知错误: {e}")
 
     def do_insert_into(self, arg):
-        """执行INSERT INTO... VALUES语句"""
+        """
+        逐行输入数据并批量插入到表中
+        用法: insert_into <表名> [自动提交行数]
+        """
         if self.db_connection is None:
+            self.command_failed = True
             print("数据库连接失败，无法执行插入操作")
             return
 
         if self.in_insert_mode:
             # 处理插入值或结束插入
-            if arg.lower() == ';':
-                if self.insert_table and self.insert_values:
-                    values_str = ', '.join([f"({value})" for value in self.insert_values])
-                    sql = f"INSERT INTO {self.insert_table} VALUES {values_str};"
-                    try:
-                        cursor = self.db_connection.cursor()
-                        self.check_sql(sql)
-                        cursor.execute(sql)
-                        self.db_connection.commit()
-                        print("插入操作成功")
-                    except sqlite3.IntegrityError as e:
-                        if "UNIQUE constraint failed" in str(e):
-                            cursor.execute(f"PRAGMA table_info({self.insert_table})")
-                            columns = cursor.fetchall()
-                            primary_key_column = next((col[1] for col in columns if col[5] == 1), None)
-                            if primary_key_column:
-                                print(f"插入错误：主键列 {primary_key_column} 的值重复，请检查输入。")
-                            else:
-                                print("插入错误：主键值重复，请检查输入。")
-                        else:
-                            print(f"执行插入操作时出错: {e}")
-                    except sqlite3.OperationalError as e:
-                        error_message = str(e)
-                        if "no such table" in error_message:
-                            print(f"错误：表 {self.insert_table} 不存在。请检查表名是否正确，或者先创建该表。")
-                        elif "near" in error_message:
-                            position = error_message.split("near ")[1].split(":")[0].strip()
-                            print(f"错误：在 {position} 附近存在语法错误。请检查该位置的语法。")
-                        else:
-                            print(f"执行插入操作时出错: {e}")
-                    finally:
-                        self.reset_insert_state()
+            if arg.strip() == ';':
+                if self.insert_table and (self.insert_values or self.insert_flushed_rows):
+                    self._flush_insert_values()
+                    print(f"插入结束：成功 {self.insert_inserted_rows} 行，"
+                          f"失败 {self.insert_flushed_rows - self.insert_inserted_rows} 行")
                 else:
                     print("没有有效的插入数据，请重新开始。")
-                    self.reset_insert_state()
+                self.reset_insert_state()
                 return
             else:
-                # 验证插入值的格式
-                if "," not in arg:
-                    print("输入的值格式错误，请确保值之间用逗号分隔")
+                # 输入时即解析为带类型的值，格式错误的行不会进入待插入列表
+                try:
+                    values = self._parse_value_row(arg)
+                except ValueError as e:
+                    self.command_failed = True
+                    print(f"输入的值格式错误: {e}")
+                    return
+                if self.insert_column_count and len(values) != self.insert_column_count:
+                    self.command_failed = True
+                    print(f"输入的值个数为 {len(values)}，表 {self.insert_table} 有 {self.insert_column_count} 列，请检查输入")
                     return
-                self.insert_values.append(arg)
-                print(f"已添加值: {arg}")
+                self.insert_values.append(values)
+                print(f"已添加值: {values}")
+                if self.insert_auto_flush and len(self.insert_values) >= self.insert_auto_flush:
+                    self._flush_insert_values()
         else:
             # 开始新的插入流程
-            if not arg:
-                print("请指定表名，格式为: insert_into <表名>")
+            args = arg.split()
+            if not args or len(args) > 2 or (len(args) == 2 and not args[1].isdigit()):
+                self.command_failed = True
+                print("请指定表名，格式为: insert_into <表名> [自动提交行数]")
                 return
 
-            table_name = arg
+            table_name = args[0]
+            auto_flush = int(args[1]) if len(args) == 2 else 0
             try:
-                cursor = self.db_connection.cursor()
-                # 检查表名是否存在（不区分大小写）
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-                tables = [row[0].lower() for row in cursor.fetchall()]
-                if table_name.lower() not in tables:
+                # 检查表名是否存在（不区分大小写），并取得实际表名
+                actual_table_name = self.schema.resolve(self.db_connection, table_name)
+                if actual_table_name not in self.schema.tables:
+                    self.command_failed = True
                     print(f"表 {table_name} 不存在，请先创建该表")
                     return
-
-                # 获取实际表名（使用正确的大小写）
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND LOWER(name)=?", (table_name.lower(),))
-                actual_table_name = cursor.fetchone()[0]
                 table_name = actual_table_name
             except sqlite3.Error as e:
+                self.command_failed = True
                 print(f"检查表是否存在时出错: {e}")
                 return
 
             # 获取表结构并显示列信息
             try:
-                cursor.execute(f"PRAGMA table_info({table_name})")
-                columns = cursor.fetchall()
+                columns = self.schema.columns(self.db_connection, table_name)
 
                 # 提取列名和数据类型
                 column_names = [col[1] for col in columns]
@@ -251,30 +2244,146 @@ class MyCommandLineTool(cmd.Cmd):
                 print(separator)
 
             except Exception as e:
+                self.command_failed = True
                 print(f"获取表结构时出错: {e}")
+                columns = []
 
             self.insert_table = table_name
             self.insert_values = []
+            self.insert_flushed_rows = 0
+            self.insert_inserted_rows = 0
+            self.insert_column_count = len(columns)
+            self.insert_auto_flush = auto_flush
             self.in_insert_mode = True
             print("接下来请逐行输入要插入的数据值，每行输入对应一条完整记录，输入 ';' 结束插入。")
+            if auto_flush:
+                print(f"每累计 {auto_flush} 行自动提交一次。")
             self.prompt = f"{table_name}> "
 
     def reset_insert_state(self):
         """重置插入状态"""
         self.insert_table = None
         self.insert_values = []
+        self.insert_column_count = 0
+        self.insert_auto_flush = 0
+        self.insert_flushed_rows = 0
+        self.insert_inserted_rows = 0
         self.in_insert_mode = False
         self.prompt = '> '
 
+    # 插入模式中一个值：单引号字符串（'' 表示引号）或不含逗号的裸值
+    _INSERT_VALUE_RE = re.compile(r"\s*(?:'((?:[^']|'')*)'|([^,']*?))\s*(,|$)")
+    # 按 SQL 数值常量的写法识别数字，1_000、nan、inf 等 Python 能转换的写法不算
+    _INSERT_NUMBER_RE = re.compile(r"[+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?")
+    _INSERT_KEYWORDS = ('CURRENT_TIMESTAMP', 'CURRENT_DATE', 'CURRENT_TIME', 'TRUE', 'FALSE')
+
+    def _parse_value_row(self, text):
+        """
+        将一行输入解析为带类型的值元组
+        NULL 为空值，SQL 写法的数字转换为整数或浮点数，CURRENT_TIMESTAMP 等关键字由 SQLite 求值，
+        单引号字符串去掉引号，其他裸值按字符串处理
+        """
+        values = []
+        position = 0
+        while True:
+            match = self._INSERT_VALUE_RE.match(text, position)
+            if not match:
+                raise ValueError("引号不匹配或值之间缺少逗号")
+            quoted, raw, separator = match.groups()
+            if quoted is not None:
+                values.append(quoted.replace("''", "'"))
+            elif not raw:
+                raise ValueError(f"第 {len(values) + 1} 个值为空，空值请输入 NULL")
+            elif raw.upper() == 'NULL':
+                values.append(None)
+            elif raw.upper() in self._INSERT_KEYWORDS:
+                values.append(_SqlKeyword(raw.upper()))
+            elif self._INSERT_NUMBER_RE.fullmatch(raw):
+                number = float(raw) if re.search(r"[.eE]", raw) else int(raw)
+                # 超出 64 位整数范围的整数与 SQLite 一样按浮点数处理
+                values.append(number if isinstance(number, float) or -2 ** 63 <= number < 2 ** 63 else float(raw))
+            else:
+                values.append(raw)
+            if not separator:
+                return tuple(values)
+            position = match.end()
+
+    def _flush_insert_values(self):
+        """
+        将已输入的行分块写入数据库，每块使用一个保存点
+        executemany 每次只绑定一行的参数，行数再多也不会超出 SQLITE_MAX_VARIABLE_NUMBER
+        某一块失败时只回滚该块并报告错误，其他块照常提交
+        """
+        rows = self.insert_values
+        if not rows:
+            return
+        conn = self.db_connection
+        cursor = conn.cursor()
+        first_row = self.insert_flushed_rows + 1
+        inserted = 0
+        try:
+            if not conn.in_transaction:
+                cursor.execute("BEGIN")
+            for begin in range(0, len(rows), self.insert_chunk_size):
+                chunk = rows[begin:begin + self.insert_chunk_size]
+                chunk_first = first_row + begin
+                cursor.execute("SAVEPOINT insert_chunk")
+                try:
+                    # 关键字位置不同的行使用不同的语句，相邻的同形行仍合并为一次 executemany
+                    for sql, group in groupby(map(self._insert_statement, chunk), key=lambda item: item[0]):
+                        cursor.executemany(sql, [params for _, params in group])
+                    cursor.execute("RELEASE insert_chunk")
+                    inserted += len(chunk)
+                except sqlite3.Error as e:
+                    self.command_failed = True
+                    cursor.execute("ROLLBACK TO insert_chunk")
+                    cursor.execute("RELEASE insert_chunk")
+                    print(f"第 {chunk_first}-{chunk_first + len(chunk) - 1} 行插入失败，"
+                          f"该块已回滚: {self._describe_insert_error(e)}")
+            conn.commit()
+        except sqlite3.Error as e:
+            self.command_failed = True
+            conn.rollback()
+            inserted = 0
+            print(f"执行插入操作时出错: {self._describe_insert_error(e)}")
+        if inserted:
+            self._mark_data_changed()
+            print(f"已提交 {inserted} 行（第 {first_row}-{first_row + len(rows) - 1} 行）")
+        self.insert_flushed_rows += len(rows)
+        self.insert_inserted_rows += inserted
+        self.insert_values = []
+
+    def _insert_statement(self, row):
+        """返回一行对应的 (INSERT 语句, 绑定参数)，关键字直接写入语句"""
+        values = ', '.join(value if isinstance(value, _SqlKeyword) else '?' for value in row)
+        params = tuple(value for value in row if not isinstance(value, _SqlKeyword))
+        return f"INSERT INTO {self.insert_table} VALUES ({values})", params
+
+    def _describe_insert_error(self, error):
+        """把插入时的数据库错误转换为便于理解的提示"""
+        error_message = str(error)
+        if "UNIQUE constraint failed" in error_message:
+            columns = self.schema.columns(self.db_connection, self.insert_table)
+            primary_key_column = next((col[1] for col in columns if col[5] == 1), None)
+            if primary_key_column:
+                return f"主键列 {primary_key_column} 的值重复，请检查输入。"
+            return "主键值重复，请检查输入。"
+        if "no such table" in error_message:
+            return f"表 {self.insert_table} 不存在。请检查表名是否正确，或者先创建该表。"
+        return error_message
+
     def do_desc_table(self, arg):
         """描述表的结构"""
         if self.db_connection is None:
+            self.command_failed = True
             print("数据库连接失败，无法描述表结构")
             return
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute(f"PRAGMA table_info({arg});")
-            columns = cursor.fetchall()
+            columns = self.schema.columns(self.db_connection, arg.strip())
+            if not columns:
+                self.command_failed = True
+                print(f"表 {arg.strip()} 不存在，请先创建该表")
+                return
 
             # 提取列名和数据类型
             column_names = [col[1] for col in columns]
@@ -303,47 +2412,188 @@ class MyCommandLineTool(cmd.Cmd):
             print(separator)
 
         except Exception as e:
+            self.command_failed = True
             print(f"获取表结构时出错: {e}")
 
     def do_show_table_data(self, arg):
-        """显示表中的具体信息"""
+        """
+        分页显示表中的具体信息，使用 rowid/主键做键集定位而不是 OFFSET；视图没有可用的键，按行号以 OFFSET 分页
+        用法: show_table_data <表名> [每页行数] [起始键]
+        """
         if self.db_connection is None:
+            self.command_failed = True
             print("数据库连接失败，无法显示表数据")
             return
+        args = arg.split()
+        if not args or len(args) > 3:
+            self.command_failed = True
+            print("参数错误，用法: show_table_data <表名> [每页行数] [起始键]")
+            return
+        table_name = args[0]
+        page_size = self.page_size
+        if len(args) > 1:
+            if not args[1].isdigit() or int(args[1]) <= 0:
+                self.command_failed = True
+                print("每页行数必须是正整数")
+                return
+            page_size = int(args[1])
+
         try:
             # 获取列名
-            cursor = self.db_connection.cursor()
-            cursor.execute(f"PRAGMA table_info({arg});")
-            columns = cursor.fetchall()
+            columns = self.schema.columns(self.db_connection, table_name)
+            if not columns:
+                self.command_failed = True
+                print(f"表 {table_name} 不存在，请先创建该表")
+                return
             column_names = [column[1] for column in columns]
 
-            # 打印分隔线
-            print("-" * 120)
+            key_columns = self._keyset_columns(table_name, columns)
+            start_key = self._parse_key(args[2], len(key_columns)) if len(args) > 2 else None
+            if len(args) > 2 and start_key is None:
+                self.command_failed = True
+                print(f"起始键需要 {len(key_columns)} 个以逗号分隔的值（键列: {', '.join(key_columns)}）")
+                return
+
+            # 从起始键之后（含起始键）读取第一页
+            rows = self._fetch_keyset_page(table_name, key_columns, start_key, page_size, inclusive=True)
+            if not rows:
+                print("结果为空")
+                return
+            col_widths = self._sample_column_widths([row[len(key_columns):] for row in rows], column_names)
+
+            page_no = 1
+            redraw = True
+            while True:
+                if redraw:
+                    self._print_keyset_page(rows, key_columns, column_names, col_widths, page_no)
+                redraw = True
+                has_next = len(rows) == page_size
+                has_prev = page_no > 1 or start_key is not None
+                if not self._is_interactive():
+                    # 非交互环境下逐页连续输出全部数据
+                    if not has_next:
+                        return
+                    action = 'n'
+                else:
+                    if not has_next and not has_prev:
+                        return
+                    action = self._ask_page_action(has_prev, has_next)
+
+                if action == 'n' and has_next:
+                    last_key = rows[-1][:len(key_columns)]
+                    next_rows = self._fetch_keyset_page(table_name, key_columns, last_key, page_size)
+                    if not next_rows:
+                        if not self._is_interactive():
+                            return
+                        print("已经是最后一页")
+                        redraw = False
+                        continue
+                    rows = next_rows
+                    page_no += 1
+                elif action == 'p' and has_prev:
+                    first_key = rows[0][:len(key_columns)]
+                    prev_rows = self._fetch_keyset_page(table_name, key_columns, first_key, page_size, backward=True)
+                    if not prev_rows:
+                        print("已经是第一页")
+                        redraw = False
+                        continue
+                    rows = prev_rows
+                    page_no -= 1
+                elif action == 'q':
+                    return
+                else:
+                    redraw = False
+        except Exception as e:
+            self.command_failed = True
+            print(f"获取表 {table_name} 数据时出错: {e}")
+
+    # 视图的分页键：结果中的行号（从 1 开始），按 LIMIT/OFFSET 定位
+    _POSITION_KEY = '行号'
+
+    def _keyset_columns(self, table_name, columns):
+        """确定键集分页使用的列：普通表使用 rowid，WITHOUT ROWID 表使用主键列，视图使用行号"""
+        if self.schema.is_view(self.db_connection, table_name):
+            return [self._POSITION_KEY]  # 视图的 rowid 查询不报错但始终为 NULL
+        try:
+            self.db_connection.execute(f"SELECT rowid FROM {table_name} LIMIT 0")
+            return ['rowid']
+        except sqlite3.OperationalError:
+            pk_columns = sorted((col[5], col[1]) for col in columns if col[5] > 0)
+            return [name for _, name in pk_columns]
+
+    def _parse_key(self, key_text, key_count):
+        """将命令行中的起始键解析为元组，数值自动转换为整数或浮点数"""
+        parts = [part.strip().strip("'") for part in key_text.split(',')]
+        if len(parts) != key_count:
+            return None
+        key = []
+        for part in parts:
+            try:
+                key.append(int(part))
+            except ValueError:
+                try:
+                    key.append(float(part))
+                except ValueError:
+                    key.append(part)
+        return tuple(key)
 
-            # 打印列名
-            formatted_column_names = []
-            for col_name in column_names:
-                formatted_col_name = f"{col_name.ljust(20)} |"
-                formatted_column_names.append(formatted_col_name)
-            print("".join(formatted_column_names))
+    def _fetch_keyset_page(self, table_name, key_columns, key, page_size, inclusive=False, backward=False):
+        """
+        按键集定位读取一页数据，每页代价只与页大小有关
+        返回的每一行以键列开头，其后为表的全部列
+        """
+        if key_columns == [self._POSITION_KEY]:
+            return self._fetch_position_page(table_name, key, page_size, inclusive, backward)
+        keys_str = ", ".join(key_columns)
+        key_expr = key_columns[0] if len(key_columns) == 1 else f"({keys_str})"
+        placeholders = "?" if len(key_columns) == 1 else f"({', '.join(['?'] * len(key_columns))})"
+        if backward:
+            operator, order = "<", "DESC"
+        else:
+            operator, order = (">=" if inclusive else ">"), "ASC"
 
-            # 获取表数据
-            sql = f"SELECT * FROM {arg}"
-            self.check_sql(sql)
-            cursor.execute(sql)
-            results = cursor.fetchall()
+        sql = f"SELECT {keys_str}, * FROM {table_name}"
+        params = []
+        if key is not None:
+            sql += f" WHERE {key_expr} {operator} {placeholders}"
+            params.extend(key)
+        sql += f" ORDER BY {', '.join(f'{col} {order}' for col in key_columns)} LIMIT ?"
+        params.append(page_size)
 
-            # 打印数据
-            for row in results:
-                formatted_row = []
-                for value in row:
-                    formatted_value = f"{str(value).ljust(20)} |"
-                    formatted_row.append(formatted_value)
-                print("".join(formatted_row))
+        cursor = self.db_connection.cursor()
+        with self.metrics.phase('fetch'):
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        self.metrics.add_rows(len(rows))
+        if backward:
+            rows.reverse()
+        return rows
 
-            print("-" * 120)
-        except Exception as e:
-            print(f"获取表 {arg} 数据时出错: {e}")
+    def _fetch_position_page(self, table_name, key, page_size, inclusive, backward):
+        """没有 rowid 和主键的视图按 LIMIT/OFFSET 读取一页，每行以其行号开头"""
+        position = int(key[0]) if key is not None else 1
+        if backward:
+            offset = max(position - 1 - page_size, 0)
+            limit = max(position - 1 - offset, 0)
+        else:
+            offset = max(position - 1 if inclusive or key is None else position, 0)
+            limit = page_size
+        cursor = self.db_connection.cursor()
+        with self.metrics.phase('fetch'):
+            cursor.execute(f"SELECT * FROM {table_name} LIMIT ? OFFSET ?", (limit, offset))
+            rows = [(offset + i + 1,) + row for i, row in enumerate(cursor.fetchall())]
+        self.metrics.add_rows(len(rows))
+        return rows
+
+    def _print_keyset_page(self, rows, key_columns, column_names, col_widths, page_no):
+        """打印键集分页的一页数据，并提示本页的键范围"""
+        key_count = len(key_columns)
+        self._print_table_header(column_names, col_widths)
+        self._print_table_rows([row[key_count:] for row in rows], col_widths)
+        self._print_table_separator(col_widths)
+        first_key = ",".join(str(value) for value in rows[0][:key_count])
+        last_key = ",".join(str(value) for value in rows[-1][:key_count])
+        print(f"第 {page_no} 页，{len(rows)} 条记录，{', '.join(key_columns)} 范围 {first_key} ~ {last_key}")
 
     def do_rename_column(self, arg):
         """
@@ -351,11 +2601,13 @@ class MyCommandLineTool(cmd.Cmd):
         用法: rename_column <表名> <旧列名> <新列名>
         """
         if self.db_connection is None:
+            self.command_failed = True
             print("数据库连接失败，无法执行列重命名操作")
             return
 
         args = arg.strip().split()
         if len(args) != 3:
+            self.command_failed = True
             print("参数错误，用法: rename_column <表名> <旧列名> <新列名>")
             return
 
@@ -363,98 +2615,157 @@ class MyCommandLineTool(cmd.Cmd):
 
         try:
             # 检查表是否存在
-            cursor = self.db_connection.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-            if not cursor.fetchone():
+            if table_name not in self.schema.table_names(self.db_connection):
+                self.command_failed = True
                 print(f"表 {table_name} 不存在，请先创建该表")
                 return
 
             # 获取表的当前结构
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = cursor.fetchall()
+            cursor = self.db_connection.cursor()
+            columns = self.schema.columns(self.db_connection, table_name)
 
             # 检查旧列名是否存在
             if not any(col[1] == old_col for col in columns):
+                self.command_failed = True
                 print(f"列 {old_col} 不存在于表 {table_name} 中")
                 return
+            if self.schema.fulltext_index(self.db_connection, table_name, old_col):
+                self.command_failed = True
+                print(f"列 {old_col} 上有全文索引，请先用 drop_fulltext 删除后再重命名")
+                return
+            rollups = self.schema.refresh(self.db_connection).rollups
+            if table_name.lower() == ROLLUP_SOURCE and any(
+                    old_col.lower() == ROLLUP_TIME_COLUMN or old_col in dims for _, dims in rollups.values()):
+                self.command_failed = True
+                print(f"列 {old_col} 被汇总表使用，请先用 drop_rollup 删除汇总表后再重命名")
+                return
 
-            # 生成新的表结构定义
-            new_columns = []
-            for col in columns:
-                col_name = col[1]
-                col_type = col[2]
-                col_null = "NOT NULL" if col[3] == 1 else ""
-                col_default = f"DEFAULT {col[4]}" if col[4] is not None else ""
-                col_pk = "PRIMARY KEY" if col[5] == 1 else ""
-
-                if col_name == old_col:
-                    col_name = new_col
-
-                parts = [col_name, col_type, col_null, col_default, col_pk]
-                parts = [p for p in parts if p]  # 过滤空字符串
-                new_columns.append(" ".join(parts))
+            if sqlite3.sqlite_version_info >= (3, 25, 0):
+                # SQLite 3.25+ 原生支持重命名列，只修改表结构定义，不复制数据
+                cursor.execute(f"ALTER TABLE {table_name} RENAME COLUMN {old_col} TO {new_col}")
+                self.db_connection.commit()
+                print(f"列 {old_col} 已成功重命名为 {new_col}")
+                return
 
-            new_table_def = ", ".join(new_columns)
+            self._rebuild_with_renamed_column(table_name, old_col, new_col)
 
-            # 开始事务以确保原子性
-            self.db_connection.execute("BEGIN TRANSACTION")
+        except sqlite3.Error as e:
+            self.command_failed = True
+            print(f"重命名列时出错: {e}")
+        except Exception as e:
+            self.command_failed = True
+            print(f"执行列重命名操作时发生未知错误: {e}")
+        
+    def _rebuild_with_renamed_column(self, table_name, old_col, new_col, batch_size=50000):
+        """
+        旧版本 SQLite 不支持 RENAME COLUMN 时，通过重建表来重命名列
+        基于原建表语句改写列名，保留 UNIQUE、AUTOINCREMENT 等约束；按 rowid 分批复制数据并显示进度，
+        数据复制完成后再重建索引和触发器
+        """
+        cursor = self.db_connection.cursor()
+        column_re = re.compile(rf"\b{re.escape(old_col)}\b")
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
+        create_sql = cursor.fetchone()[0]
+        cursor.execute("SELECT sql FROM sqlite_master WHERE tbl_name=? AND type IN ('index', 'trigger') "
+                       "AND sql IS NOT NULL", (table_name,))
+        dependent_sql = [row[0] for row in cursor.fetchall()]
+        columns = [col[1] for col in self.schema.columns(self.db_connection, table_name)]
 
-            try:
-                # 创建临时表
-                temp_table = f"{table_name}_temp"
-                cursor.execute(f"CREATE TABLE {temp_table} ({new_table_def})")
+        temp_table = f"{table_name}_temp"
+        header_re = re.compile(rf"^(\s*CREATE\s+TABLE\s+)[\"`\[]?{re.escape(table_name)}[\"`\]]?", re.I)
+        temp_sql = column_re.sub(new_col, header_re.sub(rf"\g<1>{temp_table}", create_sql, count=1))
 
-                # 复制数据
-                columns_str = ", ".join([col[1] if col[1] != old_col else new_col for col in columns])
-                old_columns_str = ", ".join([col[1] for col in columns])
-                cursor.execute(f"INSERT INTO {temp_table} ({columns_str}) SELECT {old_columns_str} FROM {table_name}")
+        old_columns_str = ", ".join(columns)
+        new_columns_str = ", ".join(new_col if col == old_col else col for col in columns)
+        total = cursor.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
 
-                # 删除原表
-                cursor.execute(f"DROP TABLE {table_name}")
+        # 开始事务以确保原子性
+        self.db_connection.execute("BEGIN TRANSACTION")
+        try:
+            cursor.execute(temp_sql)
 
-                # 重命名临时表
-                cursor.execute(f"ALTER TABLE {temp_table} RENAME TO {table_name}")
+            # 按 rowid 分批复制数据，保留原有 rowid
+            copied = 0
+            last_rowid = None
+            while True:
+                condition = "" if last_rowid is None else "WHERE rowid > ?"
+                params = () if last_rowid is None else (last_rowid,)
+                cursor.execute(f"SELECT rowid FROM {table_name} {condition} ORDER BY rowid LIMIT 1 OFFSET ?",
+                               params + (batch_size - 1,))
+                upper = cursor.fetchone()
+                if upper:
+                    condition += (" AND" if condition else "WHERE") + " rowid <= ?"
+                    params += (upper[0],)
+                cursor.execute(f"INSERT INTO {temp_table} (rowid, {new_columns_str}) "
+                               f"SELECT rowid, {old_columns_str} FROM {table_name} {condition}", params)
+                copied += cursor.rowcount
+                print(f"已复制 {copied}/{total} 行")
+                if upper is None:
+                    break
+                last_rowid = upper[0]
 
-                # 提交事务
-                self.db_connection.execute("COMMIT")
-                print(f"列 {old_col} 已成功重命名为 {new_col}")
+            cursor.execute(f"DROP TABLE {table_name}")
+            cursor.execute(f"ALTER TABLE {temp_table} RENAME TO {table_name}")
 
-            except Exception as e:
-                # 回滚事务
-                self.db_connection.execute("ROLLBACK")
-                raise e
+            # 数据复制完成后再重建索引和触发器，避免复制过程中逐行维护索引
+            for sql in dependent_sql:
+                cursor.execute(column_re.sub(new_col, sql))
 
-        except sqlite3.Error as e:
-            print(f"重命名列时出错: {e}")
+            self.db_connection.execute("COMMIT")
+            print(f"列 {old_col} 已成功重命名为 {new_col}（已重建表及 {len(dependent_sql)} 个索引/触发器）")
         except Exception as e:
-            print(f"执行列重命名操作时发生未知错误: {e}")
-        
+            # 回滚事务
+            self.db_connection.execute("ROLLBACK")
+            raise e
+
     def do_delete_table(self, arg):
         """删除指定的表"""
         if self.db_connection is None:
+            self.command_failed = True
             print("数据库连接失败，无法删除表")
             return
         if arg == 'sqlite_sequence':
+            self.command_failed = True
             print("不能删除 sqlite_sequence 表，请选择其他表进行删除操作。")
             return
         try:
             cursor = self.db_connection.cursor()
             sql = f"DROP TABLE IF EXISTS {arg}"
             self.check_sql(sql)
+            # 全文索引的内容来自该表，一并删除
+            for _, _, index_name in self.schema.fulltext_indexes(self.db_connection, arg):
+                self._drop_fulltext(index_name)
+            # 删除原表时汇总表随之失效；直接删除汇总表时同时删除其触发器和登记信息
+            rollups = self.schema.refresh(self.db_connection).rollups
+            for name in list(rollups):
+                if arg.lower() in (ROLLUP_SOURCE, name.lower()):
+                    self._drop_rollup(name)
             cursor.execute(sql)
             self.db_connection.commit()
             print(f"表 {arg} 删除成功")
         except Exception as e:
+            self.command_failed = True
             print(f"删除表 {arg} 时出错: {e}")
 
     def do_rename_table(self, arg):
         """重命名表，参数格式: 旧表名 新表名"""
         args = arg.split()
         if len(args) != 2:
+            self.command_failed = True
             print("参数错误，用法: rename_table <旧表名> <新表名>")
             return
         old_table_name = args[0]
         new_table_name = args[1]
+        if self.db_connection is not None and self.schema.fulltext_indexes(self.db_connection, old_table_name):
+            self.command_failed = True
+            print(f"表 {old_table_name} 上有全文索引，请先用 drop_fulltext 删除后再重命名")
+            return
+        if self.db_connection is not None and self.schema.refresh(self.db_connection).rollups and (
+                old_table_name.lower() == ROLLUP_SOURCE
+                or old_table_name.lower() in {name.lower() for name in self.schema.rollups}):
+            self.command_failed = True
+            print(f"表 {old_table_name} 与汇总表相关，请先用 drop_rollup 删除汇总表后再重命名")
+            return
 
         try:
             sql = f"ALTER TABLE {old_table_name} RENAME TO {new_table_name};"
@@ -464,17 +2775,20 @@ class MyCommandLineTool(cmd.Cmd):
             self.db_connection.commit()
             print(f"表 {old_table_name} 已重命名为 {new_table_name}")
         except sqlite3.OperationalError as e:
+            self.command_failed = True
             error_message = str(e)
             if "no such table" in error_message:
                 print(f"错误：表 {old_table_name} 不存在。请检查表名是否正确。")
             else:
                 print(f"重命名表时出错: {e}")
         except Exception as e:
+            self.command_failed = True
             print(f"重命名表时出错: {e}")
 
     def do_truncate_table(self, arg):
         """清空指定表的数据，但不删除表结构"""
         if self.db_connection is None:
+            self.command_failed = True
             print("数据库连接失败，无法清空表数据")
             return
         try:
@@ -483,149 +2797,310 @@ class MyCommandLineTool(cmd.Cmd):
             self.check_sql(sql)
             cursor.execute(sql)
             self.db_connection.commit()
+            self._mark_data_changed()
             print(f"表 {arg} 数据已清空")
         except Exception as e:
+            self.command_failed = True
             print(f"清空表 {arg} 数据时出错: {e}")
 
-    def visualize_data(self, sql_query):
-        """执行SQL查询并可视化结果"""
+    def visualize_data(self, sql_query, params=()):
+        """
+        可视化查询结果：聚合、分桶和采样都在 SQLite 中完成，只取回绘图所需的数据
+        """
         if self.db_connection is None:
+            self.command_failed = True
             print("数据库连接失败，无法执行查询操作")
             return
+        if self.chart_mode == 'file':
+            self.render_chart(self._next_chart_path(), sql_query, params)
+            return
         
         try:
-            # 执行SQL查询
-            cursor = self.db_connection.cursor()
-            cursor.execute(sql_query)
-            results = cursor.fetchall()
-            
-            # 获取列名
-            column_names = [description[0] for description in cursor.description]
-            
-            # 转换为DataFrame以便处理
-            df = pd.DataFrame(results, columns=column_names)
-            
-            # 数据可视化
-            if len(df) > 0:
-                # 自动检测适合可视化的列
-                numeric_columns = df.select_dtypes(include=['number']).columns.tolist()
-                categorical_columns = df.select_dtypes(include=['object', 'category']).columns.tolist()
-                
-                if not numeric_columns:
-                    print("数据集中没有可用于可视化的数值列")
-                    return
-                
-                # 选择合适的可视化方式
-                if len(numeric_columns) >= 2 and len(df) >= 3:
-                    # 如果有两个或以上数值列，且数据量足够，绘制散点图
-                    plt.figure(figsize=(10, 6))  
-                    plt.scatter(df[numeric_columns[0]], df[numeric_columns[1]])
-                    plt.xlabel(numeric_columns[0])
-                    plt.ylabel(numeric_columns[1])
-                    plt.title(f"{numeric_columns[0]} vs {numeric_columns[1]}")
-                    plt.grid(True)
-                    plt.show()
-                elif len(categorical_columns) >= 1 and len(numeric_columns) >= 1:
-                    # 如果有分类列和数值列，绘制柱状图
-                    plt.figure(figsize=(12, 6))  
-                    if len(df[categorical_columns[0]].unique()) > 10:
-                        # 如果分类太多，只显示前10个
-                        top_categories = df[categorical_columns[0]].value_counts().index[:10]
-                        df_filtered = df[df[categorical_columns[0]].isin(top_categories)]
-                        df_grouped = df_filtered.groupby(categorical_columns[0])[numeric_columns[0]].mean().reset_index()
-                    else:
-                        df_grouped = df.groupby(categorical_columns[0])[numeric_columns[0]].mean().reset_index()
-                    
-                    plt.bar(df_grouped[categorical_columns[0]], df_grouped[numeric_columns[0]])
-                    plt.xlabel(categorical_columns[0])
-                    plt.ylabel(f"平均{numeric_columns[0]}")
-                    plt.title(f"{numeric_columns[0]} 按 {categorical_columns[0]} 分组")
-                    plt.xticks(rotation=45)
-                    plt.tight_layout()
-                    plt.show()
-                else:
-                    # 默认绘制数值列的直方图
-                    plt.figure(figsize=(10, 6))  # 修改：使用 plt.figure()
-                    plt.hist(df[numeric_columns[0]], bins=min(10, len(df)//2))
-                    plt.xlabel(numeric_columns[0])
-                    plt.ylabel("频数")
-                    plt.title(f"{numeric_columns[0]} 的分布")
-                    plt.grid(True)
-                    plt.show()
-            else:
-                print("查询结果为空，无法进行可视化")
-                
+            spec = None
+            with self._query_guard(), self.metrics.phase('aggregate'):
+                spec = _build_chart_spec(self.db_connection, sql_query, params)
+            if spec is not None:
+                self._show_chart(spec)
+        except NoChartData as e:
+            self.command_failed = True
+            print(e)
         except sqlite3.OperationalError as e:
+            self.command_failed = True
             print(f"执行查询时出错: {e}")
         except Exception as e:
+            self.command_failed = True
             print(f"可视化数据时出错: {e}")
 
+    def _show_chart(self, spec, path=None):
+        """在窗口中显示图表；指定 path 或处于 file 模式时渲染到文件"""
+        if spec['kind'] == 'scatter' and spec['sampled'] < spec['rows']:
+            print(f"散点图随机采样 {spec['sampled']} / {spec['rows']} 个点")
+        with self.metrics.phase('plot'):
+            if path is None and self.chart_mode == 'file':
+                path = self._next_chart_path()
+            if path is not None:
+                _render_chart_file(spec, path)
+                print(f"图表已保存到 {path}")
+                return
+            plt = _load_pyplot()
+            _draw_chart(plt.figure(figsize=_chart_figsize(spec)), spec)
+            plt.show()
+
+    def _next_chart_path(self):
+        """文件输出模式下为下一张图表生成文件名"""
+        os.makedirs(self.chart_dir, exist_ok=True)
+        self.chart_counter += 1
+        stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        return os.path.join(self.chart_dir, f"chart_{stamp}_{self.chart_counter}.{self.chart_format}")
+
+    def _chart_cache_key(self, sql, params, fmt):
+        """图表缓存键包含数据版本：其他连接提交、表结构变化或本连接写入后都会失效"""
+        cursor = self.db_connection.cursor()
+        version = (cursor.execute("PRAGMA data_version").fetchone()[0],
+                   cursor.execute("PRAGMA schema_version").fetchone()[0],
+                   self.write_generation)
+        return _normalize_sql(sql), tuple(params), fmt, version
+
+    def _chart_format(self, path):
+        fmt = os.path.splitext(path)[1].lower().lstrip('.')
+        if fmt not in CHART_FORMATS:
+            raise ValueError(f"不支持的图片格式，请使用 {' 或 '.join('.' + f for f in CHART_FORMATS)} 扩展名")
+        return fmt
+
+    def _cache_chart(self, key, path):
+        with open(path, 'rb') as f:
+            self.chart_cache[key] = f.read()
+        while len(self.chart_cache) > self.chart_cache_size:
+            self.chart_cache.popitem(last=False)
+
+    def render_chart(self, path, sql, params=()):
+        """
+        无界面地把查询结果的图表渲染到 path（.png 或 .svg）
+        同一查询在数据未变化时直接写出缓存的图片，不再查询或绘图
+        :return: 是否成功
+        """
+        try:
+            fmt = self._chart_format(path)
+            key = self._chart_cache_key(sql, params, fmt)
+            cached = self.chart_cache.get(key)
+            if cached is not None:
+                self.chart_cache.move_to_end(key)
+                with open(path, 'wb') as f:
+                    f.write(cached)
+                print(f"图表已保存到 {path}（来自缓存）")
+                return True
+            spec = None
+            with self._query_guard(), self.metrics.phase('aggregate'):
+                spec = _build_chart_spec(self.db_connection, sql, params)
+            if spec is None:
+                return False
+            self._show_chart(spec, path)
+            self._cache_chart(key, path)
+            return True
+        except NoChartData as e:
+            self.command_failed = True
+            print(e)
+        except sqlite3.OperationalError as e:
+            self.command_failed = True
+            print(f"执行查询时出错: {e}")
+        except Exception as e:
+            self.command_failed = True
+            print(f"渲染图表时出错: {e}")
+        return False
+
+    def do_chart(self, arg):
+        """
+        设置 visualon 图表的输出方式
+        用法: chart | chart window | chart file [目录] [png|svg]
+        file 模式使用 Agg 后端渲染到文件，不需要图形界面；没有图形界面时默认使用 file 模式
+        """
+        args = arg.split()
+        if args and args[0].lower() == 'window':
+            if not _has_display():
+                self.command_failed = True
+                print("当前环境没有图形界面，无法在窗口中显示图表")
+                return
+            self.chart_mode = 'window'
+        elif args and args[0].lower() == 'file':
+            for option in args[1:]:
+                if option.lower() in CHART_FORMATS:
+                    self.chart_format = option.lower()
+                else:
+                    self.chart_dir = os.path.abspath(option.strip('"').strip("'"))
+            self.chart_mode = 'file'
+        elif args:
+            self.command_failed = True
+            print("参数错误，用法: chart | chart window | chart file [目录] [png|svg]")
+            return
+        if self.chart_mode == 'window':
+            print("图表在窗口中显示")
+        else:
+            print(f"图表以 {self.chart_format} 格式保存到 {self.chart_dir}")
+
+    def do_render_chart(self, arg):
+        """
+        把查询结果的图表渲染到指定文件（.png 或 .svg），不需要图形界面
+        用法: render_chart <输出文件> <SELECT 语句>
+        数据未变化时重复渲染同一查询直接使用缓存的图片
+        """
+        parts = arg.strip().split(None, 1)
+        if len(parts) != 2:
+            self.command_failed = True
+            print("参数错误，用法: render_chart <输出文件> <SELECT 语句>")
+            return
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法执行查询操作")
+            return
+        self.render_chart(parts[0].strip('"').strip("'"), parts[1])
+
+    def do_render_charts(self, arg):
+        """
+        按清单文件批量渲染图表，在进程池中并行完成聚合与绘图
+        用法: render_charts <清单文件> [进程数]
+        清单文件每行一张图表: <输出文件> <SELECT 语句>，空行和以 # 开头的行会被忽略
+        """
+        args = arg.split()
+        if len(args) not in (1, 2) or (len(args) == 2 and (not args[1].isdigit() or int(args[1]) <= 0)):
+            self.command_failed = True
+            print("参数错误，用法: render_charts <清单文件> [进程数]")
+            return
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法执行查询操作")
+            return
+        try:
+            with open(args[0].strip('"').strip("'"), encoding='utf-8') as f:
+                lines = [line.strip() for line in f]
+        except OSError as e:
+            self.command_failed = True
+            print(f"无法读取清单文件: {e}")
+            return
+
+        jobs = []
+        for lineno, line in enumerate(lines, 1):
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split(None, 1)
+            try:
+                if len(parts) != 2:
+                    raise ValueError("格式应为 <输出文件> <SELECT 语句>")
+                fmt = self._chart_format(parts[0])
+            except ValueError as e:
+                self.command_failed = True
+                print(f"清单第 {lineno} 行有误: {e}")
+                return
+            jobs.append((parts[0], parts[1], self._chart_cache_key(parts[1], (), fmt)))
+        if not jobs:
+            print("清单中没有图表")
+            return
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        workers = int(args[1]) if len(args) == 2 else (os.cpu_count() or 1)
+        start = time.perf_counter()
+        pending = []
+        failures = 0
+        try:
+            # 先用缓存写出未变化的图表，其余的交给进程池
+            for path, sql, key in jobs:
+                cached = self.chart_cache.get(key)
+                if cached is None:
+                    pending.append((path, sql, key))
+                    continue
+                self.chart_cache.move_to_end(key)
+                with open(path, 'wb') as f:
+                    f.write(cached)
+            if pending:
+                with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+                    futures = [executor.submit(_render_chart_job, self.db_file, self.profile, sql, path)
+                               for path, sql, _ in pending]
+                    for (path, sql, key), future in zip(pending, futures):
+                        _, error = future.result()
+                        if error:
+                            self.command_failed = True
+                            failures += 1
+                            print(f"渲染 {path} 失败: {error}")
+                        else:
+                            self._cache_chart(key, path)
+        except Exception as e:
+            self.command_failed = True
+            print(f"批量渲染图表时出错: {e}")
+            return
+        elapsed = time.perf_counter() - start
+        print(f"共 {len(jobs)} 张图表：缓存命中 {len(jobs) - len(pending)}，渲染 {len(pending) - failures}，"
+              f"失败 {failures}，耗时 {elapsed:.2f} 秒")
+
     def default(self, line):
         """默认处理未识别的命令，优先尝试自然语言解析"""
         if self.in_insert_mode:
             self.do_insert_into(line)
         else:
             # 尝试解析自然语言查询
-            sql_query = self.parse_natural_language(line)
-            if sql_query:
-                self.execute_sql(sql_query)
+            parsed = self.parse_natural_language(line)
+            if parsed:
+                sql_query, params = parsed
+                self.execute_sql(sql_query, params)
             else:
+                self.command_failed = True
                 super().default(line)
     
     def parse_natural_language(self, query):
-        """解析自然语言查询并返回SQL（修复版）"""
-        patterns = [
-            # 1. 基础比较查询（支持数值和字符串）
-            (r"查询表([a-zA-Z_]+)中([a-zA-Z_]+)(大于|小于|等于|不等于|大于等于|小于等于)(\d+|'[^']*')的数据",
-             lambda m: self._build_comparison_query(m)),
-            
-            # 2. 字符串模糊匹配
-            (r"查询表([a-zA-Z_]+)中([a-zA-Z_]+)(包含|等于|不等于)('?[^']*'?)的数据",
-             lambda m: self._build_string_query(m)),
-            
-            # 3. 查询特定字段（支持多种分隔符）
-            (r"查询表([a-zA-Z_]+)中([a-zA-Z_，,、\s]+)的数据",
-             lambda m: f"SELECT {self._normalize_fields(m.group(2))} FROM {m.group(1)}"),
-            
-            # 4. 查询所有数据
-            (r"查询表([a-zA-Z_]+)中所有数据",
-             lambda m: f"SELECT * FROM {m.group(1)}"),
-            
-            # 5. 改进的逻辑组合查询（AND/OR条件，支持相同字段）
-            (r"查询表([a-zA-Z_]+)中(([a-zA-Z_]+)(大于|小于|等于|不等于|大于等于|小于等于)(\d+|'[^']*'))(并且|而且|且|and|或者|或|or)(([a-zA-Z_]+)(大于|小于|等于|不等于|大于等于|小于等于)(\d+|'[^']*'))的数据",
-             lambda m: self._build_improved_logic_query(m, m.group(6))),
-            
-            # 6. 范围查询（BETWEEN）
-            (r"查询表([a-zA-Z_]+)中([a-zA-Z_]+)(在|介于)(\d+|'[^']*')和(\d+|'[^']*')之间的数据",
-             lambda m: f"SELECT * FROM {m.group(1)} WHERE {m.group(2)} BETWEEN {m.group(4)} AND {m.group(5)}"),
-            
-            # 7. 聚合查询
-            (r"查询表([a-zA-Z_]+)中([a-zA-Z_]+)的(最大值|最大|最高)",
-             lambda m: f"SELECT MAX({m.group(2)}) FROM {m.group(1)}"),
-            (r"查询表([a-zA-Z_]+)中([a-zA-Z_]+)的(最小值|最小|最低)",
-             lambda m: f"SELECT MIN({m.group(2)}) FROM {m.group(1)}"),
-            (r"查询表([a-zA-Z_]+)中([a-zA-Z_]+)的(平均值|平均)",
-             lambda m: f"SELECT AVG({m.group(2)}) FROM {m.group(1)}"),
-            (r"查询表([a-zA-Z_]+)中([a-zA-Z_]+)的(总和|合计|总数)",
-             lambda m: f"SELECT SUM({m.group(2)}) FROM {m.group(1)}"),
-            (r"查询表([a-zA-Z_]+)的记录数",
-             lambda m: f"SELECT COUNT(*) FROM {m.group(1)}"),
-        ]
-        
+        """
+        解析自然语言查询，相同的查询直接从缓存中取出
+        :return: (SQL 模板, 绑定参数元组)，无法解析时返回 None
+        """
+        key = _collapse_nl_whitespace(query)
+        parsed = self.nl_cache.get(key)
+        if parsed is not None:
+            self.nl_cache.move_to_end(key)
+            self.nl_cache_hits += 1
+            self._print_generated_sql(*parsed)
+            return parsed
+        self.nl_cache_misses += 1
+
         try:
-            for pattern, handler in patterns:
-                match = re.match(pattern, query)
-                if match:
-                    sql = handler(match)
-                    print(f"生成的SQL：{sql}")
-                    return sql
-            
-            return None
+            combined, routes = _nl_dispatcher()
+            match = combined.match(key)
+            if not match:
+                return None
+
+            offset, handler, extra = routes[match.lastgroup]
+            parsed = getattr(self, handler)(_BranchMatch(match, offset), *extra)
+            self._print_generated_sql(*parsed)
+
+            self.nl_cache[key] = parsed
+            if len(self.nl_cache) > self.nl_cache_size:
+                self.nl_cache.popitem(last=False)
+            return parsed
             
         except Exception as e:
             # 捕获并处理异常，保持程序运行
+            self.command_failed = True
             print(f"解析查询时发生错误: {str(e)}")
             return None
+
+    def _print_generated_sql(self, sql, params):
+        """打印解析生成的SQL模板及其绑定参数"""
+        print(f"生成的SQL：{sql}")
+        if params:
+            print(f"绑定参数：{params}")
+
+    def do_nl_cache(self, arg):
+        """
+        查看或清空自然语言查询缓存
+        用法: nl_cache [clear]
+        """
+        if arg.strip().lower() == 'clear':
+            self.nl_cache.clear()
+            self.nl_cache_hits = 0
+            self.nl_cache_misses = 0
+            print("自然语言查询缓存已清空")
+            return
+        lookups = self.nl_cache_hits + self.nl_cache_misses
+        hit_rate = self.nl_cache_hits / lookups * 100 if lookups else 0.0
+        print(f"缓存条目: {len(self.nl_cache)}/{self.nl_cache_size}")
+        print(f"命中: {self.nl_cache_hits}，未命中: {self.nl_cache_misses}，命中率: {hit_rate:.1f}%")
     
     def _build_comparison_query(self, match):
         """构建比较条件查询的SQL"""
@@ -640,34 +3115,27 @@ class MyCommandLineTool(cmd.Cmd):
         operator_chi = match.group(3)
         operator = op_mapping.get(operator_chi, ">")
         value = match.group(4)  # 修正：单条件查询只有4个组
-        
-        # 确保字符串值被引号包围
-        if not value.startswith("'") and not value.isdigit():
-            value = f"'{value}'"
-            
-        return f"SELECT * FROM {match.group(1)} WHERE {match.group(2)} {operator} {value}"
+
+        # 值以参数绑定，不同的值复用同一条预编译语句
+        return f"SELECT * FROM {match.group(1)} WHERE {match.group(2)} {operator} ?", (self._to_param(value),)
     
     def _build_string_query(self, match):
         """构建字符串条件查询的SQL"""
         operator = "LIKE" if match.group(3) == "包含" else "="
         operator = "!=" if match.group(3) == "不等于" else operator
         value = match.group(4)
-        
-        # 处理LIKE查询的通配符
-        if operator == "LIKE":
-            if not value.startswith("'"):
-                value = f"'%{value}%'"
-            elif not value.startswith("'%"):
-                value = f"'%{value[1:-1]}%'"
-        
-        # 确保字符串值被引号包围
-        if not value.startswith("'") and not value.isdigit():
-            value = f"'{value}'"
-            
-        return f"SELECT * FROM {match.group(1)} WHERE {match.group(2)} {operator} {value}"
+        param = self._to_param(value)
+
+        # 处理LIKE查询的通配符（用户已自带通配符时保持原样）
+        if operator == "LIKE" and not value.startswith("'%"):
+            param = f"%{param}%"
+
+        return f"SELECT * FROM {match.group(1)} WHERE {match.group(2)} {operator} ?", (param,)
     
-    def _build_improved_logic_query(self, match, logic_op_chi):
+    def _build_improved_logic_query(self, match, logic_op_chi=None):
         """构建改进的逻辑组合查询SQL（支持相同字段）"""
+        if logic_op_chi is None:
+            logic_op_chi = match.group(6)
         # 将中文逻辑操作符转换为SQL操作符
         logic_op = "AND" if logic_op_chi.lower() in ["并且", "而且", "且", "and"] else "OR"
         
@@ -679,13 +3147,31 @@ class MyCommandLineTool(cmd.Cmd):
         op1 = self._get_operator(op_chi1)
         op2 = self._get_operator(op_chi2)
         
-        # 格式化值
-        val1 = self._format_value(val1)
-        val2 = self._format_value(val2)
-        
-        # 构建完整SQL
-        return f"SELECT * FROM {match.group(1)} WHERE {field1} {op1} {val1} {logic_op} {field2} {op2} {val2}"
+        # 构建完整SQL，两个值均以参数绑定
+        return (f"SELECT * FROM {match.group(1)} WHERE {field1} {op1} ? {logic_op} {field2} {op2} ?",
+                (self._to_param(val1), self._to_param(val2)))
     
+    def _build_fields_query(self, match):
+        """构建查询特定字段的SQL"""
+        return f"SELECT {self._normalize_fields(match.group(2))} FROM {match.group(1)}", ()
+
+    def _build_select_all_query(self, match):
+        """构建查询所有数据的SQL"""
+        return f"SELECT * FROM {match.group(1)}", ()
+
+    def _build_between_query(self, match):
+        """构建范围查询（BETWEEN）的SQL"""
+        return (f"SELECT * FROM {match.group(1)} WHERE {match.group(2)} BETWEEN ? AND ?",
+                (self._to_param(match.group(4)), self._to_param(match.group(5))))
+
+    def _build_aggregate_query(self, match, function):
+        """构建聚合查询的SQL"""
+        return f"SELECT {function}({match.group(2)}) FROM {match.group(1)}", ()
+
+    def _build_count_query(self, match):
+        """构建记录数查询的SQL"""
+        return f"SELECT COUNT(*) FROM {match.group(1)}", ()
+
     def _get_operator(self, operator_chi):
         """将中文操作符转换为SQL操作符"""
         op_mapping = {
@@ -698,10 +3184,12 @@ class MyCommandLineTool(cmd.Cmd):
         }
         return op_mapping.get(operator_chi, "=")
     
-    def _format_value(self, value):
-        """格式化值，确保字符串被引号包围"""
-        if not value.startswith("'") and not value.isdigit():
-            return f"'{value}'"
+    def _to_param(self, value):
+        """将查询中的字面值转换为绑定参数：纯数字为整数，其余去掉两端引号后作为字符串"""
+        if value.isdigit():
+            return int(value)
+        if len(value) >= 2 and value.startswith("'") and value.endswith("'"):
+            return value[1:-1]
         return value
     
     def _normalize_fields(self, fields_str):
@@ -727,68 +3215,1003 @@ class MyCommandLineTool(cmd.Cmd):
         """执行SQL查询并格式化结果输出，支持以 visualon 结尾触发可视化"""
         arg = arg.strip()
         if not arg:
+            self.command_failed = True
+            print("请提供SQL查询语句或自然语言查询")
+            return
+
+        # 检查是否需要可视化
+        visualize = False
+        if arg.lower().endswith('visualon'):
+            visualize = True
+            arg = arg[:-9].strip()  # 移除触发词
+
+        try:
+            # 执行查询并格式化输出
+            self.check_sql(arg)  # 检查语法
+            row_count = self.run_select(arg)
+
+            # 触发可视化
+            if visualize and row_count:
+                sql_query = arg  # 使用原始查询语句（不含触发词）
+                self.visualize_data(sql_query)
+
+        except Exception as e:
+            self.command_failed = True
+            print(f"查询出错: {e}")
+
+    def print_table(self, rows, headers):
+        """以表格形式打印查询结果"""
+        if not rows:
+            print("结果为空")
+            return
+        
+        # 计算各列最大宽度
+        col_widths = [max(len(str(header)), max(len(str(row[i])) for row in rows)) for i, header in enumerate(headers)]
+        
+        # 打印表头及分隔线
+        self._print_table_header(headers, col_widths)
+        
+        # 打印数据行
+        self._print_table_rows(rows, col_widths)
+        
+        # 打印底部分隔线
+        self._print_table_separator(col_widths)
+
+    def run_select(self, sql, params=()):
+        """
+        执行只读查询并输出结果，开启结果缓存时优先从缓存读取，返回输出的行数
+        查询受时间/行数预算约束，被中止时返回 None
+        """
+        with self._query_guard():
+            sql, params = self._route_rollup(sql, params)
+            return self._run_select(self._route_fulltext(sql, params), params)
+
+    def _run_select(self, sql, params):
+        cache = self.result_cache
+        if cache is None:
+            cursor = self.db_connection.cursor()
+            with self.metrics.phase('execute'):
+                cursor.execute(sql, params)
+            return self.render_results(cursor)
+
+        self._validate_result_cache()
+        key = cache.make_key(sql, params)
+        cached = cache.get(key)
+        if cached is not None:
+            print("（结果来自缓存）")
+            return self.render_results(_RowSource(*cached))
+
+        cursor = self.db_connection.cursor()
+        with self.metrics.phase('execute'):
+            cursor.execute(sql, params)
+        recorder = _RecordingCursor(cursor, cache.max_bytes)
+        row_count = self.render_results(recorder)
+        if recorder.complete and recorder.rows is not None:
+            headers = [desc[0] for desc in cursor.description]
+            cache.put(key, headers, recorder.rows, recorder.size)
+        return row_count
+
+    def _validate_result_cache(self):
+        """其他连接提交或表结构变化时使缓存失效"""
+        cursor = self.db_connection.cursor()
+        state = (cursor.execute("PRAGMA data_version").fetchone()[0],
+                 cursor.execute("PRAGMA schema_version").fetchone()[0])
+        if state != self.result_cache.db_state:
+            self.result_cache.clear()
+            self.result_cache.db_state = state
+
+    def _mark_data_changed(self):
+        """本工具写入数据后调用；本连接的提交不会改变 data_version，需要主动清空缓存"""
+        self.write_generation += 1
+        if self.result_cache is not None:
+            self.result_cache.clear()
+
+    def do_cache(self, arg):
+        """
+        管理只读查询结果缓存
+        用法: cache on [内存上限MB] | cache off | cache clear | cache
+        """
+        args = arg.split()
+        action = args[0].lower() if args else ''
+        if action == 'on':
+            size_mb = 64
+            if len(args) > 1:
+                if not args[1].isdigit() or int(args[1]) <= 0:
+                    self.command_failed = True
+                    print("内存上限必须是正整数（MB）")
+                    return
+                size_mb = int(args[1])
+            self.result_cache = QueryResultCache(size_mb * 1024 * 1024)
+            print(f"查询结果缓存已开启，内存上限 {size_mb} MB")
+        elif action == 'off':
+            self.result_cache = None
+            print("查询结果缓存已关闭")
+        elif action == 'clear':
+            if self.result_cache is not None:
+                self.result_cache.clear()
+            print("查询结果缓存已清空")
+        elif not action:
+            cache = self.result_cache
+            if cache is None:
+                print("查询结果缓存未开启，使用 cache on [内存上限MB] 开启")
+                return
+            lookups = cache.hits + cache.misses
+            hit_rate = cache.hits / lookups * 100 if lookups else 0.0
+            print(f"缓存条目: {len(cache.entries)}，"
+                  f"占用约 {cache.used_bytes / 1024 / 1024:.1f}/{cache.max_bytes / 1024 / 1024:.0f} MB")
+            print(f"命中: {cache.hits}，未命中: {cache.misses}，命中率: {hit_rate:.1f}%")
+        else:
+            self.command_failed = True
+            print("参数错误，用法: cache on [内存上限MB] | cache off | cache clear | cache")
+
+    def render_results(self, cursor):
+        """按当前输出模式打印游标中的查询结果，返回已输出的行数"""
+        headers = [desc[0] for desc in cursor.description]
+        if self.stream_output:
+            return self.print_table_stream(cursor, headers)
+        with self.metrics.phase('fetch'):
+            results = self._count_query_rows(cursor.fetchmany(self._take_row_budget(sys.maxsize)))
+        self.metrics.add_rows(len(results))
+        self.print_table(results, headers)
+        self._check_query_budget()
+        return len(results)
+
+    def print_table_stream(self, cursor, headers):
+        """
+        以流式分页的方式打印查询结果，内存中只保留有限的几页数据
+        :param cursor: 已执行查询的游标（或任何提供 fetchmany 的对象）
+        :param headers: 列名列表
+        :return: 已输出的行数
+        """
+        page = self._fetch_page(cursor)
+        if not page:
+            print("结果为空")
+            return 0
+
+        # 只用首页作为样本计算列宽，不再为求列宽扫描全部结果
+        col_widths = self._sample_column_widths(page, headers)
+        exhausted = len(page) < self.page_size
+        total = len(page)
+
+        if not self._is_interactive():
+            # 非交互环境（管道、脚本）下不翻页，逐页连续输出
+            self._print_table_header(headers, col_widths)
+            while page:
+                self._print_table_rows(page, col_widths)
+                if exhausted:
+                    break
+                page = self._fetch_page(cursor)
+                exhausted = len(page) < self.page_size
+                total += len(page)
+            self._print_table_separator(col_widths)
+            print(f"共 {total} 条记录")
+            self._check_query_budget()
+            return total
+
+        # 交互环境：显示首页后由用户选择上一页/下一页
+        history = deque([(1, page)], maxlen=self.page_history)
+        index = 0
+        redraw = True
+        while True:
+            page_no, rows = history[index]
+            if redraw:
+                self._print_table_header(headers, col_widths)
+                self._print_table_rows(rows, col_widths)
+                self._print_table_separator(col_widths)
+                print(f"第 {page_no} 页，已读取 {total} 条记录" + ("（已到末尾）" if exhausted else ""))
+            redraw = True
+
+            has_prev = index > 0
+            has_next = index < len(history) - 1 or not exhausted
+            if not has_prev and not has_next:
+                self._check_query_budget()
+                return total
+
+            action = self._ask_page_action(has_prev, has_next)
+            if action == 'n' and has_next:
+                if index < len(history) - 1:
+                    index += 1
+                    continue
+                page = self._fetch_page(cursor)
+                exhausted = len(page) < self.page_size
+                if not page:
+                    print("已经是最后一页")
+                    redraw = False
+                    continue
+                total += len(page)
+                history.append((page_no + 1, page))
+                index = len(history) - 1
+            elif action == 'p' and has_prev:
+                index -= 1
+            elif action == 'q':
+                self._check_query_budget()
+                return total
+            else:
+                redraw = False
+
+    def _is_interactive(self):
+        """是否可以与用户交互（翻页提示等）"""
+        return sys.stdin.isatty() and not self.batch_mode
+
+    def _sample_column_widths(self, sample_rows, headers):
+        """根据列名和样本行计算各列显示宽度"""
+        col_widths = [len(str(header)) for header in headers]
+        for row in sample_rows:
+            for i, value in enumerate(row):
+                col_widths[i] = max(col_widths[i], len(str(value)))
+        return col_widths
+
+    def _fetch_page(self, cursor):
+        """读取一页结果，并计入读取阶段耗时和返回行数"""
+        size = self._take_row_budget(self.page_size)
+        with self.metrics.phase('fetch'):
+            rows = self._count_query_rows(cursor.fetchmany(size))
+        self.metrics.add_rows(len(rows))
+        return rows
+
+    def _emit(self, line):
+        """输出一行表格内容，并计入输出字节数"""
+        print(line)
+        self.metrics.add_bytes(len(line.encode('utf-8')) + 1)
+
+    def _print_table_separator(self, col_widths):
+        """打印表格分隔线"""
+        self._emit("-" * (sum(col_widths) + 3 * (len(col_widths) - 1)))
+
+    def _print_table_header(self, headers, col_widths):
+        """打印表头及其上下分隔线"""
+        self._print_table_separator(col_widths)
+        self._emit(" | ".join([str(header).ljust(col_widths[i]) for i, header in enumerate(headers)]))
+        self._print_table_separator(col_widths)
+
+    def _print_table_rows(self, rows, col_widths):
+        """打印数据行，超出样本宽度的值保持原样输出"""
+        with self.metrics.phase('render'):
+            for row in rows:
+                self._emit(" | ".join([str(value).ljust(col_widths[i]) for i, value in enumerate(row)]))
+
+    def _ask_page_action(self, has_prev, has_next):
+        """询问翻页操作，返回 'n'、'p' 或 'q'"""
+        options = []
+        if has_next:
+            options.append("n 下一页")
+        if has_prev:
+            options.append("p 上一页")
+        options.append("q 结束")
+        query = self._query
+        if query is not None:
+            query['waiting'] = True  # 等待输入的时间不计入时间预算
+            wait_start = time.perf_counter()
+        try:
+            choice = input(f"[{' / '.join(options)}]: ").strip().lower()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            return 'q'
+        finally:
+            if query is not None:
+                waited = time.perf_counter() - wait_start
+                query['waiting'] = False
+                query['waited'] += waited
+                if query['deadline']:
+                    query['deadline'] += waited
+        if choice in ('', 'n', 'next'):
+            return 'n' if has_next else 'q'
+        if choice in ('p', 'prev'):
+            return 'p'
+        if choice in ('q', 'quit'):
+            return 'q'
+        self.command_failed = True
+        print("无效的选择，请输入 n、p 或 q")
+        return None
+
+    def do_set_paging(self, arg):
+        """
+        设置查询结果的输出方式
+        用法: set_paging on|off [每页行数]
+        """
+        args = arg.split()
+        if not args or args[0].lower() not in ('on', 'off'):
+            state = "开启" if self.stream_output else "关闭"
+            print(f"当前分页输出已{state}，每页 {self.page_size} 行。用法: set_paging on|off [每页行数]")
+            return
+        if len(args) > 1:
+            if not args[1].isdigit() or int(args[1]) <= 0:
+                self.command_failed = True
+                print("每页行数必须是正整数")
+                return
+            self.page_size = int(args[1])
+        self.stream_output = args[0].lower() == 'on'
+        state = "开启" if self.stream_output else "关闭"
+        print(f"分页输出已{state}，每页 {self.page_size} 行")
+
+    def _resolve_query(self, arg):
+        """将 SQL 或自然语言查询解析为 (SQL, 绑定参数)，无法解析时返回 None"""
+        arg = arg.strip().rstrip(';')
+        if not arg:
+            return None
+        if arg.startswith("查询表"):
+            return self.parse_natural_language(arg)
+        return arg, ()
+
+    def fetch_columns(self, sql, params=()):
+        """
+        按列读取查询结果到 NumPy 数组，返回 (列名列表, numpy.ma.MaskedArray 列表)
+        数值列为连续的 int64/float64 缓冲区，空值由掩码表示；受查询时间/行数预算约束，被中止时返回 None
+        """
+        result = None
+        with self._query_guard(), self.metrics.phase('fetch'):
+            try:
+                headers, columns = fetch_columns(self.db_connection, sql, params, self.export_chunk_size,
+                                                 max_rows=self.query_row_budget)
+            except QueryCancelled as e:
+                self._query['reason'] = str(e)
+                raise
+            self.metrics.add_rows(len(columns[0]) if columns else 0)
+            result = headers, columns
+        return result
+
+    def _query_plan(self, sql, params=()):
+        """返回 EXPLAIN QUERY PLAN 的 (id, parent, detail) 列表"""
+        cursor = self.db_connection.cursor()
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [(row[0], row[1], row[3]) for row in cursor.fetchall()]
+
+    def _print_query_plan(self, plan):
+        """按父子关系缩进打印查询计划"""
+        depth = {0: -1}
+        for node_id, parent, detail in plan:
+            depth[node_id] = depth.get(parent, -1) + 1
+            print(f"{'  ' * depth[node_id]}|-- {detail}")
+
+    def do_explain(self, arg):
+        """
+        显示查询的执行计划
+        用法: explain <SQL查询语句或自然语言查询>
+        """
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法分析查询")
+            return
+        query = self._resolve_query(arg)
+        if query is None:
+            self.command_failed = True
             print("请提供SQL查询语句或自然语言查询")
             return
+        try:
+            sql, params = self._route_rollup(*query)
+            self._print_query_plan(self._query_plan(self._route_fulltext(sql, params), params))
+        except sqlite3.Error as e:
+            self.command_failed = True
+            print(f"分析查询计划时出错: {e}")
+
+    def do_create_index(self, arg):
+        """
+        为表创建索引
+        用法: create_index <表名> <列1[,列2...]> [索引名]
+        """
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法创建索引")
+            return
+        args = arg.split()
+        if len(args) not in (2, 3):
+            self.command_failed = True
+            print("参数错误，用法: create_index <表名> <列1[,列2...]> [索引名]")
+            return
+        table_name = args[0]
+        columns = [col.strip() for col in args[1].replace("，", ",").split(",") if col.strip()]
+        index_name = args[2] if len(args) == 3 else f"idx_{table_name}_{'_'.join(columns)}"
+        try:
+            start = time.perf_counter()
+            self.db_connection.execute(f"CREATE INDEX {index_name} ON {table_name} ({', '.join(columns)})")
+            self.db_connection.commit()
+            print(f"索引 {index_name} 创建成功，耗时 {time.perf_counter() - start:.2f} 秒")
+        except sqlite3.Error as e:
+            self.command_failed = True
+            print(f"创建索引时出错: {e}")
+
+    def do_drop_index(self, arg):
+        """
+        删除索引
+        用法: drop_index <索引名>
+        """
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法删除索引")
+            return
+        index_name = arg.strip()
+        if not index_name:
+            self.command_failed = True
+            print("参数错误，用法: drop_index <索引名>")
+            return
+        try:
+            self.db_connection.execute(f"DROP INDEX {index_name}")
+            self.db_connection.commit()
+            print(f"索引 {index_name} 已删除")
+        except sqlite3.Error as e:
+            self.command_failed = True
+            print(f"删除索引时出错: {e}")
+
+    def do_list_indexes(self, arg):
+        """
+        列出索引
+        用法: list_indexes [表名]
+        """
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法列出索引")
+            return
+        sql = "SELECT name, tbl_name, sql FROM sqlite_master WHERE type='index'"
+        params = ()
+        if arg.strip():
+            sql += " AND tbl_name=?"
+            params = (arg.strip(),)
+        rows = self.db_connection.execute(sql, params).fetchall()
+        if not rows:
+            print("没有找到索引")
+            return
+        for name, table_name, index_sql in rows:
+            print(f"{name} ({table_name}): {index_sql or '自动创建的约束索引'}")
+
+    # 查询中 FROM/JOIN 后的表名及其别名
+    _TABLE_REF_RE = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)(?:\s+(?:AS\s+)?([A-Za-z_]\w*))?", re.I)
+    # WHERE 条件中的 列 运算符，第二组为运算符
+    _FILTER_RE = re.compile(r"([A-Za-z_][\w]*(?:\.[A-Za-z_]\w*)?)\s*(==|=|<>|!=|<=|>=|<|>|\bIN\b|\bIS\b|\bBETWEEN\b|\bLIKE\b|\bGLOB\b)",
+                            re.I)
+    _CLAUSE_END_RE = re.compile(r"\b(?:GROUP\s+BY|ORDER\s+BY|LIMIT|HAVING|WINDOW)\b", re.I)
+    _NOT_ALIAS = {'WHERE', 'JOIN', 'ON', 'LEFT', 'RIGHT', 'INNER', 'OUTER', 'CROSS', 'NATURAL', 'GROUP',
+                  'ORDER', 'LIMIT', 'USING', 'UNION', 'HAVING', 'WINDOW', 'FULL'}
+
+    def _suggest_indexes(self, sql, plan):
+        """
+        根据查询计划中的全表扫描和 WHERE 条件中的列给出索引建议
+        等值条件列在前，第一个范围条件列其次，再附加 SELECT 中的列使索引成为覆盖索引
+        :return: [(表名, 列列表)]
+        """
+        aliases = {}
+        for table_name, alias in self._TABLE_REF_RE.findall(sql):
+            aliases[table_name.lower()] = table_name
+            if alias and alias.upper() not in self._NOT_ALIAS:
+                aliases[alias.lower()] = table_name
+
+        where = re.split(r"\bWHERE\b", sql, maxsplit=1, flags=re.I)
+        where = self._CLAUSE_END_RE.split(where[1])[0] if len(where) > 1 else ""
+        select_list = re.split(r"\bFROM\b", re.sub(r"^\s*SELECT\s+(DISTINCT\s+)?", "", sql, flags=re.I),
+                               maxsplit=1, flags=re.I)[0]
+
+        suggestions = []
+        for _, _, detail in plan:
+            words = detail.split()
+            if words[1:2] == ['TABLE']:  # SQLite 3.36 之前输出 SCAN TABLE 表名
+                del words[1]
+            if len(words) < 2 or words[0] != 'SCAN' or words[1].lower() not in aliases:
+                continue
+            scanned = words[1].lower()
+            table_name = aliases[scanned]
+            columns_info = self.schema.columns(self.db_connection, table_name)
+            table_columns = {col[1].lower(): col[1] for col in columns_info}
+            # INTEGER PRIMARY KEY 即 rowid，每个索引都隐含该列
+            pk_columns = [col for col in columns_info if col[5] > 0]
+            rowid_alias = pk_columns[0][1] if len(pk_columns) == 1 and pk_columns[0][2].upper() == 'INTEGER' else None
+
+            def own_column(reference):
+                # 限定名需属于当前扫描的表（或其别名），非限定名需是该表的列
+                if '.' in reference:
+                    qualifier, name = reference.split('.', 1)
+                    if qualifier.lower() != scanned and aliases.get(qualifier.lower()) != table_name:
+                        return None
+                    reference = name
+                return table_columns.get(reference.lower())
+
+            equality, ranges = [], []
+            for reference, operator in self._FILTER_RE.findall(where):
+                column = own_column(reference)
+                operator = operator.upper()
+                if column is None or operator in ('LIKE', 'GLOB'):  # '%…%' 模糊匹配无法使用普通索引
+                    continue
+                target = equality if operator in ('=', '==', 'IN', 'IS') else ranges
+                if column not in equality and column not in ranges:
+                    target.append(column)
+            if not equality and not ranges:
+                continue
+            index_columns = equality + ranges[:1]
+
+            # 附加 SELECT 中引用的其他列，使查询只读索引即可完成
+            if select_list.strip() != '*' and not select_list.strip().endswith('.*'):
+                for reference in re.findall(r"[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)?", select_list):
+                    column = own_column(reference)
+                    if column and column not in index_columns and column != rowid_alias:
+                        index_columns.append(column)
+            suggestions.append((table_name, index_columns))
+        return suggestions
+
+    # 可改用全文索引的 [表名.]列名 LIKE 条件，模式为参数占位符或字符串字面量
+    _LIKE_RE = re.compile(r"(?<![\w.])(?:([A-Za-z_]\w*)\.)?([A-Za-z_]\w*)\s+LIKE\s+(\?|'(?:[^']|'')*')(?!\s*ESCAPE\b)",
+                          re.I)
+
+    def _route_fulltext(self, sql, params=()):
+        """
+        把单表查询中 列 LIKE '%…%' 条件改写为先查该列的全文索引，返回改写后的 SQL
+        改写后的条件在全文索引上执行同一个 LIKE，结果与原查询一致；模式不足 3 个连续字符时保持原样
+        """
+        if self.db_connection is None or not self.schema.refresh(self.db_connection).fulltext:
+            return sql
+        refs = self._TABLE_REF_RE.findall(sql)
+        if (len(refs) != 1 or len(re.findall(r"\bSELECT\b", sql, re.I)) != 1
+                or re.search(r"\bFROM\s+\w+(?:\s+(?:AS\s+)?\w+)?\s*,", sql, re.I)):
+            return sql
+        table_name, alias = refs[0]
+        qualifiers = {table_name.lower()}
+        if alias and alias.upper() not in self._NOT_ALIAS:
+            qualifiers.add(alias.lower())
+
+        routed = []
+
+        def replace(match):
+            qualifier, column, pattern = match.groups()
+            if qualifier and qualifier.lower() not in qualifiers:
+                return match.group(0)
+            if re.search(r"\bNOT\s*$", sql[:match.start()], re.I):
+                return match.group(0)  # NOT 对空值的处理与 IN 子查询不同
+            index_name = self.schema.fulltext_index(self.db_connection, table_name, column)
+            if index_name is None:
+                return match.group(0)
+            if pattern == '?':
+                # 跳过字符串字面量中的问号，确定该占位符对应第几个参数
+                position = re.sub(r"'(?:[^']|'')*'", "", sql[:match.start()]).count('?')
+                value = params[position] if position < len(params) else None
+            else:
+                value = pattern[1:-1].replace("''", "'")
+            if not _like_uses_trigrams(value):
+                return match.group(0)
+            routed.append(index_name)
+            rowid = f"{qualifier}.rowid" if qualifier else "rowid"
+            return f"{rowid} IN (SELECT rowid FROM {index_name} WHERE {index_name}.{column} LIKE {pattern})"
+
+        rewritten = self._LIKE_RE.sub(replace, sql)
+        if routed:
+            print(f"（使用全文索引 {', '.join(dict.fromkeys(routed))}）")
+        return rewritten
+
+    def do_create_fulltext(self, arg):
+        """
+        为文本列创建 FTS5 全文索引（trigram 分词，适合中文），由触发器与原表保持同步
+        之后 包含 查询与单表查询中的 列 LIKE '%…%' 条件会自动使用该索引，匹配串需至少 3 个字符
+        用法: create_fulltext <表名> <列名>
+        """
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法创建全文索引")
+            return
+        args = arg.split()
+        if len(args) != 2:
+            self.command_failed = True
+            print("参数错误，用法: create_fulltext <表名> <列名>")
+            return
+        conn = self.db_connection
+        table_name = self.schema.resolve(conn, args[0])
+        if table_name not in self.schema.table_names(conn):
+            self.command_failed = True
+            print(f"表 {args[0]} 不存在，请先创建该表")
+            return
+        column = next((col[1] for col in self.schema.columns(conn, table_name)
+                       if col[1].lower() == args[1].lower()), None)
+        if column is None:
+            self.command_failed = True
+            print(f"列 {args[1]} 不存在于表 {table_name} 中")
+            return
+        existing = self.schema.fulltext_index(conn, table_name, column)
+        if existing:
+            self.command_failed = True
+            print(f"列 {table_name}.{column} 已有全文索引 {existing}")
+            return
 
-        # 检查是否需要可视化
-        visualize = False
-        if arg.lower().endswith('visualon'):
-            visualize = True
-            arg = arg[:-9].strip()  # 移除触发词
+        index_name = _fulltext_name(table_name, column)
+        try:
+            if conn.in_transaction:
+                conn.commit()
+            start = time.perf_counter()
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            try:
+                cursor.execute(f"CREATE VIRTUAL TABLE {index_name} USING fts5({column}, content='{table_name}', "
+                               f"tokenize='trigram')")
+                cursor.execute(f"CREATE TRIGGER {index_name}_ai AFTER INSERT ON {table_name} BEGIN "
+                               f"INSERT INTO {index_name}(rowid, {column}) VALUES (new.rowid, new.{column}); END")
+                cursor.execute(f"CREATE TRIGGER {index_name}_ad AFTER DELETE ON {table_name} BEGIN "
+                               f"INSERT INTO {index_name}({index_name}, rowid, {column}) "
+                               f"VALUES ('delete', old.rowid, old.{column}); END")
+                cursor.execute(f"CREATE TRIGGER {index_name}_au AFTER UPDATE ON {table_name} "
+                               f"WHEN old.{column} IS NOT new.{column} OR old.rowid != new.rowid BEGIN "
+                               f"INSERT INTO {index_name}({index_name}, rowid, {column}) "
+                               f"VALUES ('delete', old.rowid, old.{column}); "
+                               f"INSERT INTO {index_name}(rowid, {column}) VALUES (new.rowid, new.{column}); END")
+                cursor.execute(f"INSERT INTO {index_name}({index_name}) VALUES ('rebuild')")
+                rows = cursor.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            print(f"全文索引 {index_name} 创建成功，已索引 {rows} 行，耗时 {time.perf_counter() - start:.2f} 秒")
+        except sqlite3.OperationalError as e:
+            self.command_failed = True
+            if 'fts5' in str(e) or 'tokenizer' in str(e):
+                print(f"当前 SQLite {sqlite3.sqlite_version} 不支持 FTS5 trigram 分词（需要 3.34 及以上版本并启用 FTS5）")
+            else:
+                print(f"创建全文索引时出错: {e}")
+        except sqlite3.Error as e:
+            self.command_failed = True
+            print(f"创建全文索引时出错: {e}")
+
+    def _drop_fulltext(self, index_name):
+        """删除全文索引及其同步触发器（不提交）"""
+        cursor = self.db_connection.cursor()
+        for suffix in ('_ai', '_ad', '_au'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {index_name}{suffix}")
+        cursor.execute(f"DROP TABLE IF EXISTS {index_name}")
 
+    def do_drop_fulltext(self, arg):
+        """
+        删除列上的全文索引
+        用法: drop_fulltext <表名> <列名>
+        """
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法删除全文索引")
+            return
+        args = arg.split()
+        if len(args) != 2:
+            self.command_failed = True
+            print("参数错误，用法: drop_fulltext <表名> <列名>")
+            return
+        index_name = self.schema.fulltext_index(self.db_connection, args[0], args[1])
+        if index_name is None:
+            self.command_failed = True
+            print(f"列 {args[0]}.{args[1]} 没有全文索引")
+            return
         try:
-            # 执行查询
-            cursor = self.db_connection.cursor()
-            self.check_sql(arg)  # 检查语法
-            cursor.execute(arg)
-            results = cursor.fetchall()
-            column_names = [desc[0] for desc in cursor.description]
+            self._drop_fulltext(index_name)
+            self.db_connection.commit()
+            print(f"全文索引 {index_name} 已删除")
+        except sqlite3.Error as e:
+            self.command_failed = True
+            self.db_connection.rollback()
+            print(f"删除全文索引时出错: {e}")
 
-            # 格式化输出
-            self.print_table(results, column_names)
+    def do_list_fulltext(self, arg):
+        """
+        列出全文索引
+        用法: list_fulltext [表名]
+        """
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法列出全文索引")
+            return
+        indexes = self.schema.fulltext_indexes(self.db_connection, arg.strip() or None)
+        if not indexes:
+            print("没有找到全文索引")
+            return
+        for table_name, column, index_name in indexes:
+            print(f"{index_name} ({table_name}.{column})")
 
-            # 触发可视化
-            if visualize and results:
-                sql_query = arg  # 使用原始查询语句（不含触发词）
-                self.visualize_data(sql_query)
+    def _route_rollup(self, sql, params=()):
+        """符合条件的计数查询改为读取 security_event 的时间分桶汇总表，返回 (SQL, 绑定参数)"""
+        if self.db_connection is None or not self.schema.refresh(self.db_connection).rollups:
+            return sql, params
+        try:
+            exact_bounds = {row[0] for row in self.db_connection.execute(
+                f"SELECT name FROM {ROLLUP_REGISTRY} WHERE canonical_time")}
+        except sqlite3.Error:
+            exact_bounds = set()
+        routed = _rewrite_rollup_query(sql, params, self.schema.rollups, exact_bounds)
+        if routed is None:
+            return sql, params
+        print(f"（使用汇总表 {routed[2]}）")
+        return routed[0], routed[1]
 
-        except Exception as e:
-            print(f"查询出错: {e}")
+    def do_create_rollup(self, arg):
+        """
+        为 security_event 创建按 occur_time 时间分桶计数的汇总表，由触发器随原表的增删改增量维护
+        之后按时间桶和这些维度分组的 COUNT(*) 查询（含自然语言的记录数查询）会自动改为读取汇总表
+        occur_time 出现非 YYYY-MM-DD HH:MM:SS 格式的值后，带时间条件的查询不再改写，refresh_rollup 时重新检查
+        用法: create_rollup <汇总表名> <hour|day|month> [维度列1,维度列2...]
+        例如: create_rollup event_daily day event_type,event_level,location
+        """
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法创建汇总表")
+            return
+        args = arg.split()
+        if len(args) not in (2, 3) or args[1].lower() not in ROLLUP_BUCKETS:
+            self.command_failed = True
+            print("参数错误，用法: create_rollup <汇总表名> <hour|day|month> [维度列1,维度列2...]")
+            return
+        conn = self.db_connection
+        name, granularity = args[0], args[1].lower()
+        if not re.fullmatch(r"[A-Za-z_]\w*", name) or self.schema.resolve(conn, name):
+            self.command_failed = True
+            print(f"汇总表名 {name} 无效或已被占用")
+            return
+        source_columns = {col[1].lower(): col for col in self.schema.columns(conn, ROLLUP_SOURCE)}
+        if ROLLUP_TIME_COLUMN not in source_columns:
+            self.command_failed = True
+            print(f"表 {ROLLUP_SOURCE} 不存在或没有 {ROLLUP_TIME_COLUMN} 列，请先执行 create_related_tables")
+            return
+        dimensions = []
+        for dim in (args[2].replace("，", ",").split(",") if len(args) == 3 else []):
+            column = source_columns.get(dim.strip().lower())
+            if column is None or column[1].lower() == ROLLUP_TIME_COLUMN:
+                self.command_failed = True
+                print(f"维度列 {dim.strip()} 不是 {ROLLUP_SOURCE} 中可用的列")
+                return
+            if column[1] not in dimensions:
+                dimensions.append(column[1])
 
-    def print_table(self, rows, headers):
-        """以表格形式打印查询结果"""
-        if not rows:
-            print("结果为空")
+        bucket = ROLLUP_BUCKETS[granularity]
+        column_defs = ", ".join(["bucket TEXT"] + [f"{dim} {source_columns[dim.lower()][2]}".strip()
+                                                   for dim in dimensions] + ["event_count INTEGER NOT NULL"])
+        key_columns = ", ".join(["bucket"] + dimensions)
+
+        def key_match(row):
+            return " AND ".join([f"bucket IS {bucket.format(f'{row}.{ROLLUP_TIME_COLUMN}')}"]
+                                + [f"{dim} IS {row}.{dim}" for dim in dimensions])
+
+        def add(row):
+            values = ", ".join([bucket.format(f"{row}.{ROLLUP_TIME_COLUMN}")] + [f"{row}.{dim}" for dim in dimensions])
+            return (f"INSERT INTO {name} ({key_columns}, event_count) SELECT {values}, 0 "
+                    f"WHERE NOT EXISTS (SELECT 1 FROM {name} WHERE {key_match(row)}); "
+                    f"UPDATE {name} SET event_count = event_count + 1 WHERE {key_match(row)}; "
+                    f"UPDATE {ROLLUP_REGISTRY} SET canonical_time = 0 WHERE name = '{name}' AND canonical_time "
+                    f"AND NOT ({row}.{ROLLUP_TIME_COLUMN} GLOB {_CANONICAL_TIME_GLOB});")
+
+        def remove(row):
+            return (f"UPDATE {name} SET event_count = event_count - 1 WHERE {key_match(row)}; "
+                    f"DELETE FROM {name} WHERE {key_match(row)} AND event_count <= 0;")
+
+        try:
+            if conn.in_transaction:
+                conn.commit()
+            start = time.perf_counter()
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            try:
+                cursor.execute(f"CREATE TABLE IF NOT EXISTS {ROLLUP_REGISTRY} (name TEXT PRIMARY KEY, "
+                               f"granularity TEXT NOT NULL, dimensions TEXT NOT NULL, "
+                               f"canonical_time INTEGER NOT NULL DEFAULT 1)")
+                cursor.execute(f"CREATE TABLE {name} ({column_defs})")
+                cursor.execute(f"CREATE INDEX {name}_key ON {name} ({key_columns})")
+                cursor.execute(f"CREATE TRIGGER {name}_ai AFTER INSERT ON {ROLLUP_SOURCE} BEGIN {add('new')} END")
+                cursor.execute(f"CREATE TRIGGER {name}_ad AFTER DELETE ON {ROLLUP_SOURCE} BEGIN {remove('old')} END")
+                cursor.execute(f"CREATE TRIGGER {name}_au AFTER UPDATE OF {', '.join([ROLLUP_TIME_COLUMN] + dimensions)} "
+                               f"ON {ROLLUP_SOURCE} BEGIN {remove('old')} {add('new')} END")
+                cursor.execute(f"INSERT INTO {ROLLUP_REGISTRY} (name, granularity, dimensions) VALUES (?, ?, ?)",
+                               (name, granularity, ",".join(dimensions)))
+                rows = self._fill_rollup(name, granularity, dimensions)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            print(f"汇总表 {name} 创建成功（按{granularity}，维度: {', '.join(dimensions) or '无'}），"
+                  f"共 {rows} 个分组，耗时 {time.perf_counter() - start:.2f} 秒")
+        except sqlite3.Error as e:
+            self.command_failed = True
+            print(f"创建汇总表时出错: {e}")
+
+    def _fill_rollup(self, name, granularity, dimensions):
+        """
+        清空并从 security_event 重新计算汇总表（不提交），返回分组数
+        同时重新检查 occur_time 是否全部为规范格式，决定时间条件能否改写到该汇总表
+        """
+        key_columns = ", ".join(["bucket"] + list(dimensions))
+        cursor = self.db_connection.cursor()
+        cursor.execute(f"DELETE FROM {name}")
+        cursor.execute(f"INSERT INTO {name} ({key_columns}, event_count) "
+                       f"SELECT {', '.join([ROLLUP_BUCKETS[granularity].format(ROLLUP_TIME_COLUMN)] + list(dimensions))}, "
+                       f"COUNT(*) FROM {ROLLUP_SOURCE} GROUP BY {', '.join(str(i + 1) for i in range(len(dimensions) + 1))}")
+        groups = cursor.rowcount
+        cursor.execute(f"UPDATE {ROLLUP_REGISTRY} SET canonical_time = NOT EXISTS (SELECT 1 FROM {ROLLUP_SOURCE} "
+                       f"WHERE NOT ({ROLLUP_TIME_COLUMN} GLOB {_CANONICAL_TIME_GLOB})) WHERE name = ?", (name,))
+        return groups
+
+    def _drop_rollup(self, name):
+        """删除汇总表、维护触发器和登记信息（不提交）"""
+        cursor = self.db_connection.cursor()
+        for suffix in ('_ai', '_ad', '_au'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}{suffix}")
+        cursor.execute(f"DROP TABLE IF EXISTS {name}")
+        cursor.execute(f"DELETE FROM {ROLLUP_REGISTRY} WHERE name = ?", (name,))
+
+    def _get_rollup(self, name):
+        """按名称查找汇总表，返回 (实际名称, (粒度, 维度))，不存在时输出提示并返回 None"""
+        rollups = self.schema.refresh(self.db_connection).rollups
+        actual = next((rollup for rollup in rollups if rollup.lower() == name.lower()), None)
+        if actual is None:
+            self.command_failed = True
+            print(f"汇总表 {name} 不存在")
+            return None
+        return actual, rollups[actual]
+
+    def do_drop_rollup(self, arg):
+        """
+        删除汇总表及其维护触发器
+        用法: drop_rollup <汇总表名>
+        """
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法删除汇总表")
             return
-        
-        # 计算各列最大宽度
-        col_widths = [max(len(str(header)), max(len(str(row[i])) for row in rows)) for i, header in enumerate(headers)]
-        
-        # 打印分隔线
-        print("-" * (sum(col_widths) + 3 * (len(headers) - 1)))
-        
-        # 打印表头
-        header_line = " | ".join([header.ljust(col_widths[i]) for i, header in enumerate(headers)])
-        print(header_line)
-        
-        # 打印分隔线
-        print("-" * (sum(col_widths) + 3 * (len(headers) - 1)))
-        
-        # 打印数据行
-        for row in rows:
-            data_line = " | ".join([str(row[i]).ljust(col_widths[i]) for i in range(len(row))])
-            print(data_line)
-        
-        # 打印底部分隔线
-        print("-" * (sum(col_widths) + 3 * (len(headers) - 1)))
+        if not arg.strip():
+            self.command_failed = True
+            print("参数错误，用法: drop_rollup <汇总表名>")
+            return
+        rollup = self._get_rollup(arg.strip())
+        if rollup is None:
+            return
+        try:
+            self._drop_rollup(rollup[0])
+            self.db_connection.commit()
+            print(f"汇总表 {rollup[0]} 已删除")
+        except sqlite3.Error as e:
+            self.command_failed = True
+            self.db_connection.rollback()
+            print(f"删除汇总表时出错: {e}")
+
+    def do_refresh_rollup(self, arg):
+        """
+        从 security_event 重新计算汇总表，用于触发器被绕过或怀疑数据不一致时补齐
+        用法: refresh_rollup <汇总表名>
+        """
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法刷新汇总表")
+            return
+        if not arg.strip():
+            self.command_failed = True
+            print("参数错误，用法: refresh_rollup <汇总表名>")
+            return
+        rollup = self._get_rollup(arg.strip())
+        if rollup is None:
+            return
+        name, (granularity, dimensions) = rollup
+        conn = self.db_connection
+        try:
+            if conn.in_transaction:
+                conn.commit()
+            start = time.perf_counter()
+            conn.execute("BEGIN")
+            try:
+                rows = self._fill_rollup(name, granularity, dimensions)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            print(f"汇总表 {name} 已重新计算，共 {rows} 个分组，耗时 {time.perf_counter() - start:.2f} 秒")
+        except sqlite3.Error as e:
+            self.command_failed = True
+            print(f"刷新汇总表时出错: {e}")
+
+    def do_list_rollups(self, arg):
+        """列出 security_event 的时间分桶汇总表"""
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法列出汇总表")
+            return
+        try:
+            rollups = self.schema.refresh(self.db_connection).rollups
+            if not rollups:
+                print("没有找到汇总表")
+                return
+            for name, (granularity, dimensions) in rollups.items():
+                groups = self.db_connection.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+                print(f"{name}: 按{granularity}，维度 {', '.join(dimensions) or '无'}，{groups} 个分组")
+        except sqlite3.Error as e:
+            self.command_failed = True
+            print(f"列出汇总表时出错: {e}")
+
+    def _time_query(self, sql, params, runs=3):
+        """
+        多次执行查询并读取全部结果，返回最短耗时（秒）
+        在 query_only 下的保存点中执行，结束时总是回滚，不会留下任何修改
+        """
+        conn = self.db_connection
+        best = None
+        with self._read_only():
+            conn.execute("SAVEPOINT advise_timing")
+            try:
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    cursor = conn.execute(sql, params)
+                    while cursor.fetchmany(10000):
+                        pass
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+            finally:
+                conn.execute("ROLLBACK TO advise_timing")
+                conn.execute("RELEASE advise_timing")
+        return best
+
+    def do_advise_index(self, arg):
+        """
+        分析查询计划中的全表扫描并给出索引建议，以 apply 结尾时创建索引并对比前后的计划与耗时
+        用法: advise_index <SQL查询语句或自然语言查询> [apply]
+        """
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法分析查询")
+            return
+        arg = arg.strip()
+        apply = arg.lower().endswith(' apply')
+        if apply:
+            arg = arg[:-6].strip()
+        query = self._resolve_query(arg)
+        if query is None:
+            self.command_failed = True
+            print("请提供SQL查询语句或自然语言查询")
+            return
+        sql, params = query
+        if not is_read_query(sql):
+            self.command_failed = True
+            print("只能分析 SELECT 查询")
+            return
+        try:
+            plan = self._query_plan(sql, params)
+            print("当前执行计划:")
+            self._print_query_plan(plan)
+            suggestions = self._suggest_indexes(sql, plan)
+            if not suggestions:
+                print("没有发现可通过索引消除的带条件全表扫描")
+                return
+
+            for table_name, columns in suggestions:
+                index_name = self._unused_index_name(f"idx_{table_name}_{'_'.join(columns)}")
+                print(f"建议: CREATE INDEX {index_name} ON {table_name} ({', '.join(columns)})")
+                if not apply:
+                    continue
+
+                before = self._time_query(sql, params)
+                # 名称未被占用，撤销时删除的只会是本次创建的索引
+                self.db_connection.execute(f"CREATE INDEX {index_name} ON {table_name} ({', '.join(columns)})")
+                self.db_connection.commit()
+                new_plan = self._query_plan(sql, params)
+                print("创建索引后的执行计划:")
+                self._print_query_plan(new_plan)
+                if not any(re.search(rf"\bINDEX {re.escape(index_name)}\b", detail) for _, _, detail in new_plan):
+                    self.db_connection.execute(f"DROP INDEX {index_name}")
+                    self.db_connection.commit()
+                    print(f"查询计划未使用索引 {index_name}，已撤销")
+                    continue
+                after = self._time_query(sql, params)
+                if after >= before * 0.9:
+                    # 条件选择性太低时索引反而更慢，不保留
+                    self.db_connection.execute(f"DROP INDEX {index_name}")
+                    self.db_connection.commit()
+                    print(f"索引 {index_name} 未带来明显提升（{before * 1000:.2f} ms -> {after * 1000:.2f} ms），已撤销")
+                    continue
+                speedup = before / after if after > 0 else float('inf')
+                print(f"索引 {index_name} 已创建：查询耗时 {before * 1000:.2f} ms -> {after * 1000:.2f} ms（{speedup:.1f} 倍）")
+        except sqlite3.Error as e:
+            self.command_failed = True
+            print(f"分析索引时出错: {e}")
+
+    def _unused_index_name(self, base):
+        """返回以 base 为前缀、尚未被任何表/索引/视图/触发器使用的名称"""
+        used = {row[0].lower() for row in self.db_connection.execute(
+            "SELECT name FROM sqlite_master UNION ALL SELECT name FROM sqlite_temp_master")}
+        name, suffix = base, 1
+        while name.lower() in used:
+            suffix += 1
+            name = f"{base}_{suffix}"
+        return name
 
     def do_change_data(self, arg):
         """参数格式: table_name SET column1 = value1, column2 = value2 WHERE condition"""
         if self.db_connection is None:
+            self.command_failed = True
             print("数据库连接失败，无法执行更新操作")
             return
 
         if not arg.strip():
+            self.command_failed = True
             print("参数不能为空，请指定表名、SET子句和WHERE条件")
             return
 
@@ -797,16 +4220,19 @@ class MyCommandLineTool(cmd.Cmd):
 
         try:
             self.check_sql(sql)  # 检查 SQL 语法
-            cursor = self.db_connection.cursor()
-            cursor.execute(sql)
-            self.db_connection.commit()
+            with self._query_guard():
+                cursor = self.db_connection.cursor()
+                cursor.execute(sql)
+                self.db_connection.commit()
+                self._mark_data_changed()
 
-            if cursor.rowcount == 0:
-                print("没有找到符合条件的数据，无法进行更新操作。")
-            else:
-                print(f"成功更新 {cursor.rowcount} 条记录")
+                if cursor.rowcount == 0:
+                    print("没有找到符合条件的数据，无法进行更新操作。")
+                else:
+                    print(f"成功更新 {cursor.rowcount} 条记录")
 
         except sqlite3.OperationalError as e:
+            self.command_failed = True
             error_message = str(e)
             if "no such table" in error_message:
                 table_name = arg.split()[0]  # 提取第一个词作为表名
@@ -821,15 +4247,18 @@ class MyCommandLineTool(cmd.Cmd):
             else:
                 print(f"执行更新操作时出错: {e}")
         except Exception as e:
+            self.command_failed = True
             print(f"执行更新操作时出错: {e}")
 
     def do_delete_data(self, arg):
         """参数格式: table_name WHERE condition1 AND condition2..."""
         if self.db_connection is None:
+            self.command_failed = True
             print("数据库连接失败，无法执行删除操作")
             return
 
         if not arg.strip():
+            self.command_failed = True
             print("参数不能为空，请指定表名和条件")
             return
 
@@ -838,16 +4267,19 @@ class MyCommandLineTool(cmd.Cmd):
 
         try:
             self.check_sql(sql)  # 检查 SQL 语法
-            cursor = self.db_connection.cursor()
-            cursor.execute(sql)
-            self.db_connection.commit()
+            with self._query_guard():
+                cursor = self.db_connection.cursor()
+                cursor.execute(sql)
+                self.db_connection.commit()
+                self._mark_data_changed()
 
-            if cursor.rowcount == 0:
-                print("没有找到符合条件的数据，无法进行删除操作。")
-            else:
-                print(f"成功删除 {cursor.rowcount} 条记录")
+                if cursor.rowcount == 0:
+                    print("没有找到符合条件的数据，无法进行删除操作。")
+                else:
+                    print(f"成功删除 {cursor.rowcount} 条记录")
 
         except sqlite3.OperationalError as e:
+            self.command_failed = True
             error_message = str(e)
             if "no such table" in error_message:
                 table_name = arg.split()[0]  # 提取第一个词作为表名
@@ -860,11 +4292,16 @@ class MyCommandLineTool(cmd.Cmd):
             else:
                 print(f"执行删除操作时出错: {e}")
         except Exception as e:
+            self.command_failed = True
             print(f"执行删除操作时出错: {e}")
 
     def do_quit(self, arg):
         """退出命令行工具"""
         print("正在退出命令行工具")
+        for job in self.jobs.values():
+            job.cancel()
+        if self.read_pool is not None:
+            self.read_pool.close()
         if self.db_connection:
             self.db_connection.close()
         return True
@@ -873,51 +4310,494 @@ class MyCommandLineTool(cmd.Cmd):
         """在命令循环开始前执行，用于显示表数量和表名"""
         super().preloop()
         if self.db_connection:
-            cursor = self.db_connection.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = cursor.fetchall()
+            tables = self.schema.table_names(self.db_connection)
             print(f"数据库中共有 {len(tables)} 个关系表")
             #输出所有表名
             print("表名如下：")
             for table in tables:
-                print(f"- {table[0]}")
+                print(f"- {table}")
 
-    def import_excel_to_table(self, excel_file_path, table_name):
+    def import_excel_to_table(self, excel_file_path, table_name, fast=False):
         """
-        读取 Excel 文件并根据列名自动插入数据到指定的表中
+        分块读取 Excel 文件并在单个事务中批量插入到指定的表中
         :param excel_file_path: Excel 文件路径
         :param table_name: 目标表名
+        :param fast: 是否在导入期间临时放宽 journal_mode 与 synchronous 设置
         """
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法导入数据")
+            return
+        if not os.path.exists(excel_file_path):
+            self.command_failed = True
+            print(f"文件 {excel_file_path} 不存在")
+            return
+
+        conn = self.db_connection
+        saved_pragmas = None
+        total = 0
         try:
-            df = pd.read_excel(excel_file_path)
-            columns = df.columns.tolist()
+            columns, chunks = self._read_excel_chunks(excel_file_path, self.import_chunk_size)
             placeholders = ', '.join(['?'] * len(columns))
             insert_sql = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
 
-            cursor = self.db_connection.cursor()
-            for _, row in df.iterrows():
-                values = tuple(row)
-                cursor.execute(insert_sql, values)
-            self.db_connection.commit()
-            print(f"数据已成功从 {excel_file_path} 插入到表 {table_name} 中")
+            if conn.in_transaction:
+                conn.commit()
+            if fast:
+                saved_pragmas = self._relax_load_pragmas()
+
+            start = time.perf_counter()
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            try:
+                for chunk in chunks:
+                    cursor.executemany(insert_sql, chunk)
+                    total += len(chunk)
+                conn.commit()
+                self._mark_data_changed()
+            except Exception:
+                conn.rollback()
+                raise
+            elapsed = time.perf_counter() - start
+
+            rate = total / elapsed if elapsed > 0 else float(total)
+            print(f"数据已成功从 {excel_file_path} 插入到表 {table_name} 中，"
+                  f"共 {total} 行，耗时 {elapsed:.2f} 秒（{rate:,.0f} 行/秒）")
         except FileNotFoundError:
+            self.command_failed = True
             print(f"文件 {excel_file_path} 不存在")
         except Exception as e:
-            print(f"插入数据时出错: {e}")
+            self.command_failed = True
+            print(f"插入数据时出错: {e}（已回滚，本次未导入任何数据）")
+        finally:
+            if saved_pragmas is not None:
+                self._restore_pragmas(saved_pragmas)
+
+    def _read_excel_chunks(self, excel_file_path, chunk_size):
+        """读取 Excel 表头，并返回按块产出原生元组列表的迭代器"""
+        header, rows, close = self._open_excel_rows(excel_file_path)
+        if header is None:
+            close()
+            raise ValueError("Excel 文件中没有表头")
+        # 忽略没有列名的空白列
+        indexes = [i for i, name in enumerate(header) if name not in (None, '')]
+        columns = [str(header[i]) for i in indexes]
+
+        def generate():
+            try:
+                chunk = []
+                for row in rows:
+                    values = tuple(self._to_sql_value(row[i]) if i < len(row) else None for i in indexes)
+                    if all(value is None for value in values):
+                        continue
+                    chunk.append(values)
+                    if len(chunk) >= chunk_size:
+                        yield chunk
+                        chunk = []
+                if chunk:
+                    yield chunk
+            finally:
+                close()
+        return columns, generate()
+
+    def _open_excel_rows(self, excel_file_path):
+        """
+        打开 Excel 文件并返回 (表头, 数据行迭代器, 关闭函数)
+        优先使用 python-calamine 流式读取，其次 openpyxl 只读模式，最后回退到 pandas
+        """
+        try:
+            from python_calamine import CalamineWorkbook
+        except ImportError:
+            CalamineWorkbook = None
+
+        if CalamineWorkbook is not None:
+            workbook = CalamineWorkbook.from_path(excel_file_path)
+            # calamine 以空字符串表示空单元格，数值统一为浮点数
+            rows = ([None if value == '' else
+                     int(value) if isinstance(value, float) and value.is_integer() else value
+                     for value in row]
+                    for row in workbook.get_sheet_by_index(0).iter_rows())
+            return next(rows, None), rows, workbook.close
+
+        if excel_file_path.lower().endswith(('.xlsx', '.xlsm')):
+            from openpyxl import load_workbook
+            workbook = load_workbook(excel_file_path, read_only=True, data_only=True)
+            rows = workbook.active.iter_rows(values_only=True)
+            return next(rows, None), rows, workbook.close
+
+        import pandas as pd
+        df = pd.read_excel(excel_file_path)
+        return list(df.columns), df.itertuples(index=False, name=None), lambda: None
+
+    def _to_sql_value(self, value):
+        """将 Excel/pandas 读出的值转换为 sqlite3 可直接绑定的原生类型"""
+        if value is None or isinstance(value, (str, int)):
+            return value
+        pandas = sys.modules.get('pandas')  # 未加载 pandas 时不可能出现 NaT
+        if pandas is not None and value is pandas.NaT:
+            return None
+        if isinstance(value, float):
+            return None if value != value else value  # NaN 视为空值
+        if isinstance(value, datetime.datetime):
+            return value.isoformat(sep=' ')
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        if hasattr(value, 'item'):  # numpy 标量
+            return self._to_sql_value(value.item())
+        return str(value)
+
+    def _relax_load_pragmas(self):
+        """为批量导入临时关闭同步并使用内存日志，返回原设置以便恢复"""
+        cursor = self.db_connection.cursor()
+        saved = {
+            'journal_mode': cursor.execute("PRAGMA journal_mode").fetchone()[0],
+            'synchronous': cursor.execute("PRAGMA synchronous").fetchone()[0],
+        }
+        cursor.execute("PRAGMA journal_mode = MEMORY")
+        cursor.execute("PRAGMA synchronous = OFF")
+        return saved
+
+    def _restore_pragmas(self, saved):
+        """恢复 _relax_load_pragmas 修改前的设置"""
+        try:
+            cursor = self.db_connection.cursor()
+            for name, value in saved.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        except sqlite3.Error as e:
+            self.command_failed = True
+            print(f"恢复数据库设置时出错: {e}")
 
     def do_import_excel(self, arg):
-        """导入 Excel 文件到指定表中"""
+        """
+        导入 Excel 文件到指定表中
+        用法: import_excel <excel_file_path> <table_name> [fast]
+        指定 fast 时导入期间临时关闭同步写盘，速度更快但断电时数据库可能损坏
+        """
         args = arg.split()
-        if len(args) != 2:
-            print("参数错误，用法: import_excel <excel_file_path> <table_name>")
+        if len(args) not in (2, 3) or (len(args) == 3 and args[2].lower() != 'fast'):
+            self.command_failed = True
+            print("参数错误，用法: import_excel <excel_file_path> <table_name> [fast]")
             return
         excel_file_path = args[0].strip('"').strip("'")  # 去除引号
         table_name = args[1]
-        self.import_excel_to_table(excel_file_path, table_name)
+        self.import_excel_to_table(excel_file_path, table_name, fast=len(args) == 3)
+
+    def generate_data(self, table_name, rows, seed=None):
+        """
+        向 user_info、security_event、user_feedback 或 system_record 写入 rows 行仿真数据
+        数据按块向量化生成，用 executemany 写入，每 generate_commit_rows 行提交一次事务
+        :param seed: 随机种子，相同种子和相同的已有数据生成相同的结果
+        """
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法生成数据")
+            return
+        conn = self.db_connection
+        table = self.schema.resolve(conn, table_name)
+        if table is None:
+            self.command_failed = True
+            print(f"表 {table_name} 不存在，可先执行 create_related_tables 创建")
+            return
+        if table not in SyntheticDataGenerator.INSERT_SQL:
+            self.command_failed = True
+            print(f"不支持为表 {table} 生成数据，可选: {', '.join(SyntheticDataGenerator.INSERT_SQL)}")
+            return
+
+        committed = 0
+        try:
+            generator = SyntheticDataGenerator(seed)
+        except ImportError:
+            self.command_failed = True
+            print("生成数据需要安装 numpy（pip install numpy）")
+            return
+        try:
+            if conn.in_transaction:
+                conn.commit()
+            first_id = 1
+            if table == 'user_info':
+                first_id = conn.execute("SELECT COALESCE(MAX(user_id), 0) + 1 FROM user_info").fetchone()[0]
+            elif table in SyntheticDataGenerator.USER_FK_TABLES:
+                generator.load_users(conn)
+
+            insert_sql = SyntheticDataGenerator.INSERT_SQL[table]
+            chunk_size = self.generate_chunk_size
+            chunks = -(-rows // chunk_size)
+            start = time.perf_counter()
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            pending = 0
+            try:
+                for index in range(chunks):
+                    n = min(chunk_size, rows - committed - pending)
+                    cursor.executemany(insert_sql, generator.chunk(table, n, index, chunks, first_id))
+                    first_id += n
+                    pending += n
+                    if pending >= self.generate_commit_rows and index < chunks - 1:
+                        conn.commit()
+                        committed += pending
+                        pending = 0
+                        print(f"已写入 {committed:,} / {rows:,} 行")
+                        cursor.execute("BEGIN")
+                conn.commit()
+                committed += pending
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                if committed:
+                    self._mark_data_changed()
+            elapsed = time.perf_counter() - start
+
+            rate = committed / elapsed if elapsed > 0 else float(committed)
+            self.metrics.add_rows(committed)
+            print(f"已为表 {table} 生成 {committed:,} 行数据（种子 {seed}），"
+                  f"耗时 {elapsed:.2f} 秒（{rate:,.0f} 行/秒）")
+        except Exception as e:
+            self.command_failed = True
+            print(f"生成数据时出错: {e}（已提交 {committed:,} 行，未提交的部分已回滚）")
+
+    def do_generate_data(self, arg):
+        """
+        为相关表批量生成仿真数据
+        用法: generate_data <表名> <行数> [种子]
+        支持 user_info、security_event、user_feedback、system_record；
+        user_feedback 与 system_record 的用户 ID 取自已有的 user_info，请先生成用户
+        不指定种子时随机选取，完成后输出所用的种子，之后可用同一种子复现数据集
+        """
+        args = arg.split()
+        if len(args) not in (2, 3):
+            self.command_failed = True
+            print("参数错误，用法: generate_data <表名> <行数> [种子]")
+            return
+        try:
+            rows = int(args[1])
+            seed = int(args[2]) if len(args) == 3 else int.from_bytes(os.urandom(4), 'little')
+        except ValueError:
+            self.command_failed = True
+            print("行数和种子必须是整数")
+            return
+        if rows <= 0:
+            self.command_failed = True
+            print("行数必须大于 0")
+            return
+        self.generate_data(args[0], rows, seed)
+
+    # 导出格式：扩展名 -> 格式；csv 与 jsonl 可再加压缩扩展名
+    EXPORT_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.parquet': 'parquet'}
+    EXPORT_COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+
+    def _export_format(self, file_path):
+        """根据文件扩展名确定 (格式, 压缩方式)"""
+        root, ext = os.path.splitext(file_path.lower())
+        compression = self.EXPORT_COMPRESSIONS.get(ext)
+        if compression:
+            root, ext = os.path.splitext(root)
+        fmt = self.EXPORT_FORMATS.get(ext)
+        if fmt is None:
+            raise ValueError("不支持的文件格式，请使用 .csv、.jsonl 或 .parquet 扩展名（csv/jsonl 可加 .gz 或 .zst）")
+        if fmt == 'parquet' and compression:
+            raise ValueError("parquet 文件自带压缩，请直接使用 .parquet 扩展名")
+        return fmt, compression
+
+    def _open_export_text(self, file_path, compression):
+        """以文本方式打开导出文件，按需套上 gzip 或 zstd 压缩流"""
+        if compression == 'gzip':
+            import gzip
+            return gzip.open(file_path, 'wt', encoding='utf-8', newline='')
+        if compression == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise ValueError("导出 .zst 文件需要安装 zstandard（pip install zstandard）")
+            return zstandard.open(file_path, 'wt', encoding='utf-8', newline='')
+        return open(file_path, 'w', encoding='utf-8', newline='')
+
+    def _export_chunks(self, cursor):
+        """按块读取游标中的结果，每 100 万行输出一次进度"""
+        total = 0
+        while True:
+            with self.metrics.phase('fetch'):
+                rows = cursor.fetchmany(self.export_chunk_size)
+            if not rows:
+                return
+            yield rows
+            reported = total // 1000000
+            total += len(rows)
+            if total // 1000000 > reported:
+                print(f"已导出 {total:,} 行...")
+
+    def _write_csv(self, file_path, compression, cursor, headers):
+        import csv
+        total = 0
+        with self._open_export_text(file_path, compression) as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            for rows in self._export_chunks(cursor):
+                writer.writerows(rows)
+                total += len(rows)
+        return total
+
+    def _write_jsonl(self, file_path, compression, cursor, headers):
+        # BLOB 列以十六进制字符串输出
+        encode = json.JSONEncoder(ensure_ascii=False, default=lambda value: value.hex()).encode
+        total = 0
+        with self._open_export_text(file_path, compression) as f:
+            for rows in self._export_chunks(cursor):
+                f.writelines(encode(dict(zip(headers, row))) + "\n" for row in rows)
+                total += len(rows)
+        return total
+
+    def _write_parquet(self, file_path, cursor, headers, min_kinds=None):
+        """
+        逐块写入 parquet 的行组：每块先按列转换为 NumPy 数组再交给 pyarrow
+        列类型由声明类型和第一块数据推断，全空的列按字符串处理
+        """
+        try:
+            import numpy as np
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("导出 parquet 文件需要安装 numpy 和 pyarrow（pip install pyarrow）")
+        arrow_types = {'int': pa.int64(), 'float': pa.float64()}
+        schema = None
+        writer = None
+        guessed = set()  # 第一块全为空值、只能按字符串处理的列
+        total = 0
+        try:
+            for rows in self._export_chunks(cursor):
+                columns = _rows_to_columns(np, rows, min_kinds)
+                if schema is None:
+                    fields = []
+                    for name, (kind, data, mask) in zip(headers, columns):
+                        if kind in arrow_types:
+                            arrow_type = arrow_types[kind]
+                        elif data is None:
+                            arrow_type = pa.string()
+                            guessed.add(name)
+                        else:
+                            arrow_type = pa.array(data, mask=mask).type
+                        fields.append(pa.field(name, arrow_type))
+                    schema = pa.schema(fields)
+                    writer = pq.ParquetWriter(file_path, schema, compression='zstd')
+                arrays = []
+                for field, (kind, data, mask) in zip(schema, columns):
+                    try:
+                        if data is None:
+                            arrays.append(pa.nulls(len(mask), type=field.type))
+                        else:
+                            arrays.append(pa.array(data, mask=mask if mask.any() else None, type=field.type))
+                    except (pa.ArrowInvalid, pa.ArrowTypeError):
+                        if field.name in guessed:
+                            raise ValueError(f"列 {field.name} 在第一块中全为空值且没有可用的声明类型，无法确定类型，"
+                                             f"请在查询中使用 CAST 指定类型")
+                        raise ValueError(f"列 {field.name} 中的值类型不一致（第一块推断为 {field.type}），"
+                                         f"请在查询中使用 CAST 统一类型")
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                total += len(rows)
+            if writer is None:
+                # 结果为空时写出只有列名的文件
+                schema = pa.schema([pa.field(name, pa.string()) for name in headers])
+                writer = pq.ParquetWriter(file_path, schema, compression='zstd')
+        finally:
+            if writer is not None:
+                writer.close()
+        return total
+
+    def export_query(self, file_path, sql, params=()):
+        """
+        以 fetchmany 分块流式导出查询结果，内存中最多只保留一块数据
+        格式由扩展名决定: .csv / .jsonl / .parquet，csv 与 jsonl 可再加 .gz 或 .zst 压缩
+        只接受 SELECT/WITH 查询并在 query_only 下执行；先写入同目录的临时文件，成功后才替换目标文件
+        导出中断或失败时只删除临时文件，已有的同名文件保持不变
+        :return: 导出的行数，失败时返回 None
+        """
+        try:
+            fmt, compression = self._export_format(file_path)
+        except ValueError as e:
+            self.command_failed = True
+            print(e)
+            return None
+        if not is_read_query(sql):
+            self.command_failed = True
+            print("只能导出查询结果，请提供表名、SELECT 语句或自然语言查询")
+            return None
+
+        directory, name = os.path.split(os.path.abspath(file_path))
+        temp_path = os.path.join(directory, f".{name}.{os.getpid()}.part")
+        total = None
+        start = time.perf_counter()
+        try:
+            # 声明类型需借助临时视图读取，query_only 下无法创建，须在进入只读状态前取得
+            min_kinds = _declared_kinds(self.db_connection, sql, params) if fmt == 'parquet' else None
+            with self._query_guard(), self._read_only():
+                cursor = self.db_connection.cursor()
+                cursor.execute(sql, params)
+                if cursor.description is None:
+                    raise ValueError("只能导出查询结果，请提供表名或 SELECT 语句")
+                headers = [desc[0] for desc in cursor.description]
+                if fmt == 'parquet':
+                    total = self._write_parquet(temp_path, cursor, headers, min_kinds)
+                elif fmt == 'jsonl':
+                    total = self._write_jsonl(temp_path, compression, cursor, headers)
+                else:
+                    total = self._write_csv(temp_path, compression, cursor, headers)
+            if total is not None:
+                os.replace(temp_path, file_path)
+        except Exception as e:
+            self.command_failed = True
+            print(f"导出数据时出错: {e}")
+            total = None
+            if self.db_connection.in_transaction:
+                self.db_connection.rollback()
+        if total is None:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+                self.command_failed = True
+                print("已删除未完成的临时文件")
+            return None
+
+        elapsed = time.perf_counter() - start
+        size_mb = os.path.getsize(file_path) / 1024 / 1024
+        rate = total / elapsed if elapsed > 0 else float(total)
+        print(f"已导出 {total} 行到 {file_path}（{size_mb:.1f} MB），耗时 {elapsed:.2f} 秒（{rate:,.0f} 行/秒）")
+        self.metrics.add_rows(total)
+        return total
+
+    def do_export(self, arg):
+        """
+        将表或查询结果流式导出到文件，格式由扩展名决定
+        用法: export <文件> <表名 | SELECT 语句 | 自然语言查询>
+        支持 .csv、.jsonl、.parquet，csv 与 jsonl 可加 .gz 或 .zst 压缩，例如: export events.csv.gz security_event
+        """
+        parts = arg.strip().split(None, 1)
+        if len(parts) != 2:
+            self.command_failed = True
+            print("参数错误，用法: export <文件> <表名 | SELECT 语句 | 自然语言查询>")
+            return
+        if self.db_connection is None:
+            self.command_failed = True
+            print("数据库连接失败，无法导出数据")
+            return
+        file_path = parts[0].strip('"').strip("'")
+        source = parts[1].strip().rstrip(';')
+        params = ()
+        if source.startswith('查询表'):
+            parsed = self.parse_natural_language(source)
+            if not parsed:
+                self.command_failed = True
+                print("无法解析该自然语言查询")
+                return
+            sql, params = parsed
+        elif re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", source):
+            sql = f"SELECT * FROM {source}"
+        else:
+            sql = source
+        self.export_query(file_path, sql, params)
     
     def create_related_tables(self):
         """创建记录、用户信息、安防事件和用户反馈相关表并初始化数据"""
         if self.db_connection is None:
+            self.command_failed = True
             print("数据库连接失败，无法创建表")
             return
         
@@ -975,6 +4855,7 @@ class MyCommandLineTool(cmd.Cmd):
             self.initialize_sample_data()
             
         except Exception as e:
+            self.command_failed = True
             print(f"创建表时出错: {e}")
     
     def initialize_sample_data(self):
@@ -1030,6 +4911,7 @@ class MyCommandLineTool(cmd.Cmd):
             print("所有表数据初始化完成")
             
         except Exception as e:
+            self.command_failed = True
             self.db_connection.rollback()
             print(f"初始化数据时出错: {e}")
     
@@ -1042,6 +4924,7 @@ class MyCommandLineTool(cmd.Cmd):
         手动初始化命令行工具，删除所有表，并重新进入数据库
         """
         if self.db_connection is None:
+            self.command_failed = True
             print("数据库连接失败，无法进行初始化操作")
             return
         try:
@@ -1057,17 +4940,58 @@ class MyCommandLineTool(cmd.Cmd):
                         # 删除表
                         cursor.execute(f"DROP TABLE IF EXISTS {table_name};")
                     except Exception as e:
+                        self.command_failed = True
                         print(f"表 {table_name} 无法删除，错误信息: {e}")
 
             self.db_connection.commit()
             print("所有表已删除，正在重新连接数据库...")
             self.db_connection.close()
-            self.db_connection = sqlite3.connect(self.db_file)
+            self.db_connection = self.connect()
+            self._mark_data_changed()
             print("数据库已重新连接，初始化完成。")
         except Exception as e:
+            self.command_failed = True
             print(f"手动初始化时出错: {e}")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="数据库命令行工具")
+    parser.add_argument('--profile', choices=list(CONNECTION_PROFILES), default='default',
+                        help="连接性能配置，默认使用 SQLite 的默认设置")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="批处理模式：执行脚本文件中的命令和 SQL 语句，- 表示从标准输入读取")
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help="批处理模式下每个事务包含的写语句数，默认 1000")
+    parser.add_argument('--timing', action='store_true', help="批处理模式下输出每条语句的耗时")
+    parser.add_argument('--metrics-file', metavar='FILE',
+                        help="以 JSON lines 格式追加记录每条命令的耗时、行数等指标")
+    parser.add_argument('command', nargs=argparse.REMAINDER,
+                        help="直接执行的单条命令，执行完毕后立即退出，例如: list_tables")
+    args = parser.parse_args()
+
     # 默认不重置系统
-    tool = MyCommandLineTool()
-    tool.cmdloop()
\ No newline at end of file
+    tool = MyCommandLineTool(profile=args.profile)
+    if args.metrics_file:
+        tool.metrics.metrics_file = os.path.abspath(args.metrics_file)
+    if args.batch:
+        tool.batch_mode = True
+        runner = BatchRunner(tool, batch_size=max(1, args.batch_size), timing=args.timing)
+        if args.batch == '-':
+            status = runner.run(sys.stdin)
+        else:
+            try:
+                with open(args.batch, encoding='utf-8') as script:
+                    status = runner.run(script)
+            except OSError as e:
+                print(f"无法读取脚本文件 {args.batch}: {e}")
+                status = 1
+        if tool.db_connection:
+            tool.db_connection.close()
+        sys.exit(status)
+    elif args.command:
+        # 快速启动路径：不进入交互循环，只执行一条命令
+        tool.onecmd(' '.join(args.command))
+        if tool.db_connection:
+            tool.db_connection.close()
+        sys.exit(1 if tool.command_failed else 0)
+    else:
+        tool.cmdloop()
\ No newline at end of file
@@ -0,0 +1,472 @@
+"""
+命令行工具性能基准测试
+用法:
+    python benchmark.py startup [--runs N] [--budget-ms MS]
+    python benchmark.py profiles [--rows N] [--repeat N]
+    python benchmark.py parallel [--rows N] [--queries N]
+    python benchmark.py commands [--sizes 10000,1000000,10000000] [--repeat N] [--output FILE]
+                                 [--baseline FILE] [--update-baseline] [--tolerance 0.25]
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+TOOL_DIR = os.path.dirname(os.path.abspath(__file__))
+TOOL_SCRIPT = os.path.join(TOOL_DIR, 'CLI_Tool.py')
+
+# 启动阶段不应加载的重量级依赖
+HEAVY_MODULES = ('pandas', 'matplotlib', 'sqlparse', 'numpy')
+
+
+def time_command(argv, cwd, runs):
+    """重复运行子进程命令，返回每次的耗时（毫秒）"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def bench_startup(args):
+    """测量冷启动耗时：导入模块以及以快速启动路径执行 list_tables"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        # 先创建数据库，避免把建库时间算进启动时间
+        subprocess.run([sys.executable, TOOL_SCRIPT, 'list_tables'], cwd=work_dir,
+                       stdout=subprocess.DEVNULL, check=True)
+
+        probe = ("import sys; sys.path.insert(0, %r); import CLI_Tool; "
+                 "print(','.join(m for m in %r if m in sys.modules))") % (TOOL_DIR, HEAVY_MODULES)
+        loaded = subprocess.run([sys.executable, '-c', probe], cwd=work_dir,
+                                capture_output=True, text=True, check=True).stdout.strip()
+
+        interpreter = time_command([sys.executable, '-c', 'pass'], work_dir, args.runs)
+        list_tables = time_command([sys.executable, TOOL_SCRIPT, 'list_tables'], work_dir, args.runs)
+
+    base = statistics.median(interpreter)
+    total = statistics.median(list_tables)
+    overhead = total - base
+    print(f"Python 解释器启动: {base:.1f} ms（中位数，{args.runs} 次）")
+    print(f"list_tables 冷启动: {total:.1f} ms（中位数），扣除解释器后 {overhead:.1f} ms")
+    print(f"启动时加载的重量级依赖: {loaded or '无'}")
+
+    failed = False
+    if loaded:
+        print("失败：启动路径不应加载上述依赖")
+        failed = True
+    if overhead > args.budget_ms:
+        print(f"失败：启动耗时超出预算 {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print(f"通过：启动耗时在预算 {args.budget_ms:.0f} ms 以内")
+    return 1 if failed else 0
+
+
+# 连接配置基准中执行的命令：(名称, 命令模板, 是否为写操作)，{i} 为第几次执行
+PROFILE_WORKLOAD = [
+    ('select_data', "select_data SELECT event_type, COUNT(*) FROM security_event GROUP BY event_type", False),
+    ('nl_query', "查询表security_event中event_id大于{i}的数据", False),
+    ('show_table_data', "show_table_data security_event 50 {i}", False),
+    ('change_data', "change_data security_event SET event_level='一般' WHERE event_id={i}", True),
+    ('delete_data', "delete_data security_event WHERE event_id={i}", True),
+]
+
+
+@contextlib.contextmanager
+def quiet_tool(work_dir, profile='default'):
+    """在 work_dir 中创建工具实例并屏蔽其输出，退出时关闭连接"""
+    import CLI_Tool
+
+    old_cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+            tool = CLI_Tool.MyCommandLineTool(profile=profile)
+            try:
+                yield tool
+            finally:
+                if tool.db_connection:
+                    tool.db_connection.close()
+    finally:
+        os.chdir(old_cwd)
+
+
+def seed_security_events(conn, rows):
+    """向 security_event 写入指定行数的测试数据"""
+    types = ['入侵报警', '火灾报警', '设备故障', '异常行为', '系统告警']
+    levels = ['紧急', '中等', '一般']
+    conn.executemany(
+        "INSERT INTO security_event (event_type, event_level, event_desc, location, occur_time) VALUES (?, ?, ?, ?, ?)",
+        ((types[i % 5], levels[i % 3], f"测试事件 {i}", f"区域{i % 50}",
+          f"2025-05-{i % 28 + 1:02d} {i % 24:02d}:{i % 60:02d}:00") for i in range(rows)))
+    conn.commit()
+
+
+def bench_profiles(args):
+    """在每个连接配置下运行同一组命令，比较各命令的中位耗时"""
+    from CLI_Tool import CONNECTION_PROFILES
+
+    results = {}
+    for profile in CONNECTION_PROFILES:
+        with tempfile.TemporaryDirectory() as work_dir, quiet_tool(work_dir) as tool:
+            tool.create_related_tables()
+            seed_security_events(tool.db_connection, args.rows)
+            tool.onecmd(f"profile {profile}")
+            read_only = CONNECTION_PROFILES[profile]['query_only'] == 'ON'
+
+            timings = {}
+            for name, template, is_write in PROFILE_WORKLOAD:
+                if is_write and read_only:
+                    continue
+                samples = []
+                for i in range(args.repeat):
+                    command = template.format(i=args.rows - args.repeat + i)
+                    start = time.perf_counter()
+                    tool.onecmd(command)
+                    samples.append((time.perf_counter() - start) * 1000)
+                timings[name] = statistics.median(samples)
+            results[profile] = timings
+
+    names = [name for name, _, _ in PROFILE_WORKLOAD]
+    print(f"{args.rows} 行 security_event，每条命令执行 {args.repeat} 次，单位: ms（中位数）")
+    print("profile".ljust(14) + "".join(name.rjust(17) for name in names))
+    for profile, timings in results.items():
+        cells = [f"{timings[name]:.2f}" if name in timings else "-" for name in names]
+        print(profile.ljust(14) + "".join(cell.rjust(17) for cell in cells))
+    return 0
+
+
+# 并行基准中使用的 CPU 密集型聚合查询，{i} 使各条查询互不相同
+PARALLEL_QUERY = ("SELECT location, COUNT(*), MAX(event_desc), SUM(LENGTH(event_desc) * {i}) "
+                  "FROM security_event GROUP BY location")
+
+
+def bench_parallel(args):
+    """比较不同并行连接数下执行同一组独立查询的总耗时"""
+    statements = [PARALLEL_QUERY.format(i=i) for i in range(args.queries)]
+    worker_counts = sorted({1, 2, 4, os.cpu_count() or 1})
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir, quiet_tool(work_dir, profile='interactive') as tool:
+        tool.create_related_tables()
+        seed_security_events(tool.db_connection, args.rows)
+        for workers in worker_counts:
+            tool.parallel_workers = workers
+            tool.run_parallel(statements[:1])  # 预先建立连接并预热页缓存
+            start = time.perf_counter()
+            tool.run_parallel(statements)
+            results.append((workers, (time.perf_counter() - start) * 1000))
+
+    print(f"{args.rows} 行 security_event，{args.queries} 条独立聚合查询，CPU 核数 {os.cpu_count()}")
+    base = results[0][1]
+    for workers, elapsed in results:
+        print(f"{workers:>3} 个连接: {elapsed:10.1f} ms  加速比 {base / elapsed:.2f}")
+    return 0
+
+
+# 命令基准：(名称, 命令模板)，模板中的 {id}、{tail} 等参数由 command_context 按样本序号生成
+COMMAND_WORKLOAD = [
+    ('select_point', "select_data SELECT * FROM security_event WHERE event_id = {id}"),
+    ('select_group', "select_data SELECT event_type, event_level, COUNT(*) FROM security_event "
+                     "GROUP BY event_type, event_level"),
+    ('select_like', "select_data SELECT COUNT(*) FROM security_event WHERE event_desc LIKE '%明火%'"),
+    ('select_hourly', "select_data SELECT strftime('%Y-%m-%d %H', occur_time) AS hour, COUNT(*) "
+                      "FROM security_event WHERE occur_time >= '2025-03-01' AND occur_time < '2025-03-08' "
+                      "GROUP BY hour"),
+    ('nl_point', "查询表security_event中event_id等于{id}的数据"),
+    ('nl_range', "查询表security_event中event_id在{id}和{last}之间的数据"),
+    ('nl_contains', "查询表system_record中content包含确认了火灾的数据"),
+    ('nl_count', "查询表security_event的记录数"),
+    # 非交互模式下从起始键连续输出到表尾，起始键靠近表尾以测量深处的键集定位
+    ('show_table_data', "show_table_data security_event 50 {tail}"),
+    ('import_excel', "import_excel {excel} security_event"),
+    ('change_data', "change_data security_event SET event_level='一般' WHERE event_id={id}"),
+    ('delete_data', "delete_data security_event WHERE event_id={delete_id}"),
+    ('rename_column', "rename_column security_event {col} {alt}"),
+    ('visualize_data', "SELECT location, event_id FROM security_event"),
+]
+
+# 比较基线时低于该差值的变化视为噪声
+LATENCY_SLACK_MS = 5.0
+RSS_SLACK_MB = 16.0
+
+
+def reset_peak_rss():
+    """在 Linux 上清零进程的 RSS 峰值（VmHWM），其他平台无此功能"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    """返回进程的 RSS 峰值（MB），无法获取时返回 None"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def write_excel(path, rows):
+    """写入 rows 行 security_event 格式的 Excel 文件，缺少 openpyxl 时返回 False"""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        return False
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(['event_type', 'event_level', 'event_desc', 'location', 'occur_time'])
+    for i in range(rows):
+        sheet.append(['设备故障', '一般', f"导入事件 {i}", f"区域{i % 50}",
+                      f"2025-05-{i % 28 + 1:02d} {i % 24:02d}:{i % 60:02d}:00"])
+    workbook.save(path)
+    return True
+
+
+def build_database(tool, size, seed):
+    """按 create_related_tables 的表结构建库，security_event 为 size 行，其余表为其十分之一"""
+    tool.create_related_tables()
+    side = max(size // 10, 100)
+    for table, rows in (('user_info', side), ('security_event', size),
+                        ('user_feedback', side), ('system_record', side)):
+        tool.generate_data(table, rows, seed)
+    tool.db_connection.execute("ANALYZE")
+
+
+def command_context(size, sample):
+    """第 sample 次执行时代入命令模板的参数，各次操作不同的行"""
+    middle = size // 2 + sample
+    return {'id': middle, 'last': middle + 99, 'delete_id': size - sample,
+            'tail': max(size - 500 + sample, 1),
+            'col': 'location' if sample % 2 == 0 else 'place',
+            'alt': 'place' if sample % 2 == 0 else 'location'}
+
+
+def run_sample(tool, name, template, context):
+    """执行一次命令，返回本次处理的行数（无法统计时为 0）"""
+    if name == 'visualize_data':
+        tool.chart_cache.clear()  # 每次都重新聚合和绘图
+        tool.visualize_data(template)
+        return 0
+    before = sum(summary['rows'] for summary in tool.metrics.commands.values())
+    tool.onecmd(template.format(**context))
+    return sum(summary['rows'] for summary in tool.metrics.commands.values()) - before
+
+
+def summarize(samples, rows, rss):
+    """汇总一条命令的多次耗时（毫秒）"""
+    ordered = sorted(samples)
+    median = statistics.median(ordered)
+    total_s = sum(ordered) / 1000
+    return {
+        'samples': len(ordered),
+        'median_ms': round(median, 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        'min_ms': round(ordered[0], 3),
+        'ops_per_s': round(len(ordered) / total_s, 2) if total_s > 0 else None,
+        'rows_per_s': round(rows / total_s, 1) if rows and total_s > 0 else None,
+        'peak_rss_mb': round(rss, 1) if rss is not None else None,
+    }
+
+
+def bench_commands_size(size, args):
+    """在当前进程中为 size 行的数据库执行整组命令，返回该规模的结果"""
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as work_dir:
+        excel_rows = min(size, args.import_rows)
+        excel_path = os.path.join(work_dir, 'import.xlsx')
+        has_excel = write_excel(excel_path, excel_rows)
+        with quiet_tool(work_dir) as tool:
+            tool.batch_mode = True
+            tool.chart_mode = 'file'
+            tool.chart_dir = os.path.join(work_dir, 'charts')
+            start = time.perf_counter()
+            build_database(tool, size, args.seed)
+            build_s = time.perf_counter() - start
+
+            commands = {}
+            for name, template in COMMAND_WORKLOAD:
+                if name == 'import_excel' and not has_excel:
+                    commands[name] = {'skipped': "缺少 openpyxl，无法生成 Excel 文件"}
+                    continue
+                template = template.replace('{excel}', excel_path)
+                samples = []
+                rows = 0
+                reset_peak_rss()
+                for sample in range(args.repeat):
+                    context = command_context(size, sample)
+                    started = time.perf_counter()
+                    processed = run_sample(tool, name, template, context)
+                    samples.append((time.perf_counter() - started) * 1000)
+                    rows += excel_rows if name == 'import_excel' else processed
+                if name == 'rename_column' and args.repeat % 2:
+                    tool.onecmd("rename_column security_event place location")
+                commands[name] = summarize(samples, rows, peak_rss_mb())
+    return {'rows': size, 'build_s': round(build_s, 2), 'build_rows_per_s': round(size / build_s, 1),
+            'commands': commands}
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """逐项比较中位耗时与 RSS 峰值，返回回归描述列表"""
+    regressions = []
+    for size, current in results['sizes'].items():
+        base_size = baseline.get('sizes', {}).get(size)
+        if base_size is None:
+            continue
+        for name, stats in current['commands'].items():
+            base = base_size['commands'].get(name)
+            if not base or 'skipped' in base or 'skipped' in stats:
+                continue
+            now_ms, was_ms = stats['median_ms'], base['median_ms']
+            if now_ms > was_ms * (1 + tolerance) and now_ms - was_ms > LATENCY_SLACK_MS:
+                regressions.append(f"{size} 行 {name}: 中位耗时 {was_ms:.2f} ms -> {now_ms:.2f} ms")
+            now_mb, was_mb = stats.get('peak_rss_mb'), base.get('peak_rss_mb')
+            if now_mb and was_mb and now_mb > was_mb * (1 + tolerance) and now_mb - was_mb > RSS_SLACK_MB:
+                regressions.append(f"{size} 行 {name}: RSS 峰值 {was_mb:.1f} MB -> {now_mb:.1f} MB")
+    return regressions
+
+
+def print_command_results(results, baseline):
+    """按规模输出各命令的中位耗时、吞吐量与 RSS 峰值，有基线时附上变化比例"""
+    for size, current in results['sizes'].items():
+        base_size = (baseline or {}).get('sizes', {}).get(size, {}).get('commands', {})
+        print(f"\n{int(size):,} 行（建库 {current['build_s']:.1f} 秒，{current['build_rows_per_s']:,.0f} 行/秒）")
+        print("命令".ljust(18) + "中位 ms".rjust(12) + "p95 ms".rjust(12) + "次/秒".rjust(12)
+              + "行/秒".rjust(14) + "RSS MB".rjust(10) + "对比基线".rjust(10))
+        for name, stats in current['commands'].items():
+            if 'skipped' in stats:
+                print(f"{name.ljust(18)}  跳过：{stats['skipped']}")
+                continue
+            base = base_size.get(name, {})
+            change = (f"{stats['median_ms'] / base['median_ms'] - 1:+.0%}"
+                      if base.get('median_ms') else "-")
+            rows_per_s = f"{stats['rows_per_s']:,.0f}" if stats['rows_per_s'] else "-"
+            rss = f"{stats['peak_rss_mb']:.1f}" if stats['peak_rss_mb'] is not None else "-"
+            print(name.ljust(18) + f"{stats['median_ms']:.2f}".rjust(12) + f"{stats['p95_ms']:.2f}".rjust(12)
+                  + f"{stats['ops_per_s'] or 0:.1f}".rjust(12) + rows_per_s.rjust(14) + rss.rjust(10)
+                  + change.rjust(10))
+
+
+def bench_commands(args):
+    """
+    在多个数据规模下执行全部 CLI 命令，结果写入 JSON 文件并与基线比较
+    每个规模在独立的子进程中运行，使 RSS 峰值互不影响
+    """
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    if args.child_output:
+        with open(args.child_output, 'w', encoding='utf-8') as f:
+            json.dump(bench_commands_size(sizes[0], args), f, ensure_ascii=False)
+        return 0
+
+    results = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'seed': args.seed,
+        'sizes': {},
+    }
+    for size in sizes:
+        print(f"正在测试 {size:,} 行数据...", flush=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            child_output = os.path.join(tmp, 'result.json')
+            argv = [sys.executable, os.path.abspath(__file__), 'commands', '--sizes', str(size),
+                    '--repeat', str(args.repeat), '--seed', str(args.seed),
+                    '--import-rows', str(args.import_rows), '--child-output', child_output]
+            if args.work_dir:
+                argv += ['--work-dir', args.work_dir]
+            env = dict(os.environ, MPLBACKEND='Agg')
+            subprocess.run(argv, cwd=TOOL_DIR, stdin=subprocess.DEVNULL, env=env, check=True)
+            with open(child_output, encoding='utf-8') as f:
+                results['sizes'][str(size)] = json.load(f)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_command_results(results, baseline)
+    print(f"\n结果已写入 {args.output}")
+
+    if args.update_baseline:
+        if not args.baseline:
+            print("失败：--update-baseline 需要同时指定 --baseline")
+            return 1
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"基线已更新: {args.baseline}")
+        return 0
+    if baseline is None:
+        if args.baseline:
+            print(f"基线文件 {args.baseline} 不存在，可加 --update-baseline 保存本次结果作为基线")
+        return 0
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print(f"失败：以下 {len(regressions)} 项相对基线 {args.baseline} 退化超过 {args.tolerance:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"通过：所有命令均在基线 {args.baseline} 的 {args.tolerance:.0%} 容差以内")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="命令行工具性能基准测试")
+    subparsers = parser.add_subparsers(dest='suite', required=True)
+
+    startup = subparsers.add_parser('startup', help="冷启动耗时")
+    startup.add_argument('--runs', type=int, default=10, help="重复次数")
+    startup.add_argument('--budget-ms', type=float, default=100.0,
+                         help="扣除解释器启动后允许的最大耗时（毫秒）")
+    startup.set_defaults(func=bench_startup)
+
+    profiles = subparsers.add_parser('profiles', help="各连接性能配置下的命令耗时")
+    profiles.add_argument('--rows', type=int, default=100000, help="security_event 测试数据行数")
+    profiles.add_argument('--repeat', type=int, default=50, help="每条命令的执行次数")
+    profiles.set_defaults(func=bench_profiles)
+
+    parallel = subparsers.add_parser('parallel', help="只读连接池并行查询的扩展性")
+    parallel.add_argument('--rows', type=int, default=200000, help="security_event 测试数据行数")
+    parallel.add_argument('--queries', type=int, default=8, help="并行执行的查询条数")
+    parallel.set_defaults(func=bench_parallel)
+
+    commands = subparsers.add_parser('commands', help="各数据规模下全部 CLI 命令的耗时、吞吐量与内存峰值")
+    commands.add_argument('--sizes', default='10000,1000000,10000000',
+                          help="security_event 的行数，逗号分隔，默认 10000,1000000,10000000")
+    commands.add_argument('--repeat', type=int, default=5, help="每条命令的执行次数")
+    commands.add_argument('--seed', type=int, default=2025, help="generate_data 的随机种子")
+    commands.add_argument('--import-rows', type=int, default=10000, help="import_excel 每次导入的最大行数")
+    commands.add_argument('--output', default='benchmark_results.json', help="结果 JSON 文件")
+    commands.add_argument('--baseline', metavar='FILE', help="与之比较的基线 JSON 文件")
+    commands.add_argument('--update-baseline', action='store_true', help="把本次结果保存为基线")
+    commands.add_argument('--tolerance', type=float, default=0.25, help="允许的相对退化比例，默认 0.25")
+    commands.add_argument('--work-dir', help="存放测试数据库的目录，默认使用系统临时目录")
+    commands.add_argument('--child-output', help=argparse.SUPPRESS)
+    commands.set_defaults(func=bench_commands)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'CLI_Tool.py')
+
+
+class BatchExitStatusTest(unittest.TestCase):
+    """出错的工具命令使批处理停止并以非零状态退出"""
+
+    FAILING = [
+        "rename_column security_event nope x",
+        "desc_table nosuch",
+        "查询表security_event中的什么东西",
+        "export out.csv DELETE FROM user_info",
+        "change_data no_table SET a = 1 WHERE b = 2",
+        "select_data SELECT * FROM nope",
+        "insert_into nosuch\n1, 2",
+        "show_table_data nosuch",
+        "create_fulltext nosuch col",
+        "drop_rollup nosuch",
+        "create_index",
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.run_cli('create_related_tables')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    @classmethod
+    def run_cli(cls, *args, script=None):
+        return subprocess.run([sys.executable, CLI, *args], input=script, cwd=cls.tmp.name,
+                              capture_output=True, text=True, encoding='utf-8', timeout=120)
+
+    def test_failing_command_stops_batch(self):
+        for command in self.FAILING:
+            with self.subTest(command=command):
+                result = self.run_cli('--batch', '-', script=f"{command}\nSELECT 1;\n")
+                self.assertEqual(result.returncode, 1, result.stdout)
+                self.assertNotIn("批处理完成：共执行 2", result.stdout)
+
+    def test_successful_script_exits_zero(self):
+        result = self.run_cli('--batch', '-', script="desc_table security_event\nSELECT 1;\n")
+        self.assertEqual(result.returncode, 0, result.stdout)
+
+    def test_single_command_exit_status(self):
+        self.assertEqual(self.run_cli('rename_column', 'security_event', 'nope', 'x').returncode, 1)
+        self.assertEqual(self.run_cli('list_tables').returncode, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import sqlite3
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CLI_Tool import NoChartData, _build_chart_spec  # noqa: E402
+
+
+class BuildChartSpecTest(unittest.TestCase):
+    """_build_chart_spec 在 SQLite 中完成聚合"""
+
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.execute("CREATE TABLE t (a INTEGER, b REAL, cat TEXT)")
+        self.conn.executemany("INSERT INTO t VALUES (?, ?, ?)",
+                              [(i, i * 1.5, f"c{i % 12}" if i % 7 else None) for i in range(200)])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_chart_kinds(self):
+        self.assertEqual(_build_chart_spec(self.conn, "SELECT a, b FROM t")['kind'], 'scatter')
+        self.assertEqual(_build_chart_spec(self.conn, "SELECT cat, a FROM t")['kind'], 'bar')
+        self.assertEqual(_build_chart_spec(self.conn, "SELECT a FROM t WHERE a < ?", (50,))['kind'], 'hist')
+        with self.assertRaises(NoChartData):
+            _build_chart_spec(self.conn, "SELECT a FROM t WHERE a < 0")
+
+    def test_bar_uses_most_frequent_categories(self):
+        spec = _build_chart_spec(self.conn, "SELECT cat, a FROM t")
+        counts = dict(self.conn.execute("SELECT cat, COUNT(*) FROM t WHERE cat IS NOT NULL GROUP BY cat"))
+        self.assertEqual(spec['x'], sorted(spec['x']))
+        self.assertEqual(len(spec['x']), 10)
+        dropped = set(counts) - set(spec['x'])
+        self.assertTrue(all(counts[kept] >= counts[other] for kept in spec['x'] for other in dropped))
+        for category, average in zip(spec['x'], spec['y']):
+            self.assertAlmostEqual(average, self.conn.execute(
+                "SELECT AVG(a) FROM t WHERE cat = ?", (category,)).fetchone()[0])
+
+    def test_histogram_counts_every_value(self):
+        spec = _build_chart_spec(self.conn, "SELECT a FROM t")
+        self.assertEqual(sum(spec['counts']), 200)
+        self.assertEqual((spec['edges'][0], spec['edges'][-1]), (0, 199))
+
+    def test_trailing_comments(self):
+        for sql in ("SELECT a FROM t -- 注释", "SELECT a FROM t; -- 注释", "SELECT a FROM t WHERE cat <> ';' /* x */"):
+            with self.subTest(sql=sql):
+                self.assertEqual(_build_chart_spec(self.conn, sql)['kind'], 'hist')
+
+    def test_read_only_connection_stays_read_only(self):
+        self.conn.execute("PRAGMA query_only = ON")
+        _build_chart_spec(self.conn, "SELECT cat, a FROM t")
+        self.assertEqual(self.conn.execute("PRAGMA query_only").fetchone()[0], 1)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM sqlite_temp_master").fetchone()[0], 0)
+
+    def test_query_scanned_at_most_twice(self):
+        statements = []
+        self.conn.set_trace_callback(statements.append)
+        for sql in ("SELECT a, b FROM t", "SELECT cat, a FROM t", "SELECT a FROM t"):
+            statements.clear()
+            _build_chart_spec(self.conn, sql)
+            # LIMIT 0 探测与读取声明类型的临时视图都不读取数据
+            scans = [s for s in statements if sql in s and s.startswith("SELECT") and not s.endswith("LIMIT 0")]
+            self.assertLessEqual(len(scans), 2, scans)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CLI_Tool import MyCommandLineTool  # noqa: E402
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+
+@unittest.skipIf(pq is None, "需要安装 pyarrow")
+class ParquetExportTest(unittest.TestCase):
+    """parquet 导出使用列的声明类型"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.tool = MyCommandLineTool()
+        self.tool.batch_mode = True
+        self.tool.export_chunk_size = 10
+        self.conn = self.tool.db_connection
+        self.conn.execute("CREATE TABLE n (a INTEGER, b)")
+        self.conn.executemany("INSERT INTO n VALUES (?, ?)",
+                              [(None, None) if i < 15 else (i, i) for i in range(30)])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def export(self, line):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.tool.onecmd(f"export {line}")
+        return out.getvalue()
+
+    def test_declared_type_applies_to_null_first_chunk(self):
+        self.export("a.parquet SELECT a FROM n")
+        self.assertFalse(self.tool.command_failed)
+        table = pq.read_table('a.parquet')
+        self.assertEqual(str(table.schema.field('a').type), 'int64')
+        self.assertEqual(table.column('a').null_count, 15)
+        self.assertEqual(self.conn.execute("PRAGMA query_only").fetchone()[0], 0)
+
+    def test_untyped_null_first_chunk_reports_unknown_type(self):
+        output = self.export("b.parquet SELECT b FROM n")
+        self.assertTrue(self.tool.command_failed)
+        self.assertIn("全为空值", output)
+        self.assertNotIn("string", output)
+        self.assertFalse(os.path.exists('b.parquet'))
+
+
+if __name__ == '__main__':
+    unittest.main()
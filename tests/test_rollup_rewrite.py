@@ -0,0 +1,155 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CLI_Tool import MyCommandLineTool, _rewrite_rollup_query  # noqa: E402
+
+ROLLUPS = {
+    'event_hourly': ('hour', ('event_type',)),
+    'event_daily': ('day', ('event_type', 'location')),
+}
+EXACT = set(ROLLUPS)
+
+
+class RewriteRollupQueryTest(unittest.TestCase):
+    """_rewrite_rollup_query 的改写与拒绝改写"""
+
+    def rewrite(self, sql, params=(), exact_bounds=EXACT):
+        return _rewrite_rollup_query(sql, params, ROLLUPS, exact_bounds)
+
+    def test_daily_count_uses_rollup_with_needed_dimensions(self):
+        sql, params, name = self.rewrite(
+            "SELECT date(occur_time) AS day, location, COUNT(*) FROM security_event "
+            "GROUP BY date(occur_time), location")
+        self.assertEqual(name, 'event_daily')
+        self.assertIn("FROM event_daily", sql)
+        self.assertIn("SUM(event_count)", sql)
+        self.assertEqual(params, ())
+
+    def test_hourly_bucket_needs_hour_rollup(self):
+        result = self.rewrite(
+            "SELECT strftime('%Y-%m-%d %H', occur_time), COUNT(*) FROM security_event "
+            "GROUP BY strftime('%Y-%m-%d %H', occur_time)")
+        self.assertEqual(result[2], 'event_hourly')
+
+    def test_total_count_uses_coalesce(self):
+        sql, _, _ = self.rewrite("SELECT COUNT(*) FROM security_event")
+        self.assertIn("COALESCE(SUM(event_count), 0)", sql)
+
+    def test_bounds_are_converted_to_buckets(self):
+        sql, params, name = self.rewrite(
+            "SELECT event_type, COUNT(*) FROM security_event "
+            "WHERE occur_time >= '2025-03-01' AND occur_time < ? GROUP BY event_type", ('2025-03-02 06:00',))
+        self.assertEqual(name, 'event_hourly')
+        self.assertIn("bucket >= '2025-03-01 00:00:00'", sql)
+        self.assertEqual(params, ('2025-03-02 06:00:00',))
+
+    def test_bounds_need_canonical_source(self):
+        self.assertIsNone(self.rewrite(
+            "SELECT COUNT(*) FROM security_event WHERE occur_time < '2025-03-01 06:00'", exact_bounds=set()))
+        self.assertIsNotNone(self.rewrite("SELECT COUNT(*) FROM security_event", exact_bounds=set()))
+
+    def test_unaligned_bound_is_not_rewritten(self):
+        self.assertIsNone(self.rewrite(
+            "SELECT COUNT(*) FROM security_event WHERE occur_time >= '2025-03-01 06:30'"))
+        self.assertIsNone(self.rewrite(
+            "SELECT COUNT(*) FROM security_event WHERE occur_time > '2025-03-01'"))
+
+    def test_unsupported_queries_are_not_rewritten(self):
+        for sql in (
+                "SELECT event_type, SUM(event_id) FROM security_event GROUP BY event_type",
+                "SELECT event_desc, COUNT(*) FROM security_event GROUP BY event_desc",
+                "SELECT event_type FROM security_event",
+                "SELECT DISTINCT event_type, COUNT(*) FROM security_event GROUP BY event_type",
+                "SELECT COUNT(*) FROM security_event WHERE event_id IN (SELECT event_id FROM security_event)",
+                "SELECT COUNT(*) FROM security_event WHERE occur_time >= '2025-03-01' OR event_type = 'x'",
+                "SELECT COUNT(*) FROM user_info"):
+            with self.subTest(sql=sql):
+                self.assertIsNone(self.rewrite(sql))
+
+    def test_literals_are_preserved(self):
+        sql, _, _ = self.rewrite(
+            "SELECT event_type, COUNT(*) FROM security_event WHERE event_type = 'SELECT ''a'' FROM b' "
+            "GROUP BY event_type")
+        self.assertIn("'SELECT ''a'' FROM b'", sql)
+
+
+class RollupResultTest(unittest.TestCase):
+    """改写后的查询结果与直接查询 security_event 一致"""
+
+    QUERIES = [
+        "SELECT COUNT(*) FROM security_event",
+        "SELECT event_type, COUNT(*) FROM security_event GROUP BY event_type ORDER BY event_type",
+        "SELECT date(occur_time), COUNT(*) FROM security_event GROUP BY date(occur_time) ORDER BY 1",
+        "SELECT COUNT(*) FROM security_event WHERE occur_time >= '2025-03-01 00:00' AND occur_time < '2025-03-02'",
+        "SELECT COUNT(*) FROM security_event WHERE occur_time < '2025-03-01 06:00'",
+        "SELECT COUNT(*) FROM security_event WHERE occur_time >= '2025-03-01' AND occur_time < '2025-03-01 12:00'",
+    ]
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.tool = MyCommandLineTool()
+            self.tool.batch_mode = True
+            self.tool.onecmd("create_related_tables")
+        self.conn = self.tool.db_connection
+        self.conn.executemany(
+            "INSERT INTO security_event (event_type, event_level, location, occur_time) VALUES (?, '低', '南门', ?)",
+            [('入侵', '2025-02-28 23:59:59'), ('入侵', '2025-03-01 00:00:00'), ('火警', '2025-03-01 05:30:00'),
+             ('火警', '2025-03-01 11:00:00'), ('入侵', '2025-03-01 12:00:00'), ('火警', '2025-03-02 00:00:00')])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def command(self, line):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.tool.onecmd(line)
+        return out.getvalue()
+
+    def assert_matches_base(self, expect_routed):
+        for sql in self.QUERIES:
+            with self.subTest(sql=sql):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    routed, params = self.tool._route_rollup(sql)
+                if expect_routed or "occur_time >=" not in sql and "occur_time <" not in sql:
+                    self.assertNotEqual(routed, sql)
+                else:
+                    self.assertEqual(routed, sql)
+                self.assertEqual(self.conn.execute(routed, params).fetchall(), self.conn.execute(sql).fetchall())
+
+    def test_canonical_source(self):
+        self.command("create_rollup event_hourly hour event_type")
+        self.assert_matches_base(expect_routed=True)
+
+    def test_non_canonical_rows_disable_bound_rewriting(self):
+        self.command("create_rollup event_hourly hour event_type")
+        self.conn.executemany(
+            "INSERT INTO security_event (event_type, event_level, location, occur_time) VALUES ('入侵', '低', '南门', ?)",
+            [('2025-03-01',), ('2025-03-01T05:30:00',)])
+        self.conn.commit()
+        self.assert_matches_base(expect_routed=False)
+
+    def test_refresh_rechecks_source(self):
+        self.conn.execute("INSERT INTO security_event (event_type, event_level, location, occur_time) "
+                          "VALUES ('入侵', '低', '南门', '2025-03-01')")
+        self.conn.commit()
+        self.command("create_rollup event_hourly hour event_type")
+        self.assert_matches_base(expect_routed=False)
+        self.conn.execute("DELETE FROM security_event WHERE occur_time = '2025-03-01'")
+        self.conn.commit()
+        self.command("refresh_rollup event_hourly")
+        self.assert_matches_base(expect_routed=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
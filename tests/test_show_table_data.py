@@ -0,0 +1,65 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CLI_Tool import MyCommandLineTool  # noqa: E402
+
+
+class ShowTableDataTest(unittest.TestCase):
+    """show_table_data 对表和视图的分页"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.tool = MyCommandLineTool()
+        self.tool.batch_mode = True
+        self.conn = self.tool.db_connection
+        self.conn.execute("CREATE TABLE item (name TEXT, qty INTEGER)")
+        self.conn.executemany("INSERT INTO item VALUES (?, ?)", [(f"n{i}", i) for i in range(1, 8)])
+        self.conn.execute("CREATE VIEW big_item AS SELECT name, qty FROM item WHERE qty > 1")
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def show(self, arg):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.tool.onecmd(f"show_table_data {arg}")
+        return out.getvalue()
+
+    def test_view_lists_every_row(self):
+        output = self.show("big_item 4")
+        for i in range(2, 8):
+            self.assertIn(f"n{i} ", output)
+        self.assertIn("行号 范围 1 ~ 4", output)
+        self.assertIn("行号 范围 5 ~ 6", output)
+        self.assertNotIn("None", output)
+        self.assertFalse(self.tool.command_failed)
+
+    def test_view_pages_move_both_ways(self):
+        keys = self.tool._keyset_columns('big_item', self.tool.schema.columns(self.conn, 'big_item'))
+        first = self.tool._fetch_keyset_page('big_item', keys, (3,), 2, inclusive=True)
+        self.assertEqual(first, [(3, 'n4', 4), (4, 'n5', 5)])
+        following = self.tool._fetch_keyset_page('big_item', keys, (4,), 2)
+        self.assertEqual(following, [(5, 'n6', 6), (6, 'n7', 7)])
+        previous = self.tool._fetch_keyset_page('big_item', keys, (3,), 2, backward=True)
+        self.assertEqual(previous, [(1, 'n2', 2), (2, 'n3', 3)])
+        self.assertEqual(self.tool._fetch_keyset_page('big_item', keys, (1,), 2, backward=True), [])
+
+    def test_table_still_uses_rowid(self):
+        output = self.show("item 5")
+        self.assertIn("rowid 范围 1 ~ 5", output)
+        self.assertIn("rowid 范围 6 ~ 7", output)
+
+
+if __name__ == '__main__':
+    unittest.main()